@@ -0,0 +1,182 @@
+const cluster = require('cluster');
+const os = require('os');
+const path = require('path');
+
+const config = require('./config/database');
+const database = require('./database/database');
+const ipc = require('./middleware/clusterIpc');
+const { mergeRendered } = require('./middleware/metrics');
+const { WindowCounter } = require('./middleware/rateLimitStore');
+
+/**
+ * Executa a API em vários processos (um worker por núcleo) na mesma porta
+ *
+ * O primário não atende requisições: cria o schema uma vez, inicia os workers
+ * (server.js), repõe os que caem e guarda o estado que precisa ser único no
+ * cluster: os contadores do rate limiting. Também repassa as invalidações de
+ * cache entre os workers e soma as métricas de todos em /metrics. Contadores e
+ * histogramas dos workers que saíram continuam somados, para /metrics não voltar
+ * para trás a cada reinício.
+ *
+ * Uso: CLUSTER_WORKERS=4 node cluster.js
+ *   kill -HUP <pid>    reinício gradual (um worker por vez, sem recusar conexões)
+ *   SIGINT/SIGTERM     encerramento gracioso de todos os workers
+ */
+
+// Atraso antes de repor um worker que caiu (evita laço de reinícios)
+const RESPAWN_DELAY = 1000;
+
+class ClusterManager {
+    constructor(options = config.cluster) {
+        this.size = options.workers || (os.availableParallelism ? os.availableParallelism() : os.cpus().length);
+        this.shutdownTimeout = options.shutdownTimeout;
+        this.stopping = false;
+        this.restarting = false;
+        this.rateLimits = new WindowCounter();
+        this.lastRendered = new Map(); // worker.id -> última leitura de /metrics
+        this.retired = ''; // contadores e histogramas dos workers que já saíram
+    }
+
+    async start() {
+        // Schema criado antes dos workers, que então só abrem o banco
+        await database.init();
+        await database.close();
+
+        this.rateLimits.serve();
+        ipc.handle('metrics:collect', () => this.collectMetrics());
+        ipc.servePrimary();
+
+        cluster.setupPrimary({ exec: path.join(__dirname, 'server.js') });
+        cluster.on('exit', (worker, code, signal) => this.onExit(worker, code, signal));
+
+        await Promise.all(Array.from({ length: this.size }, () => this.fork()));
+        console.log(`🚀 Cluster com ${this.size} workers na porta ${config.port} (primário pid ${process.pid})`);
+    }
+
+    // Inicia um worker e aguarda ele aceitar conexões
+    fork() {
+        const worker = cluster.fork();
+
+        return new Promise((resolve, reject) => {
+            const onListening = () => {
+                worker.off('exit', onExit);
+                resolve(worker);
+            };
+            const onExit = (code) => {
+                worker.off('listening', onListening);
+                reject(new Error(`Worker ${worker.id} saiu durante a inicialização (código ${code})`));
+            };
+            worker.once('listening', onListening);
+            worker.once('exit', onExit);
+        });
+    }
+
+    // O worker para de aceitar conexões, conclui as em andamento, entrega as
+    // métricas finais e só então é desconectado (e sai)
+    async stopWorker(worker) {
+        if (worker.isDead()) return;
+
+        const exited = new Promise(resolve => worker.once('exit', resolve));
+        const timer = setTimeout(() => worker.process.kill('SIGKILL'), this.shutdownTimeout);
+
+        try {
+            const final = await ipc.requestWorker(worker, 'cluster:drain', null, this.shutdownTimeout);
+            this.lastRendered.set(worker.id, final);
+        } catch (error) {
+            // Sem resposta: fica valendo a última leitura de /metrics
+        }
+        if (worker.isConnected()) {
+            worker.disconnect();
+        }
+
+        await exited;
+        clearTimeout(timer);
+    }
+
+    // Guarda os contadores do worker que saiu (final ou, se caiu, a última leitura)
+    retire(worker) {
+        const last = this.lastRendered.get(worker.id);
+        this.lastRendered.delete(worker.id);
+        if (last) {
+            this.retired = mergeRendered([this.retired, last], { cumulativeOnly: true });
+        }
+    }
+
+    onExit(worker, code, signal) {
+        this.retire(worker);
+        if (this.stopping || worker.exitedAfterDisconnect) return;
+
+        console.warn(`⚠️ Worker ${worker.id} caiu (${signal || code}), repondo em ${RESPAWN_DELAY}ms`);
+        setTimeout(() => {
+            if (!this.stopping) {
+                this.fork().catch(error => console.error('❌ Falha ao repor worker:', error.message));
+            }
+        }, RESPAWN_DELAY);
+    }
+
+    /**
+     * Reinício gradual: cada worker só é parado depois que o substituto está
+     * escutando, então sempre há workers aceitando conexões (carrega código novo)
+     */
+    async rollingRestart() {
+        if (this.restarting || this.stopping) return;
+        this.restarting = true;
+        console.log('🔄 Reinício gradual dos workers');
+
+        try {
+            for (const worker of Object.values(cluster.workers)) {
+                const replacement = await this.fork();
+                await this.stopWorker(worker);
+                console.log(`🔄 Worker ${worker.id} substituído pelo ${replacement.id}`);
+            }
+            console.log('✅ Reinício gradual concluído');
+        } catch (error) {
+            // Substituto não subiu: os workers antigos que restam continuam atendendo
+            console.error('❌ Reinício gradual interrompido:', error.message);
+        } finally {
+            this.restarting = false;
+        }
+    }
+
+    async stop(signal) {
+        if (this.stopping) return;
+        this.stopping = true;
+        console.log(`🛑 Encerrando cluster (${signal})`);
+
+        await Promise.all(Object.values(cluster.workers).map(worker => this.stopWorker(worker)));
+        process.exit(0);
+    }
+
+    async collectMetrics() {
+        const workers = Object.values(cluster.workers);
+        const results = await Promise.allSettled(workers.map(worker => ipc.requestWorker(worker, 'metrics:render')));
+
+        const rendered = [];
+        results.forEach((result, i) => {
+            if (result.status === 'fulfilled') {
+                this.lastRendered.set(workers[i].id, result.value);
+                rendered.push(result.value);
+            }
+        });
+
+        // Quantos workers responderam (usado pelos testes para saber se o cluster está completo)
+        return mergeRendered([this.retired, ...rendered]) +
+            '# HELP cluster_workers Workers que responderam a esta coleta\n' +
+            '# TYPE cluster_workers gauge\n' +
+            `cluster_workers ${rendered.length}\n`;
+    }
+}
+
+if (require.main === module) {
+    const manager = new ClusterManager();
+
+    manager.start().catch(error => {
+        console.error('❌ Falha ao iniciar o cluster:', error);
+        process.exit(1);
+    });
+
+    process.on('SIGHUP', () => manager.rollingRestart());
+    ['SIGINT', 'SIGTERM'].forEach(signal => process.on(signal, () => manager.stop(signal)));
+}
+
+module.exports = ClusterManager;
@@ -6,9 +6,47 @@ module.exports = {
     jwtSecret: process.env.JWT_SECRET || 'seu-secret-aqui',
     jwtExpiration: '24h',
     
+    // SQLite (WAL): pool de leitura, cache de statements e group commit das escritas
+    database: {
+        path: process.env.DB_PATH, // padrão: database/tasks.db
+        readers: process.env.DB_READERS !== undefined ? parseInt(process.env.DB_READERS) : 4,
+        statementCacheSize: parseInt(process.env.DB_STATEMENT_CACHE) || 200,
+        writeBatchSize: parseInt(process.env.DB_WRITE_BATCH) || 256,
+        synchronous: process.env.DB_SYNCHRONOUS || 'NORMAL',
+        busyTimeout: 5000
+    },
+    
+    // Criação em lote (POST /api/tasks/batch): itens por requisição
+    batch: {
+        maxItems: parseInt(process.env.BATCH_MAX_ITEMS) || 5000
+    },
+    
     // Rate limiting
     rateLimit: {
         windowMs: 15 * 60 * 1000, // 15 minutos
-        max: 1000 // máximo 1000 requests por IP
+        max: parseInt(process.env.RATE_LIMIT_MAX) || 1000 // máximo de requests por IP
+    },
+    
+    // Cache de respostas: L1 em memória (LRU) e, opcionalmente, L2 compartilhado
+    cache: {
+        maxEntries: parseInt(process.env.CACHE_MAX_ENTRIES) || 1000,
+        maxBytes: parseInt(process.env.CACHE_MAX_BYTES) || 16 * 1024 * 1024, // 16 MB
+        backend: process.env.CACHE_BACKEND || 'memory', // 'memory' | 'sqlite'
+        sharedPath: process.env.CACHE_SHARED_PATH || require('path').join(__dirname, '../database/cache.db'),
+        pollInterval: parseInt(process.env.CACHE_POLL_INTERVAL) || 250 // propagação de invalidações (ms)
+    },
+
+    // Cluster (node cluster.js): workers e prazo para concluir requisições ao parar um worker
+    cluster: {
+        workers: parseInt(process.env.CLUSTER_WORKERS) || 0, // 0: um por núcleo
+        shutdownTimeout: parseInt(process.env.CLUSTER_SHUTDOWN_TIMEOUT) || 10000
+    },
+
+    // Logs: escrita em arquivo assíncrona e em lotes
+    logging: {
+        console: process.env.LOG_CONSOLE !== 'false',
+        bufferEntries: parseInt(process.env.LOG_BUFFER_ENTRIES) || 10000, // acima disso descarta (exceto ERROR)
+        flushBytes: parseInt(process.env.LOG_FLUSH_BYTES) || 64 * 1024,
+        flushInterval: parseInt(process.env.LOG_FLUSH_INTERVAL) || 100 // ms
     }
 };
\ No newline at end of file
@@ -0,0 +1,217 @@
+const sqlite3 = require('sqlite3').verbose();
+
+/**
+ * Cache compartilhado (L2) em SQLite
+ *
+ * Vários processos (workers do cluster ou instâncias na mesma máquina) abrem o
+ * mesmo arquivo em modo WAL. Além das entradas, a tabela cache_invalidations
+ * funciona como um log de invalidações: cada processo consulta periodicamente
+ * as linhas novas e aplica as tags no seu cache local (L1).
+ */
+class SqliteCacheStore {
+    constructor(filePath) {
+        this.filePath = filePath;
+        this.db = null;
+        this.ready = null;
+        this.lock = Promise.resolve();
+    }
+
+    init() {
+        if (!this.ready) {
+            this.ready = new Promise((resolve, reject) => {
+                this.db = new sqlite3.Database(this.filePath, (err) => {
+                    if (err) return reject(err);
+                    this.createTables().then(resolve, reject);
+                });
+            });
+        }
+        return this.ready;
+    }
+
+    async createTables() {
+        await this.run('PRAGMA journal_mode = WAL');
+        await this.run('PRAGMA synchronous = NORMAL');
+        await this.run('PRAGMA busy_timeout = 5000');
+
+        await this.run(`
+            CREATE TABLE IF NOT EXISTS cache_entries (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                tags TEXT NOT NULL,
+                expiresAt INTEGER NOT NULL
+            )`);
+        await this.run(`
+            CREATE TABLE IF NOT EXISTS cache_tags (
+                tag TEXT NOT NULL,
+                key TEXT NOT NULL,
+                PRIMARY KEY (tag, key)
+            )`);
+        await this.run('CREATE INDEX IF NOT EXISTS idx_cache_tags_key ON cache_tags (key)');
+        await this.run(`
+            CREATE TABLE IF NOT EXISTS cache_invalidations (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                tag TEXT NOT NULL,
+                origin TEXT NOT NULL,
+                createdAt INTEGER NOT NULL
+            )`);
+        await this.run('CREATE INDEX IF NOT EXISTS idx_cache_invalidations_tag ON cache_invalidations (tag, createdAt)');
+    }
+
+    async get(key) {
+        await this.init();
+        const row = await this.getRow(
+            'SELECT value, tags, expiresAt FROM cache_entries WHERE key = ?',
+            [key]
+        );
+
+        if (!row || row.expiresAt < Date.now()) {
+            return null;
+        }
+
+        return {
+            data: JSON.parse(row.value),
+            tags: JSON.parse(row.tags),
+            expiresAt: row.expiresAt
+        };
+    }
+
+    /**
+     * Grava a entrada. Com `since` (momento em que a consulta ao banco começou),
+     * a gravação é descartada se alguma das tags foi invalidada desde então:
+     * o dado pode ser anterior à escrita que causou a invalidação. A verificação
+     * e a gravação ficam na mesma transação, serializada com invalidateTag.
+     * Retorna false quando a entrada foi descartada.
+     */
+    async set(key, data, ttl, tags = [], since = null) {
+        await this.init();
+        const expiresAt = Date.now() + ttl;
+
+        return this.transaction(async () => {
+            if (since !== null && tags.length > 0) {
+                const invalidated = await this.getRow(
+                    `SELECT 1 AS found FROM cache_invalidations
+                     WHERE tag IN (${tags.map(() => '?').join(', ')}) AND createdAt >= ? LIMIT 1`,
+                    [...tags, since]
+                );
+                if (invalidated) {
+                    return false;
+                }
+            }
+
+            await this.run(
+                'INSERT OR REPLACE INTO cache_entries (key, value, tags, expiresAt) VALUES (?, ?, ?, ?)',
+                [key, JSON.stringify(data), JSON.stringify(tags), expiresAt]
+            );
+            await this.run('DELETE FROM cache_tags WHERE key = ?', [key]);
+            for (const tag of tags) {
+                await this.run('INSERT OR IGNORE INTO cache_tags (tag, key) VALUES (?, ?)', [tag, key]);
+            }
+            return true;
+        });
+    }
+
+    // Remove as entradas da tag e registra a invalidação para os outros processos
+    async invalidateTag(tag, origin) {
+        await this.init();
+        const keysOfTag = 'SELECT key FROM cache_tags WHERE tag = ?';
+
+        await this.transaction([
+            [`DELETE FROM cache_entries WHERE key IN (${keysOfTag})`, [tag]],
+            [`DELETE FROM cache_tags WHERE key IN (${keysOfTag})`, [tag]],
+            [
+                'INSERT INTO cache_invalidations (tag, origin, createdAt) VALUES (?, ?, ?)',
+                [tag, origin, Date.now()]
+            ]
+        ]);
+    }
+
+    async lastInvalidationId() {
+        await this.init();
+        const row = await this.getRow('SELECT MAX(id) as id FROM cache_invalidations');
+        return row?.id || 0;
+    }
+
+    async invalidationsSince(id) {
+        await this.init();
+        return this.all(
+            'SELECT id, tag, origin FROM cache_invalidations WHERE id > ? ORDER BY id',
+            [id]
+        );
+    }
+
+    // Limpeza de entradas expiradas e do log antigo de invalidações
+    async prune(logRetention = 60 * 1000) {
+        await this.init();
+        const now = Date.now();
+        await this.run('DELETE FROM cache_tags WHERE key IN (SELECT key FROM cache_entries WHERE expiresAt < ?)', [now]);
+        await this.run('DELETE FROM cache_entries WHERE expiresAt < ?', [now]);
+        await this.run('DELETE FROM cache_invalidations WHERE createdAt < ?', [now - logRetention]);
+    }
+
+    async getStats() {
+        await this.init();
+        const entries = await this.getRow('SELECT COUNT(*) as count, SUM(LENGTH(value)) as bytes FROM cache_entries');
+        return {
+            backend: 'sqlite',
+            file: this.filePath,
+            entries: entries.count,
+            bytes: entries.bytes || 0
+        };
+    }
+
+    // Transações na mesma conexão são enfileiradas para não se sobreporem
+    // (recebe uma lista de [sql, params] ou uma função assíncrona)
+    transaction(work) {
+        const statements = work;
+        if (typeof work !== 'function') {
+            work = async () => {
+                for (const [sql, params] of statements) {
+                    await this.run(sql, params);
+                }
+            };
+        }
+
+        const result = this.lock.then(async () => {
+            await this.run('BEGIN IMMEDIATE');
+            try {
+                const value = await work();
+                await this.run('COMMIT');
+                return value;
+            } catch (error) {
+                await this.run('ROLLBACK').catch(() => {});
+                throw error;
+            }
+        });
+        this.lock = result.catch(() => {});
+        return result;
+    }
+
+    run(sql, params = []) {
+        return new Promise((resolve, reject) => {
+            this.db.run(sql, params, function(err) {
+                if (err) reject(err);
+                else resolve({ changes: this.changes });
+            });
+        });
+    }
+
+    getRow(sql, params = []) {
+        return new Promise((resolve, reject) => {
+            this.db.get(sql, params, (err, row) => {
+                if (err) reject(err);
+                else resolve(row);
+            });
+        });
+    }
+
+    all(sql, params = []) {
+        return new Promise((resolve, reject) => {
+            this.db.all(sql, params, (err, rows) => {
+                if (err) reject(err);
+                else resolve(rows);
+            });
+        });
+    }
+}
+
+module.exports = SqliteCacheStore;
@@ -1,15 +1,140 @@
 const sqlite3 = require('sqlite3').verbose();
 const path = require('path');
+const config = require('../config/database');
+const metrics = require('../middleware/metrics');
 
+// Só comandos DML/consultas vão para o cache de statements
+const CACHEABLE_SQL = /^\s*(SELECT|INSERT|UPDATE|DELETE|REPLACE|WITH)\b/i;
+
+/**
+ * Conexão SQLite com cache LRU de prepared statements, chaveado pelo SQL
+ */
+class Connection {
+    constructor(db, cacheSize) {
+        this.db = db;
+        this.cacheSize = cacheSize;
+        this.statements = new Map();
+        this.pending = 0;
+    }
+
+    static open(filePath, mode, cacheSize) {
+        return new Promise((resolve, reject) => {
+            const db = new sqlite3.Database(filePath, mode, (err) => {
+                if (err) reject(err);
+                else resolve(new Connection(db, cacheSize));
+            });
+        });
+    }
+
+    // Retorna a promessa do statement preparado (cacheada por SQL)
+    statement(sql) {
+        let prepared = this.statements.get(sql);
+        if (prepared) {
+            // Renovar a posição no LRU
+            this.statements.delete(sql);
+        } else {
+            prepared = new Promise((resolve, reject) => {
+                const stmt = this.db.prepare(sql, (err) => {
+                    if (err) {
+                        // SQL inválido não fica no cache
+                        if (this.statements.get(sql) === prepared) {
+                            this.statements.delete(sql);
+                        }
+                        reject(err);
+                    } else {
+                        resolve(stmt);
+                    }
+                });
+            });
+
+            if (this.statements.size >= this.cacheSize) {
+                const [oldestSql, oldest] = this.statements.entries().next().value;
+                this.statements.delete(oldestSql);
+                oldest.then(stmt => stmt.finalize(), () => {});
+            }
+        }
+        this.statements.set(sql, prepared);
+        return prepared;
+    }
+
+    // method: 'run' | 'get' | 'all'
+    async execute(method, sql, params = []) {
+        this.pending++;
+        try {
+            if (this.cacheSize > 0 && CACHEABLE_SQL.test(sql)) {
+                const stmt = await this.statement(sql);
+                return await this.call(stmt, method, [params], method === 'get');
+            }
+            return await this.call(this.db, method, [sql, params], false);
+        } finally {
+            this.pending--;
+        }
+    }
+
+    call(target, method, args, reset) {
+        return new Promise((resolve, reject) => {
+            target[method](...args, function(err, result) {
+                if (err) reject(err);
+                else resolve(method === 'run' ? { id: this.lastID, changes: this.changes } : result);
+            });
+
+            // get() para na primeira linha: resetar para não manter a leitura aberta
+            if (reset) {
+                target.reset(() => {});
+            }
+        });
+    }
+
+    async close() {
+        const statements = await Promise.allSettled(this.statements.values());
+        statements.forEach(({ value }) => value && value.finalize());
+        this.statements.clear();
+        return new Promise((resolve) => this.db.close(() => resolve()));
+    }
+}
+
+/**
+ * Camada de acesso ao SQLite
+ *
+ * Em modo WAL, leitores não bloqueiam o escritor: as consultas (get/all) são
+ * distribuídas entre um pool de conexões somente leitura, e todas as escritas
+ * (run) passam por uma única conexão. Escritas concorrentes são enfileiradas e
+ * gravadas em lote em uma única transação (group commit), trocando um fsync por
+ * requisição por um fsync por lote.
+ */
 class Database {
-    constructor() {
-        this.dbPath = path.join(__dirname, 'tasks.db');
+    constructor(options = config.database) {
+        this.options = options;
+        this.dbPath = options.path || path.join(__dirname, 'tasks.db');
         this.db = null;
+        this.writer = null;
+        this.readers = [];
+        this.nextReader = 0;
+        this.writeQueue = [];
+        this.writing = false;
+        this.stats = { batches: 0, batchedWrites: 0, maxBatch: 0, retriedWrites: 0 };
     }
 
     async init() {
-        this.db = new sqlite3.Database(this.dbPath);
+        this.writer = await Connection.open(
+            this.dbPath,
+            sqlite3.OPEN_READWRITE | sqlite3.OPEN_CREATE,
+            this.options.statementCacheSize
+        );
+        this.db = this.writer.db;
+
+        // busy_timeout primeiro: no cluster vários workers abrem o banco ao mesmo tempo
+        await this.direct('run', `PRAGMA busy_timeout = ${this.options.busyTimeout}`);
+        await this.direct('run', 'PRAGMA journal_mode = WAL');
+        await this.direct('run', `PRAGMA synchronous = ${this.options.synchronous}`);
         await this.createTables();
+
+        for (let i = 0; i < this.options.readers; i++) {
+            const reader = await Connection.open(this.dbPath, sqlite3.OPEN_READONLY, this.options.statementCacheSize);
+            await reader.execute('run', `PRAGMA busy_timeout = ${this.options.busyTimeout}`);
+            this.readers.push(reader);
+        }
+
         console.log('✅ Database inicializado');
     }
 
@@ -41,39 +166,326 @@ class Database {
                 FOREIGN KEY (userId) REFERENCES users (id)
             )`;
 
-        await this.run(userTable);
-        await this.run(taskTable);
+        await this.direct('run', userTable);
+        await this.direct('run', taskTable);
+        await this.createIndexes();
+        await this.createTagTable();
+        await this.createSearchIndex();
         
         return Promise.resolve();
     }
 
-    // Métodos auxiliares para promisificar SQLite
+    // Índices compostos para os filtros da listagem (sempre por usuário, ordenados por data)
+    async createIndexes() {
+        const indexes = [
+            'CREATE INDEX IF NOT EXISTS idx_tasks_user_created ON tasks (userId, createdAt, id)',
+            'CREATE INDEX IF NOT EXISTS idx_tasks_user_completed ON tasks (userId, completed, createdAt, id)',
+            'CREATE INDEX IF NOT EXISTS idx_tasks_user_priority ON tasks (userId, priority, createdAt, id)',
+            'CREATE INDEX IF NOT EXISTS idx_tasks_user_category ON tasks (userId, category, createdAt, id)',
+            'CREATE INDEX IF NOT EXISTS idx_tasks_user_due ON tasks (userId, dueDate)'
+        ];
+
+        for (const sql of indexes) {
+            await this.direct('run', sql);
+        }
+    }
+
+    // Tags normalizadas, mantidas por triggers a partir da coluna JSON tasks.tags
+    async createTagTable() {
+        const exists = await this.tableExists('task_tags');
+
+        await this.direct('run', `
+            CREATE TABLE IF NOT EXISTS task_tags (
+                taskId TEXT NOT NULL,
+                userId TEXT NOT NULL,
+                tag TEXT NOT NULL,
+                PRIMARY KEY (taskId, tag)
+            )`);
+        await this.direct('run', 'CREATE INDEX IF NOT EXISTS idx_task_tags_user_tag ON task_tags (userId, tag)');
+
+        const tagsOf = (row) => `json_each(CASE WHEN json_valid(${row}.tags) THEN ${row}.tags ELSE '[]' END)`;
+
+        await this.direct('run', `
+            CREATE TRIGGER IF NOT EXISTS tasks_tags_insert AFTER INSERT ON tasks BEGIN
+                INSERT OR IGNORE INTO task_tags (taskId, userId, tag)
+                SELECT new.id, new.userId, value FROM ${tagsOf('new')};
+            END`);
+        await this.direct('run', `
+            CREATE TRIGGER IF NOT EXISTS tasks_tags_update AFTER UPDATE OF tags ON tasks BEGIN
+                DELETE FROM task_tags WHERE taskId = old.id;
+                INSERT OR IGNORE INTO task_tags (taskId, userId, tag)
+                SELECT new.id, new.userId, value FROM ${tagsOf('new')};
+            END`);
+        await this.direct('run', `
+            CREATE TRIGGER IF NOT EXISTS tasks_tags_delete AFTER DELETE ON tasks BEGIN
+                DELETE FROM task_tags WHERE taskId = old.id;
+            END`);
+
+        // Banco criado antes da tabela: popular a partir das tarefas existentes
+        if (!exists) {
+            await this.direct('run', `
+                INSERT OR IGNORE INTO task_tags (taskId, userId, tag)
+                SELECT tasks.id, tasks.userId, value FROM tasks, ${tagsOf('tasks')}`);
+        }
+    }
+
+    // Índice de texto completo (FTS5) de título e descrição, sincronizado por triggers.
+    // O índice aponta para o rowid implícito de tasks (a chave primária é TEXT), que o VACUUM
+    // pode renumerar: por isso ele é conferido contra a tabela a cada inicialização
+    async createSearchIndex() {
+        const exists = await this.tableExists('tasks_fts');
+
+        await this.direct('run', `
+            CREATE VIRTUAL TABLE IF NOT EXISTS tasks_fts USING fts5(
+                title, description,
+                content='tasks', content_rowid='rowid',
+                tokenize='unicode61 remove_diacritics 2'
+            )`);
+
+        await this.direct('run', `
+            CREATE TRIGGER IF NOT EXISTS tasks_fts_insert AFTER INSERT ON tasks BEGIN
+                INSERT INTO tasks_fts (rowid, title, description) VALUES (new.rowid, new.title, new.description);
+            END`);
+        await this.direct('run', `
+            CREATE TRIGGER IF NOT EXISTS tasks_fts_update AFTER UPDATE OF title, description ON tasks BEGIN
+                INSERT INTO tasks_fts (tasks_fts, rowid, title, description) VALUES ('delete', old.rowid, old.title, old.description);
+                INSERT INTO tasks_fts (rowid, title, description) VALUES (new.rowid, new.title, new.description);
+            END`);
+        await this.direct('run', `
+            CREATE TRIGGER IF NOT EXISTS tasks_fts_delete AFTER DELETE ON tasks BEGIN
+                INSERT INTO tasks_fts (tasks_fts, rowid, title, description) VALUES ('delete', old.rowid, old.title, old.description);
+            END`);
+
+        if (!exists) {
+            await this.rebuildSearchIndex();
+        } else if (!(await this.searchIndexInSync())) {
+            console.warn('⚠️ Índice de busca fora de sincronia com tasks (rowids renumerados?): reconstruindo');
+            await this.rebuildSearchIndex();
+        }
+    }
+
+    // integrity-check com rank = 1 compara o índice com o conteúdo atual de tasks
+    async searchIndexInSync() {
+        try {
+            await this.direct('run', "INSERT INTO tasks_fts (tasks_fts, rank) VALUES ('integrity-check', 1)");
+            return true;
+        } catch (error) {
+            if (error.code === 'SQLITE_CORRUPT') {
+                return false;
+            }
+            throw error;
+        }
+    }
+
+    rebuildSearchIndex() {
+        return this.direct('run', "INSERT INTO tasks_fts (tasks_fts) VALUES ('rebuild')");
+    }
+
+    // VACUUM seguido da reconstrução do índice de busca (usar sem escritas em andamento)
+    async vacuum() {
+        await this.direct('run', 'VACUUM');
+        await this.rebuildSearchIndex();
+    }
+
+    async tableExists(name) {
+        const row = await this.direct('get', 'SELECT name FROM sqlite_master WHERE name = ?', [name]);
+        return !!row;
+    }
+
+    // SQL executado direto na conexão de escrita, fora do lote (DDL, PRAGMA)
+    direct(method, sql, params = []) {
+        return this.writer.execute(method, sql, params);
+    }
+
+    // Leitor com menos consultas pendentes (round-robin no empate)
+    reader() {
+        if (this.readers.length === 0) {
+            return this.writer;
+        }
+
+        let best = null;
+        for (let i = 0; i < this.readers.length; i++) {
+            const reader = this.readers[(this.nextReader + i) % this.readers.length];
+            if (!best || reader.pending < best.pending) {
+                best = reader;
+            }
+        }
+        this.nextReader = (this.nextReader + 1) % this.readers.length;
+        return best;
+    }
+
+    // Escritas entram na fila do group commit
     run(sql, params = []) {
-        return new Promise((resolve, reject) => {
-            this.db.run(sql, params, function(err) {
-                if (err) reject(err);
-                else resolve({ id: this.lastID, changes: this.changes });
-            });
-        });
+        return metrics.timeQuery('run', sql, new Promise((resolve, reject) => {
+            this.writeQueue.push({ sql, params, resolve, reject });
+            if (!this.writing) {
+                this.writing = true;
+                setImmediate(() => this.flushWrites());
+            }
+        }));
+    }
+
+    /**
+     * Vários comandos gravados juntos em uma transação exclusiva (importações em lote)
+     *
+     * Violações de restrição afetam só o próprio comando; os demais são confirmados.
+     * @param {Array<{sql, params}>} ops
+     * @returns {Promise<Array<{value}|{error}>>} um resultado por comando, na mesma ordem
+     */
+    runBatch(ops) {
+        if (ops.length === 0) {
+            return Promise.resolve([]);
+        }
+        return metrics.timeQuery('batch', ops[0].sql, new Promise((resolve, reject) => {
+            this.writeQueue.push({ ops, resolve, reject });
+            if (!this.writing) {
+                this.writing = true;
+                setImmediate(() => this.flushWrites());
+            }
+        }));
     }
 
     get(sql, params = []) {
-        return new Promise((resolve, reject) => {
-            this.db.get(sql, params, (err, row) => {
-                if (err) reject(err);
-                else resolve(row);
-            });
-        });
+        return metrics.timeQuery('get', sql, this.reader().execute('get', sql, params));
     }
 
     all(sql, params = []) {
-        return new Promise((resolve, reject) => {
-            this.db.all(sql, params, (err, rows) => {
-                if (err) reject(err);
-                else resolve(rows);
-            });
+        return metrics.timeQuery('all', sql, this.reader().execute('all', sql, params));
+    }
+
+    async flushWrites() {
+        while (this.writeQueue.length > 0) {
+            if (this.writeQueue[0].ops) {
+                await this.writeBulk(this.writeQueue.shift());
+                continue;
+            }
+
+            // Lote até o limite ou até o próximo runBatch (que tem transação própria)
+            let size = 0;
+            while (size < this.writeQueue.length && size < this.options.writeBatchSize && !this.writeQueue[size].ops) {
+                size++;
+            }
+            const batch = this.writeQueue.splice(0, size);
+            this.stats.batches++;
+            this.stats.batchedWrites += batch.length;
+            this.stats.maxBatch = Math.max(this.stats.maxBatch, batch.length);
+
+            if (batch.length === 1) {
+                await this.writeOne(batch[0]);
+            } else {
+                await this.writeBatch(batch);
+            }
+        }
+        this.writing = false;
+    }
+
+    async writeOne(op) {
+        try {
+            op.resolve(await this.writer.execute('run', op.sql, op.params));
+        } catch (error) {
+            op.reject(error);
+        }
+    }
+
+    async writeBatch(batch) {
+        const results = [];
+
+        try {
+            await this.writer.execute('run', 'BEGIN IMMEDIATE');
+        } catch (error) {
+            batch.forEach(op => op.reject(error));
+            return;
+        }
+
+        try {
+            for (const op of batch) {
+                try {
+                    results.push({ op, value: await this.writer.execute('run', op.sql, op.params) });
+                } catch (error) {
+                    // Violação de restrição desfaz só o próprio comando; a transação continua
+                    if (error.code !== 'SQLITE_CONSTRAINT') {
+                        throw error;
+                    }
+                    results.push({ op, error });
+                }
+            }
+            await this.writer.execute('run', 'COMMIT');
+        } catch (error) {
+            // Falha que invalida a transação: desfazer e gravar um a um
+            await this.writer.execute('run', 'ROLLBACK').catch(() => {});
+            this.stats.retriedWrites += batch.length;
+            for (const op of batch) {
+                await this.writeOne(op);
+            }
+            return;
+        }
+
+        results.forEach(({ op, value, error }) => {
+            if (error) op.reject(error);
+            else op.resolve(value);
         });
     }
+
+    async writeBulk(bulk) {
+        this.stats.batches++;
+        this.stats.batchedWrites += bulk.ops.length;
+        this.stats.maxBatch = Math.max(this.stats.maxBatch, bulk.ops.length);
+
+        const results = [];
+        try {
+            await this.writer.execute('run', 'BEGIN IMMEDIATE');
+        } catch (error) {
+            bulk.reject(error);
+            return;
+        }
+
+        try {
+            for (const op of bulk.ops) {
+                try {
+                    results.push({ value: await this.writer.execute('run', op.sql, op.params) });
+                } catch (error) {
+                    if (error.code !== 'SQLITE_CONSTRAINT') {
+                        throw error;
+                    }
+                    results.push({ error });
+                }
+            }
+            await this.writer.execute('run', 'COMMIT');
+        } catch (error) {
+            await this.writer.execute('run', 'ROLLBACK').catch(() => {});
+            bulk.reject(error);
+            return;
+        }
+
+        bulk.resolve(results);
+    }
+
+    getStats() {
+        return {
+            ...this.stats,
+            queuedWrites: this.writeQueue.length,
+            readers: this.readers.map(reader => ({ pending: reader.pending, statements: reader.statements.size })),
+            writerStatements: this.writer ? this.writer.statements.size : 0
+        };
+    }
+
+    async close() {
+        while (this.writing) {
+            await new Promise(resolve => setImmediate(resolve));
+        }
+        await Promise.all(this.readers.map(reader => reader.close()));
+        this.readers = [];
+        if (this.writer) {
+            await this.writer.close();
+            this.writer = null;
+        }
+    }
 }
 
-module.exports = new Database();
\ No newline at end of file
+const database = new Database();
+
+metrics.callback('db_write_batches_total', 'Transações do group commit', 'counter', [], () => database.stats.batches);
+metrics.callback('db_batched_writes_total', 'Escritas gravadas pelo group commit', 'counter', [], () => database.stats.batchedWrites);
+metrics.callback('db_write_queue_length', 'Escritas aguardando o group commit', 'gauge', [], () => database.writeQueue.length);
+
+module.exports = database;
@@ -1,8 +1,30 @@
+const config = require('../config/database');
+const metrics = require('./metrics');
+const ipc = require('./clusterIpc');
+
 class MemoryCache {
-    constructor() {
+    constructor(options = {}) {
+        // Map preserva ordem de inserção: o primeiro item é sempre o menos usado (LRU)
         this.cache = new Map();
-        this.maxSize = 100; // Máximo de 100 itens no cache
-        this.defaultTTL = 5 * 60 * 1000; // 5 minutos em milliseconds
+        // Índice secundário tag -> Set de chaves, para invalidar sem varrer o cache
+        this.tagIndex = new Map();
+        this.maxSize = options.maxEntries || 1000;
+        this.maxBytes = options.maxBytes || 16 * 1024 * 1024;
+        this.defaultTTL = options.defaultTTL || 5 * 60 * 1000; // 5 minutos em milliseconds
+        this.bytes = 0;
+        this.resetCounters();
+    }
+
+    resetCounters() {
+        this.counters = {
+            hits: 0,
+            misses: 0,
+            sets: 0,
+            evictions: 0,
+            expirations: 0,
+            invalidations: 0,
+            rejected: 0
+        };
     }
 
     // Gerar chave do cache baseada na requisição
@@ -15,73 +37,135 @@ class MemoryCache {
         return `${userId}:${endpoint}:${sortedQuery}`;
     }
 
+    // Tags usadas na invalidação
+    userTag(userId) {
+        return `user:${userId}`;
+    }
+
+    endpointTag(userId, endpoint) {
+        return `endpoint:${userId}:${endpoint}`;
+    }
+
     // Buscar item no cache
     get(key) {
         const item = this.cache.get(key);
         
         if (!item) {
+            this.counters.misses++;
             return null;
         }
 
         // Verificar se expirou
         if (Date.now() > item.expiresAt) {
-            this.cache.delete(key);
+            this.delete(key);
+            this.counters.expirations++;
+            this.counters.misses++;
             return null;
         }
 
-        // Atualizar timestamp de último acesso
-        item.lastAccessed = Date.now();
+        // Reinserir no fim do Map para marcar como mais recente (O(1))
+        this.cache.delete(key);
+        this.cache.set(key, item);
+
+        this.counters.hits++;
         return item.data;
     }
 
     // Armazenar item no cache
-    set(key, data, ttl = this.defaultTTL) {
-        // Se cache está cheio, remover item mais antigo
-        if (this.cache.size >= this.maxSize) {
-            this.evictOldest();
+    set(key, data, ttl = this.defaultTTL, tags = []) {
+        const size = Buffer.byteLength(JSON.stringify(data));
+
+        // Item maior que o orçamento inteiro não é cacheado
+        if (size > this.maxBytes) {
+            this.counters.rejected++;
+            return false;
+        }
+
+        if (this.cache.has(key)) {
+            this.delete(key);
         }
 
+        const now = Date.now();
         const item = {
             data,
-            createdAt: Date.now(),
-            lastAccessed: Date.now(),
-            expiresAt: Date.now() + ttl
+            size,
+            tags,
+            createdAt: now,
+            expiresAt: now + ttl
         };
 
         this.cache.set(key, item);
+        this.bytes += size;
+        tags.forEach(tag => {
+            if (!this.tagIndex.has(tag)) {
+                this.tagIndex.set(tag, new Set());
+            }
+            this.tagIndex.get(tag).add(key);
+        });
+        this.counters.sets++;
+
+        // Remover itens menos usados até caber no limite de itens e de bytes
+        while (this.cache.size > this.maxSize || this.bytes > this.maxBytes) {
+            this.evictOldest();
+        }
+
+        return true;
     }
 
-    // Remover item mais antigo (LRU - Least Recently Used)
-    evictOldest() {
-        let oldestKey = null;
-        let oldestTime = Date.now();
+    // Remover item e suas referências no índice de tags
+    delete(key) {
+        const item = this.cache.get(key);
+        if (!item) {
+            return false;
+        }
 
-        for (const [key, item] of this.cache.entries()) {
-            if (item.lastAccessed < oldestTime) {
-                oldestTime = item.lastAccessed;
-                oldestKey = key;
+        this.cache.delete(key);
+        this.bytes -= item.size;
+        item.tags.forEach(tag => {
+            const keys = this.tagIndex.get(tag);
+            if (keys) {
+                keys.delete(key);
+                if (keys.size === 0) {
+                    this.tagIndex.delete(tag);
+                }
             }
+        });
+        return true;
+    }
+
+    // Remover item mais antigo (LRU - Least Recently Used)
+    evictOldest() {
+        const oldestKey = this.cache.keys().next().value;
+        if (oldestKey !== undefined) {
+            this.delete(oldestKey);
+            this.counters.evictions++;
         }
+    }
 
-        if (oldestKey) {
-            this.cache.delete(oldestKey);
+    // Invalidar todas as chaves de uma tag (só toca as entradas afetadas)
+    invalidateTag(tag) {
+        const keys = this.tagIndex.get(tag);
+        if (!keys) {
+            return 0;
         }
+
+        const count = keys.size;
+        Array.from(keys).forEach(key => this.delete(key));
+        this.counters.invalidations += count;
+        return count;
     }
 
     // Invalidar cache para um usuário específico
     invalidateUser(userId) {
-        const keysToDelete = [];
-        
-        for (const key of this.cache.keys()) {
-            if (key.startsWith(`${userId}:`)) {
-                keysToDelete.push(key);
-            }
-        }
+        return this.invalidateTag(this.userTag(userId));
+    }
 
-        keysToDelete.forEach(key => this.cache.delete(key));
+    // Invalidar cache de um endpoint de um usuário
+    invalidateEndpoint(userId, endpoint) {
+        return this.invalidateTag(this.endpointTag(userId, endpoint));
     }
 
-    // Invalidar cache por padrão
+    // Invalidar cache por padrão (varre todas as chaves; preferir as tags acima)
     invalidatePattern(pattern) {
         const keysToDelete = [];
         
@@ -91,37 +175,267 @@ class MemoryCache {
             }
         }
 
-        keysToDelete.forEach(key => this.cache.delete(key));
+        keysToDelete.forEach(key => this.delete(key));
+        this.counters.invalidations += keysToDelete.length;
+        return keysToDelete.length;
     }
 
     // Limpar todo o cache
     clear() {
         this.cache.clear();
+        this.tagIndex.clear();
+        this.bytes = 0;
     }
 
     // Estatísticas do cache
     getStats() {
         const items = Array.from(this.cache.values());
         const now = Date.now();
+        const lookups = this.counters.hits + this.counters.misses;
         
         return {
             size: this.cache.size,
             maxSize: this.maxSize,
             usage: `${((this.cache.size / this.maxSize) * 100).toFixed(1)}%`,
+            bytes: this.bytes,
+            maxBytes: this.maxBytes,
+            bytesUsage: `${((this.bytes / this.maxBytes) * 100).toFixed(1)}%`,
+            tags: this.tagIndex.size,
+            ...this.counters,
+            hitRate: lookups > 0 ? `${((this.counters.hits / lookups) * 100).toFixed(1)}%` : '0.0%',
             items: items.map(item => ({
                 age: Math.round((now - item.createdAt) / 1000),
-                ttl: Math.round((item.expiresAt - now) / 1000)
+                ttl: Math.round((item.expiresAt - now) / 1000),
+                size: item.size
             }))
         };
     }
 }
 
+/**
+ * Cache em camadas
+ *
+ * L1 é o MemoryCache local do processo. Com o backend 'sqlite', L2 é um arquivo
+ * compartilhado entre workers/instâncias: um miss no L1 consulta o L2 e as
+ * invalidações são gravadas em um log que os outros processos aplicam no seu
+ * L1 a cada pollInterval. Com o backend 'memory' (padrão) só existe o L1.
+ * No cluster (cluster.js) as invalidações também são enviadas na hora aos
+ * outros workers por IPC, sem esperar o polling (ou sem L2 algum).
+ *
+ * Também coalesce misses concorrentes da mesma chave: a primeira requisição
+ * executa a consulta e as demais aguardam o resultado dela.
+ *
+ * Um miss que termina depois de uma invalidação das suas tags não é gravado
+ * (nem no L1 nem no L2): a consulta pode ter lido o banco antes da escrita.
+ */
+
+// Por quanto tempo lembrar das invalidações locais (maior que qualquer consulta)
+const INVALIDATION_MEMORY = 60 * 1000;
+
+class TieredCache {
+    constructor(l1, l2 = null, options = {}) {
+        this.l1 = l1;
+        this.l2 = l2;
+        this.origin = `${process.pid}-${Math.random().toString(36).substr(2, 6)}`;
+        this.inflight = new Map();
+        this.counters = { l2Hits: 0, coalesced: 0, remoteInvalidations: 0, errors: 0 };
+        this.lastInvalidationId = 0;
+        this.invalidatedAt = new Map(); // tag -> última invalidação vista por este processo
+
+        setInterval(() => this.pruneInvalidations(), INVALIDATION_MEMORY).unref();
+
+        if (this.l2) {
+            this.startInvalidationPolling(options.pollInterval || 250);
+        }
+
+        ipc.handle('cache:invalidate', ({ tag }) => {
+            this.invalidateLocal(tag);
+            this.counters.remoteInvalidations++;
+        });
+    }
+
+    generateKey(userId, endpoint, query = {}) {
+        return this.l1.generateKey(userId, endpoint, query);
+    }
+
+    userTag(userId) {
+        return this.l1.userTag(userId);
+    }
+
+    endpointTag(userId, endpoint) {
+        return this.l1.endpointTag(userId, endpoint);
+    }
+
+    // Retorna { data, source } ou null
+    async get(key) {
+        const data = this.l1.get(key);
+        if (data) {
+            return { data, source: 'l1' };
+        }
+
+        if (!this.l2) {
+            return null;
+        }
+
+        const entry = await this.l2.get(key);
+        if (!entry) {
+            return null;
+        }
+
+        // Promover para o L1 com o TTL restante
+        this.l1.set(key, entry.data, entry.expiresAt - Date.now(), entry.tags);
+        this.counters.l2Hits++;
+        return { data: entry.data, source: 'l2' };
+    }
+
+    // `since`: início da consulta que produziu o dado (descarta se houve invalidação depois)
+    async set(key, data, ttl, tags = [], since = null) {
+        if (since !== null && this.invalidatedSince(tags, since)) {
+            return false;
+        }
+
+        this.l1.set(key, data, ttl, tags);
+        if (this.l2 && !(await this.l2.set(key, data, ttl, tags, since))) {
+            // Invalidada em outro processo durante a consulta
+            this.l1.delete(key);
+            return false;
+        }
+        return true;
+    }
+
+    invalidateLocal(tag) {
+        this.invalidatedAt.set(tag, Date.now());
+        return this.l1.invalidateTag(tag);
+    }
+
+    invalidatedSince(tags, since) {
+        return tags.some(tag => (this.invalidatedAt.get(tag) || -Infinity) >= since);
+    }
+
+    pruneInvalidations(now = Date.now()) {
+        for (const [tag, at] of this.invalidatedAt) {
+            if (now - at > INVALIDATION_MEMORY) {
+                this.invalidatedAt.delete(tag);
+            }
+        }
+    }
+
+    async invalidateTag(tag) {
+        const count = this.invalidateLocal(tag);
+        ipc.broadcast('cache:invalidate', { tag });
+        if (this.l2) {
+            await this.l2.invalidateTag(tag, this.origin);
+        }
+        return count;
+    }
+
+    invalidateUser(userId) {
+        return this.invalidateTag(this.userTag(userId));
+    }
+
+    invalidateEndpoint(userId, endpoint) {
+        return this.invalidateTag(this.endpointTag(userId, endpoint));
+    }
+
+    // Coalescência: retorna a promessa do líder, ou null se esta requisição virou o líder.
+    // A promessa resolve com null se alguma das tags for invalidada depois que o líder começou,
+    // e quem aguarda faz a própria leitura em vez de receber o dado antigo
+    joinInflight(key, tags = []) {
+        const pending = this.inflight.get(key);
+        if (pending) {
+            this.counters.coalesced++;
+            return pending.promise.then(data =>
+                data && !this.invalidatedSince(pending.tags, pending.startedAt) ? data : null
+            );
+        }
+
+        let resolve;
+        const promise = new Promise(r => { resolve = r; });
+        this.inflight.set(key, { promise, resolve, tags, startedAt: Date.now() });
+        return null;
+    }
+
+    settleInflight(key, data) {
+        const pending = this.inflight.get(key);
+        if (pending) {
+            this.inflight.delete(key);
+            pending.resolve(data);
+        }
+    }
+
+    startInvalidationPolling(pollInterval) {
+        this.l2.lastInvalidationId()
+            .then(id => { this.lastInvalidationId = id; })
+            .catch(() => {});
+
+        const poll = async () => {
+            try {
+                const rows = await this.l2.invalidationsSince(this.lastInvalidationId);
+                rows.forEach(row => {
+                    this.lastInvalidationId = row.id;
+                    if (row.origin !== this.origin) {
+                        this.invalidateLocal(row.tag);
+                        this.counters.remoteInvalidations++;
+                    }
+                });
+            } catch (error) {
+                this.counters.errors++;
+            }
+        };
+
+        setInterval(poll, pollInterval).unref();
+        setInterval(() => this.l2.prune().catch(() => {}), 60 * 1000).unref();
+    }
+
+    async getStats() {
+        return {
+            ...this.l1.getStats(),
+            ...this.counters,
+            inflight: this.inflight.size,
+            l2: this.l2 ? await this.l2.getStats() : null
+        };
+    }
+}
+
+function createCache(options = {}) {
+    const l1 = new MemoryCache(options);
+
+    if (options.backend === 'sqlite') {
+        const SqliteCacheStore = require('../database/cacheStore');
+        return new TieredCache(l1, new SqliteCacheStore(options.sharedPath), options);
+    }
+
+    return new TieredCache(l1, null, options);
+}
+
 // Instância global do cache
-const memoryCache = new MemoryCache();
+const cache = createCache(config.cache);
+const memoryCache = cache.l1;
+
+metrics.callback('cache_entries', 'Entradas no cache L1', 'gauge', [], () => memoryCache.cache.size);
+metrics.callback('cache_bytes', 'Bytes ocupados no cache L1', 'gauge', [], () => memoryCache.bytes);
+metrics.callback('cache_evictions_total', 'Remoções do cache L1', 'counter', ['reason'], () => [
+    [['lru'], memoryCache.counters.evictions],
+    [['expired'], memoryCache.counters.expirations],
+    [['invalidated'], memoryCache.counters.invalidations]
+]);
+
+const sendFromCache = (req, res, cacheKey, data, source, meta) => {
+    metrics.cacheRequests.labels(meta.endpoint, source === 'coalesced' ? 'coalesced' : `hit_${source}`).inc();
+    if (req.logger) {
+        req.logger.cacheLog('hit', cacheKey, true, { ...meta, source });
+    }
+
+    // Adicionar header indicando que veio do cache
+    res.set('X-Cache', 'HIT');
+    res.set('X-Cache-Source', source);
+    res.set('X-Cache-Key', cacheKey);
+    return res.json(data);
+};
 
 // Middleware para cache de leitura
 const cacheMiddleware = (endpoint, ttl) => {
-    return (req, res, next) => {
+    return async (req, res, next) => {
         // Só cachear GET requests
         if (req.method !== 'GET') {
             return next();
@@ -132,36 +446,58 @@ const cacheMiddleware = (endpoint, ttl) => {
             return next();
         }
 
-        const cacheKey = memoryCache.generateKey(userId, endpoint, req.query);
-        const cachedData = memoryCache.get(cacheKey);
+        const cacheKey = cache.generateKey(userId, endpoint, req.query);
+        const tags = [cache.userTag(userId), cache.endpointTag(userId, endpoint)];
 
-        if (cachedData) {
-            // Log cache hit
+        try {
+            const cached = await cache.get(cacheKey);
+            if (cached) {
+                return sendFromCache(req, res, cacheKey, cached.data, cached.source, { endpoint, userId });
+            }
+
+            // Outra requisição já está buscando esta chave: aguardar o resultado dela
+            const pending = cache.joinInflight(cacheKey, tags);
+            if (pending) {
+                const data = await pending;
+                if (data) {
+                    return sendFromCache(req, res, cacheKey, data, 'coalesced', { endpoint, userId });
+                }
+                // Líder falhou ou o dado foi invalidado durante a consulta: seguir sem cache
+                return next();
+            }
+        } catch (error) {
+            // Falha no backend de cache não deve derrubar a requisição
             if (req.logger) {
-                req.logger.cacheLog('hit', cacheKey, true, { endpoint, userId });
+                req.logger.warn('Cache backend error', { requestId: req.requestId, error: error.message });
             }
-            
-            // Adicionar header indicando que veio do cache
-            res.set('X-Cache', 'HIT');
-            res.set('X-Cache-Key', cacheKey);
-            return res.json(cachedData);
+            return next();
         }
 
         // Log cache miss
+        metrics.cacheRequests.labels(endpoint, 'miss').inc();
         if (req.logger) {
             req.logger.cacheLog('miss', cacheKey, false, { endpoint, userId });
         }
 
+        // Garantir que quem aguarda seja liberado mesmo se a resposta não for JSON
+        res.on('close', () => cache.settleInflight(cacheKey, null));
+        const startedAt = Date.now();
+
         // Interceptar a resposta para cachear
         const originalJson = res.json;
         res.json = function(data) {
             // Só cachear respostas de sucesso
             if (data.success) {
-                memoryCache.set(cacheKey, data, ttl);
+                cache.set(cacheKey, data, ttl, tags, startedAt).catch(error => {
+                    if (req.logger) {
+                        req.logger.warn('Cache backend error', { requestId: req.requestId, error: error.message });
+                    }
+                });
                 if (req.logger) {
                     req.logger.cacheLog('set', cacheKey, false, { endpoint, userId, ttl });
                 }
             }
+            cache.settleInflight(cacheKey, data.success ? data : null);
             
             res.set('X-Cache', 'MISS');
             res.set('X-Cache-Key', cacheKey);
@@ -172,19 +508,29 @@ const cacheMiddleware = (endpoint, ttl) => {
     };
 };
 
+const invalidate = (req, promise) => {
+    return promise.catch(error => {
+        if (req.logger) {
+            req.logger.warn('Cache invalidation error', { requestId: req.requestId, error: error.message });
+        }
+    });
+};
+
 // Middleware para invalidar cache após modificações
 const invalidateCacheMiddleware = (patterns = []) => {
     return (req, res, next) => {
         const originalJson = res.json;
         
         res.json = function(data) {
+            const pending = [];
+
             // Se a operação foi bem-sucedida, invalidar cache
             if (data.success && req.user?.id) {
                 const userId = req.user.id;
                 
                 if (patterns.length > 0) {
                     patterns.forEach(pattern => {
-                        memoryCache.invalidatePattern(`${userId}:${pattern}`);
+                        pending.push(invalidate(req, cache.invalidateEndpoint(userId, pattern)));
                         if (req.logger) {
                             req.logger.cacheLog('invalidate', `${userId}:${pattern}`, false, { 
                                 patterns, 
@@ -195,7 +541,7 @@ const invalidateCacheMiddleware = (patterns = []) => {
                     });
                 } else {
                     // Invalidar todo o cache do usuário
-                    memoryCache.invalidateUser(userId);
+                    pending.push(invalidate(req, cache.invalidateUser(userId)));
                     if (req.logger) {
                         req.logger.cacheLog('invalidate-user', userId, false, { 
                             userId,
@@ -204,8 +550,15 @@ const invalidateCacheMiddleware = (patterns = []) => {
                     }
                 }
             }
-            
-            return originalJson.call(this, data);
+
+            if (pending.length === 0) {
+                return originalJson.call(this, data);
+            }
+
+            // Responder só depois que o L2 foi limpo: um GET logo após a escrita
+            // não pode encontrar (e promover ao L1) a entrada antiga
+            Promise.all(pending).then(() => originalJson.call(this, data));
+            return this;
         };
 
         next();
@@ -213,6 +566,10 @@ const invalidateCacheMiddleware = (patterns = []) => {
 };
 
 module.exports = {
+    MemoryCache,
+    TieredCache,
+    createCache,
+    cache,
     memoryCache,
     cacheMiddleware,
     invalidateCacheMiddleware
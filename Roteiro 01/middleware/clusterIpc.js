@@ -0,0 +1,130 @@
+const cluster = require('cluster');
+
+/**
+ * Mensagens entre o processo primário (cluster.js) e os workers
+ *
+ * - request(type, payload): o worker pergunta ao primário e aguarda a resposta
+ * - requestWorker(worker, type, payload): o primário pergunta a um worker
+ * - broadcast(type, payload): o worker avisa todos os outros (repassado pelo primário)
+ * - handle(type, fn): quem responde a um tipo de mensagem neste processo
+ *
+ * Fora do cluster (node server.js) isWorker é false e nada é enviado.
+ */
+
+const DEFAULT_TIMEOUT = 2000;
+
+const isWorker = cluster.isWorker === true && typeof process.send === 'function';
+
+const handlers = new Map();
+const pending = new Map(); // id -> { resolve, reject, timer }
+let nextId = 0;
+
+function handle(type, fn) {
+    handlers.set(type, fn);
+}
+
+async function dispatch(message, reply, source) {
+    const handler = handlers.get(message.type);
+
+    try {
+        if (!handler) {
+            throw new Error(`Mensagem sem handler: ${message.type}`);
+        }
+        const result = await handler(message.payload, source);
+        if (message.id) reply({ ipc: true, reply: message.id, result });
+    } catch (error) {
+        if (message.id) reply({ ipc: true, reply: message.id, error: error.message });
+    }
+}
+
+function settle(message) {
+    const entry = pending.get(message.reply);
+    if (!entry) return;
+
+    pending.delete(message.reply);
+    clearTimeout(entry.timer);
+    if (message.error !== undefined) {
+        entry.reject(new Error(message.error));
+    } else {
+        entry.resolve(message.result);
+    }
+}
+
+function send(target, type, payload, timeout) {
+    return new Promise((resolve, reject) => {
+        const id = ++nextId;
+        const timer = setTimeout(() => {
+            pending.delete(id);
+            reject(new Error(`Sem resposta para ${type} em ${timeout}ms`));
+        }, timeout);
+
+        pending.set(id, { resolve, reject, timer });
+        try {
+            target.send({ ipc: true, id, type, payload });
+        } catch (error) {
+            pending.delete(id);
+            clearTimeout(timer);
+            reject(error);
+        }
+    });
+}
+
+function request(type, payload, timeout = DEFAULT_TIMEOUT) {
+    if (!isWorker || !process.connected) {
+        return Promise.reject(new Error('Processo não está conectado a um primário'));
+    }
+    return send(process, type, payload, timeout);
+}
+
+function requestWorker(worker, type, payload, timeout = DEFAULT_TIMEOUT) {
+    if (!worker.isConnected()) {
+        return Promise.reject(new Error(`Worker ${worker.id} desconectado`));
+    }
+    return send(worker, type, payload, timeout);
+}
+
+function broadcast(type, payload) {
+    if (isWorker && process.connected) {
+        process.send({ ipc: true, broadcast: true, type, payload });
+    }
+}
+
+// Primário: responde aos workers e repassa os broadcasts
+function servePrimary() {
+    cluster.on('message', (worker, message) => {
+        if (!message || !message.ipc) return;
+
+        if (message.reply) {
+            settle(message);
+        } else if (message.broadcast) {
+            for (const other of Object.values(cluster.workers)) {
+                if (other !== worker && other.isConnected()) {
+                    other.send(message);
+                }
+            }
+        } else {
+            dispatch(message, reply => worker.isConnected() && worker.send(reply), worker);
+        }
+    });
+}
+
+if (isWorker) {
+    process.on('message', (message) => {
+        if (!message || !message.ipc) return;
+
+        if (message.reply) {
+            settle(message);
+        } else {
+            dispatch(message, reply => process.connected && process.send(reply));
+        }
+    });
+}
+
+module.exports = {
+    isWorker,
+    handle,
+    request,
+    requestWorker,
+    broadcast,
+    servePrimary
+};
@@ -1,8 +1,53 @@
 const fs = require('fs');
+const os = require('os');
 const path = require('path');
+const config = require('../config/database');
+
+function appendToFd(fd, data) {
+    return new Promise((resolve, reject) => {
+        fs.appendFile(fd, data, err => err ? reject(err) : resolve());
+    });
+}
+
+/**
+ * Buffer circular de capacidade fixa para as linhas pendentes de escrita
+ */
+class LogRingBuffer {
+    constructor(capacity) {
+        this.capacity = capacity;
+        this.items = new Array(capacity);
+        this.head = 0;
+        this.length = 0;
+        this.bytes = 0;
+    }
+
+    push(item) {
+        if (this.length === this.capacity) {
+            return false;
+        }
+        this.items[(this.head + this.length) % this.capacity] = item;
+        this.length++;
+        this.bytes += Buffer.byteLength(item.line);
+        return true;
+    }
+
+    // Remove e retorna todos os itens pendentes, na ordem de chegada
+    drain() {
+        const items = new Array(this.length);
+        for (let i = 0; i < this.length; i++) {
+            const index = (this.head + i) % this.capacity;
+            items[i] = this.items[index];
+            this.items[index] = undefined;
+        }
+        this.head = 0;
+        this.length = 0;
+        this.bytes = 0;
+        return items;
+    }
+}
 
 class Logger {
-    constructor() {
+    constructor(options = config.logging) {
         this.logLevels = {
             ERROR: 0,
             WARN: 1,
@@ -12,9 +57,26 @@ class Logger {
         
         this.currentLevel = this.logLevels.INFO;
         this.logDir = path.join(__dirname, '../logs');
+        this.hostname = os.hostname();
+        this.console = options.console;
+
+        // Escrita assíncrona em lotes: as linhas vão para o buffer e são gravadas
+        // quando o lote atinge flushBytes ou a cada flushInterval ms
+        this.buffer = new LogRingBuffer(options.bufferEntries);
+        this.flushBytes = options.flushBytes;
+        this.flushInterval = options.flushInterval;
+        this.flushTimer = null;
+        this.flushing = null;
+        this.files = new Map(); // nome do arquivo -> descritor aberto
+        this.closed = false;
+        this.counters = { written: 0, flushes: 0, dropped: 0, syncWrites: 0, writeErrors: 0 };
+        this.droppedByLevel = {};
         
         // Criar diretório de logs se não existir
         this.ensureLogDirectory();
+
+        // Garantir que o que restou no buffer chegue ao disco ao encerrar o processo
+        process.on('exit', () => this.flushSync());
     }
 
     ensureLogDirectory() {
@@ -31,7 +93,7 @@ class Logger {
             message,
             ...meta,
             pid: process.pid,
-            hostname: require('os').hostname()
+            hostname: this.hostname
         };
 
         return JSON.stringify(logEntry);
@@ -39,10 +101,151 @@ class Logger {
 
     writeToFile(level, logEntry) {
         const today = new Date().toISOString().split('T')[0];
-        const filename = `${today}-${level.toLowerCase()}.log`;
-        const filepath = path.join(this.logDir, filename);
-        
-        fs.appendFileSync(filepath, logEntry + '\n');
+        const item = {
+            file: `${today}-${level.toLowerCase()}.log`,
+            line: logEntry + '\n'
+        };
+
+        if (this.closed) {
+            this.writeSync([item]);
+            return;
+        }
+
+        if (!this.buffer.push(item)) {
+            // Buffer cheio: erros são gravados de forma síncrona (backpressure),
+            // os demais níveis são descartados e contabilizados
+            if (level === 'ERROR') {
+                this.counters.syncWrites++;
+                this.writeSync([item]);
+            } else {
+                this.counters.dropped++;
+                const key = level.toUpperCase();
+                this.droppedByLevel[key] = (this.droppedByLevel[key] || 0) + 1;
+            }
+            return;
+        }
+
+        this.scheduleFlush();
+    }
+
+    scheduleFlush() {
+        // Com um lote em andamento, o próximo é agendado quando ele terminar
+        if (this.flushing || this.buffer.length === 0) {
+            return;
+        }
+
+        if (this.buffer.bytes >= this.flushBytes) {
+            this.flush();
+        } else if (!this.flushTimer) {
+            this.flushTimer = setTimeout(() => this.flush(), this.flushInterval);
+            this.flushTimer.unref();
+        }
+    }
+
+    // Agrupa as linhas por arquivo, preservando a ordem
+    groupByFile(items) {
+        const groups = new Map();
+        items.forEach(({ file, line }) => {
+            if (!groups.has(file)) {
+                groups.set(file, []);
+            }
+            groups.get(file).push(line);
+        });
+        return groups;
+    }
+
+    // Rotação diária: depois de cada lote, os descritores de outros dias são fechados
+    // (linhas do dia anterior que ainda estavam no buffer reabrem o arquivo dele)
+    rotate(day) {
+        for (const [file, fd] of this.files) {
+            if (!file.startsWith(day)) {
+                fs.close(fd, () => {});
+                this.files.delete(file);
+            }
+        }
+    }
+
+    // Os arquivos do dia ficam abertos; open só acontece uma vez por arquivo/dia
+    getFd(file) {
+        let fd = this.files.get(file);
+        if (fd === undefined) {
+            fd = fs.openSync(path.join(this.logDir, file), 'a');
+            this.files.set(file, fd);
+        }
+        return fd;
+    }
+
+    // Grava o conteúdo do buffer sem bloquear o event loop; só um lote por vez
+    flush() {
+        if (this.flushTimer) {
+            clearTimeout(this.flushTimer);
+            this.flushTimer = null;
+        }
+
+        if (this.flushing) {
+            return this.flushing.then(() => this.flush());
+        }
+
+        if (this.buffer.length === 0) {
+            return Promise.resolve();
+        }
+
+        const items = this.buffer.drain();
+
+        this.flushing = (async () => {
+            for (const [file, lines] of this.groupByFile(items)) {
+                try {
+                    await appendToFd(this.getFd(file), lines.join(''));
+                    this.counters.written += lines.length;
+                } catch (error) {
+                    this.counters.writeErrors++;
+                }
+            }
+            this.rotate(new Date().toISOString().split('T')[0]);
+            this.counters.flushes++;
+        })().finally(() => {
+            this.flushing = null;
+            this.scheduleFlush();
+        });
+
+        return this.flushing;
+    }
+
+    writeSync(items) {
+        for (const [file, lines] of this.groupByFile(items)) {
+            try {
+                fs.appendFileSync(this.getFd(file), lines.join(''));
+                this.counters.written += lines.length;
+            } catch (error) {
+                this.counters.writeErrors++;
+            }
+        }
+    }
+
+    // Usado no evento 'exit', quando não há mais como esperar I/O assíncrono
+    flushSync() {
+        if (this.flushTimer) {
+            clearTimeout(this.flushTimer);
+            this.flushTimer = null;
+        }
+        this.writeSync(this.buffer.drain());
+        for (const fd of this.files.values()) {
+            try {
+                fs.fsyncSync(fd);
+            } catch (error) {
+                // Descritor já fechado
+            }
+        }
+    }
+
+    // Encerramento gracioso: grava o buffer, sincroniza e fecha os arquivos
+    async close() {
+        await this.flush();
+        this.closed = true;
+        for (const fd of this.files.values()) {
+            await new Promise(resolve => fs.fsync(fd, () => fs.close(fd, resolve)));
+        }
+        this.files.clear();
     }
 
     writeToConsole(level, logEntry) {
@@ -67,7 +270,9 @@ class Logger {
         const logEntry = this.formatLog(level, message, meta);
         
         // Escrever no console
-        this.writeToConsole(level, logEntry);
+        if (this.console) {
+            this.writeToConsole(level, logEntry);
+        }
         
         // Escrever em arquivo baseado no nível
         if (level === 'ERROR') {
@@ -218,27 +423,32 @@ class Logger {
     }
 
     // Obter estatísticas de logs
-    getStats() {
+    // (sem readdirSync/statSync: a listagem não bloqueia o event loop)
+    async getStats() {
         const today = new Date().toISOString().split('T')[0];
         const stats = {
             date: today,
             files: [],
-            totalSize: 0
+            totalSize: 0,
+            writer: {
+                ...this.counters,
+                droppedByLevel: this.droppedByLevel,
+                buffered: this.buffer.length,
+                bufferCapacity: this.buffer.capacity,
+                openFiles: this.files.size
+            }
         };
 
         try {
-            const files = fs.readdirSync(this.logDir);
-            files.forEach(file => {
-                if (file.startsWith(today)) {
-                    const filepath = path.join(this.logDir, file);
-                    const stat = fs.statSync(filepath);
-                    stats.files.push({
-                        name: file,
-                        size: stat.size,
-                        modified: stat.mtime
-                    });
-                    stats.totalSize += stat.size;
-                }
+            const files = (await fs.promises.readdir(this.logDir)).filter(file => file.startsWith(today));
+            const fileStats = await Promise.all(files.map(file => fs.promises.stat(path.join(this.logDir, file))));
+            files.forEach((file, i) => {
+                stats.files.push({
+                    name: file,
+                    size: fileStats[i].size,
+                    modified: fileStats[i].mtime
+                });
+                stats.totalSize += fileStats[i].size;
             });
         } catch (error) {
             this.error('Error reading log stats', { error: error.message });
@@ -0,0 +1,373 @@
+const { PerformanceObserver, constants } = require('perf_hooks');
+const ipc = require('./clusterIpc');
+
+/**
+ * Métricas em memória no formato texto do Prometheus (GET /metrics)
+ *
+ * Contadores e histogramas de buckets fixos: registrar uma amostra é uma
+ * busca no Map de séries e um incremento, sem alocação nem I/O, ao contrário
+ * dos logs de performance em arquivo. Os valores são cumulativos desde o
+ * início do processo; quem coleta (Prometheus, tests/metrics_scraper.py)
+ * calcula a diferença entre duas leituras. No cluster, /metrics soma as
+ * leituras de todos os workers (mergeRendered).
+ */
+
+// Buckets em segundos, de 0,5ms a 10s
+const DEFAULT_BUCKETS = [0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10];
+
+// Séries distintas por métrica: acima disso os novos rótulos vão para "other"
+const MAX_SERIES = 2000;
+
+const EVENT_LOOP_SAMPLE_INTERVAL = 100; // ms
+
+const GC_KINDS = {
+    [constants.NODE_PERFORMANCE_GC_MINOR]: 'minor',
+    [constants.NODE_PERFORMANCE_GC_MAJOR]: 'major',
+    [constants.NODE_PERFORMANCE_GC_INCREMENTAL]: 'incremental',
+    [constants.NODE_PERFORMANCE_GC_WEAKCB]: 'weakcb'
+};
+
+function escapeLabel(value) {
+    return String(value).replace(/\\/g, '\\\\').replace(/\n/g, '\\n').replace(/"/g, '\\"');
+}
+
+function formatLabels(names, values, extra = '') {
+    const pairs = names.map((name, i) => `${name}="${escapeLabel(values[i])}"`);
+    if (extra) pairs.push(extra);
+    return pairs.length > 0 ? `{${pairs.join(',')}}` : '';
+}
+
+/**
+ * Soma o texto de várias leituras (uma por worker) em uma só, mantendo as
+ * séries agrupadas por métrica; o início do processo fica com o mais antigo.
+ * Com cumulativeOnly só ficam contadores e histogramas (gauges de um worker
+ * que já saiu não fazem sentido somados aos atuais).
+ */
+function mergeRendered(texts, options = {}) {
+    const families = new Map(); // nome -> { header: [], series: Map }
+
+    for (const text of texts) {
+        let family = null;
+        for (const line of text.split('\n')) {
+            if (!line) continue;
+
+            if (line.startsWith('# HELP ')) {
+                const name = line.slice(7).split(' ')[0];
+                family = families.get(name);
+                if (!family) {
+                    family = { header: [line], series: new Map() };
+                    families.set(name, family);
+                }
+                continue;
+            }
+            if (line.startsWith('#')) {
+                if (family && family.header.length < 2) family.header.push(line);
+                continue;
+            }
+
+            const space = line.lastIndexOf(' ');
+            const series = line.slice(0, space);
+            const value = Number(line.slice(space + 1));
+            const current = family.series.get(series);
+            if (current === undefined) {
+                family.series.set(series, value);
+            } else {
+                family.series.set(series, series === 'process_start_time_seconds' ? Math.min(current, value) : current + value);
+            }
+        }
+    }
+
+    const lines = [];
+    for (const { header, series } of families.values()) {
+        if (options.cumulativeOnly && !/ (counter|histogram)$/.test(header[1] || '')) {
+            continue;
+        }
+        lines.push(...header);
+        for (const [name, value] of series) {
+            lines.push(`${name} ${value}`);
+        }
+    }
+    return lines.join('\n') + '\n';
+}
+
+class Metric {
+    constructor(name, help, labelNames = []) {
+        this.name = name;
+        this.help = help;
+        this.labelNames = labelNames;
+        this.series = new Map(); // valores dos rótulos -> série
+    }
+
+    // Série para os valores dos rótulos (criada na primeira vez)
+    labels(...values) {
+        let key = values.join('\u0000');
+        let series = this.series.get(key);
+        if (series) return series;
+
+        if (this.series.size >= MAX_SERIES) {
+            values = values.map(() => 'other');
+            key = values.join('\u0000');
+            series = this.series.get(key);
+            if (series) return series;
+        }
+
+        series = this.createSeries(values);
+        this.series.set(key, series);
+        return series;
+    }
+}
+
+class Counter extends Metric {
+    get type() {
+        return 'counter';
+    }
+
+    createSeries(values) {
+        return {
+            values,
+            value: 0,
+            inc(amount = 1) {
+                this.value += amount;
+            }
+        };
+    }
+
+    inc(amount = 1) {
+        this.labels().inc(amount);
+    }
+
+    render(lines) {
+        for (const series of this.series.values()) {
+            lines.push(`${this.name}${formatLabels(this.labelNames, series.values)} ${series.value}`);
+        }
+    }
+}
+
+class Histogram extends Metric {
+    constructor(name, help, labelNames = [], buckets = DEFAULT_BUCKETS) {
+        super(name, help, labelNames);
+        this.buckets = buckets;
+    }
+
+    get type() {
+        return 'histogram';
+    }
+
+    createSeries(values) {
+        const buckets = this.buckets;
+        return {
+            values,
+            counts: new Float64Array(buckets.length + 1), // último: acima do maior bucket
+            sum: 0,
+            count: 0,
+            observe(value) {
+                let i = 0;
+                while (i < buckets.length && value > buckets[i]) i++;
+                this.counts[i]++;
+                this.sum += value;
+                this.count++;
+            }
+        };
+    }
+
+    observe(value) {
+        this.labels().observe(value);
+    }
+
+    // Mede uma Promise em segundos
+    time(series, promise) {
+        const start = process.hrtime.bigint();
+        const done = () => series.observe(Number(process.hrtime.bigint() - start) / 1e9);
+        promise.then(done, done);
+        return promise;
+    }
+
+    render(lines) {
+        for (const series of this.series.values()) {
+            let cumulative = 0;
+            for (let i = 0; i < this.buckets.length; i++) {
+                cumulative += series.counts[i];
+                lines.push(`${this.name}_bucket${formatLabels(this.labelNames, series.values, `le="${this.buckets[i]}"`)} ${cumulative}`);
+            }
+            lines.push(`${this.name}_bucket${formatLabels(this.labelNames, series.values, 'le="+Inf"')} ${series.count}`);
+            lines.push(`${this.name}_sum${formatLabels(this.labelNames, series.values)} ${series.sum}`);
+            lines.push(`${this.name}_count${formatLabels(this.labelNames, series.values)} ${series.count}`);
+        }
+    }
+}
+
+// Valores lidos no momento da coleta (tamanho do cache, memória...)
+class CallbackMetric {
+    constructor(name, help, type, labelNames, collect) {
+        this.name = name;
+        this.help = help;
+        this.type = type;
+        this.labelNames = labelNames;
+        this.collect = collect; // () => [[valoresDosRótulos, valor], ...] ou número
+    }
+
+    render(lines) {
+        const result = this.collect();
+        if (typeof result === 'number') {
+            lines.push(`${this.name} ${result}`);
+            return;
+        }
+        for (const [values, value] of result) {
+            lines.push(`${this.name}${formatLabels(this.labelNames, values)} ${value}`);
+        }
+    }
+}
+
+class MetricsRegistry {
+    constructor() {
+        this.metrics = new Map();
+        this.startTime = Date.now() / 1000;
+
+        this.httpRequests = this.counter('http_requests_total', 'Requisições HTTP concluídas', ['method', 'route', 'status']);
+        this.httpDuration = this.histogram('http_request_duration_seconds', 'Latência das requisições HTTP', ['method', 'route', 'status']);
+        this.dbDuration = this.histogram('db_query_duration_seconds', 'Latência das consultas SQL (inclui a fila do group commit)', ['method', 'statement']);
+        this.dbErrors = this.counter('db_query_errors_total', 'Consultas SQL com erro', ['method', 'statement']);
+        this.cacheRequests = this.counter('cache_requests_total', 'Consultas ao cache de respostas', ['cache', 'result']);
+        this.eventLoopLag = this.histogram('nodejs_eventloop_lag_seconds', 'Atraso do event loop amostrado por timer', [],
+            [0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1]);
+        this.gcDuration = this.histogram('nodejs_gc_duration_seconds', 'Pausas de coleta de lixo', ['kind'],
+            [0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25]);
+
+        this.statementLabels = new Map(); // SQL -> rótulo normalizado
+
+        this.registerProcessMetrics();
+
+        // Leitura pedida pelo primário para somar as de todos os workers
+        ipc.handle('metrics:render', () => this.render());
+    }
+
+    counter(name, help, labelNames) {
+        return this.register(new Counter(name, help, labelNames));
+    }
+
+    histogram(name, help, labelNames, buckets) {
+        return this.register(new Histogram(name, help, labelNames, buckets));
+    }
+
+    callback(name, help, type, labelNames, collect) {
+        return this.register(new CallbackMetric(name, help, type, labelNames, collect));
+    }
+
+    register(metric) {
+        this.metrics.set(metric.name, metric);
+        return metric;
+    }
+
+    registerProcessMetrics() {
+        this.callback('process_cpu_user_seconds_total', 'CPU em modo usuário', 'counter', [], () => process.cpuUsage().user / 1e6);
+        this.callback('process_cpu_system_seconds_total', 'CPU em modo sistema', 'counter', [], () => process.cpuUsage().system / 1e6);
+        this.callback('process_resident_memory_bytes', 'Memória residente', 'gauge', [], () => process.memoryUsage.rss());
+        this.callback('nodejs_heap_used_bytes', 'Heap V8 em uso', 'gauge', [], () => process.memoryUsage().heapUsed);
+        this.callback('process_start_time_seconds', 'Início do processo (epoch)', 'gauge', [], () => this.startTime);
+    }
+
+    /**
+     * Amostrar o atraso do event loop e observar as pausas de GC
+     * (chamado na inicialização do servidor; timers não mantêm o processo vivo)
+     */
+    startRuntimeMetrics() {
+        if (this.lagTimer) return;
+
+        let expected = Date.now() + EVENT_LOOP_SAMPLE_INTERVAL;
+        this.lagTimer = setInterval(() => {
+            const now = Date.now();
+            this.eventLoopLag.observe(Math.max(now - expected, 0) / 1000);
+            expected = now + EVENT_LOOP_SAMPLE_INTERVAL;
+        }, EVENT_LOOP_SAMPLE_INTERVAL);
+        this.lagTimer.unref();
+
+        this.gcObserver = new PerformanceObserver(list => {
+            for (const entry of list.getEntries()) {
+                const kind = GC_KINDS[entry.detail ? entry.detail.kind : entry.kind] || 'other';
+                this.gcDuration.labels(kind).observe(entry.duration / 1000);
+            }
+        });
+        this.gcObserver.observe({ entryTypes: ['gc'] });
+    }
+
+    stopRuntimeMetrics() {
+        clearInterval(this.lagTimer);
+        this.lagTimer = null;
+        if (this.gcObserver) {
+            this.gcObserver.disconnect();
+            this.gcObserver = null;
+        }
+    }
+
+    // Rótulo curto e estável para o SQL (espaços colapsados, até 120 caracteres)
+    statementLabel(sql) {
+        let label = this.statementLabels.get(sql);
+        if (label === undefined) {
+            label = sql.replace(/\s+/g, ' ').trim().slice(0, 120);
+            if (this.statementLabels.size < MAX_SERIES) {
+                this.statementLabels.set(sql, label);
+            }
+        }
+        return label;
+    }
+
+    // Mede a Promise de uma consulta (database.run/get/all)
+    timeQuery(method, sql, promise) {
+        const label = this.statementLabel(sql);
+        promise.catch(() => this.dbErrors.labels(method, label).inc());
+        return this.dbDuration.time(this.dbDuration.labels(method, label), promise);
+    }
+
+    /**
+     * Middleware Express: latência por rota (padrão do Express, ex: /api/tasks/:id,
+     * para não criar uma série por ID), método e status. Respostas dadas antes
+     * de uma rota casar (ex: 401 do auth do router) ficam com o prefixo do router
+     */
+    middleware() {
+        return (req, res, next) => {
+            const start = process.hrtime.bigint();
+
+            res.on('finish', () => {
+                let route = req.route ? req.baseUrl + req.route.path : (req.baseUrl || 'unmatched');
+                if (route.length > 1 && route.endsWith('/')) route = route.slice(0, -1);
+                const status = String(res.statusCode);
+                const seconds = Number(process.hrtime.bigint() - start) / 1e9;
+                this.httpRequests.labels(req.method, route, status).inc();
+                this.httpDuration.labels(req.method, route, status).observe(seconds);
+            });
+
+            next();
+        };
+    }
+
+    render() {
+        const lines = [];
+        for (const metric of this.metrics.values()) {
+            lines.push(`# HELP ${metric.name} ${metric.help}`);
+            lines.push(`# TYPE ${metric.name} ${metric.type}`);
+            metric.render(lines);
+        }
+        return lines.join('\n') + '\n';
+    }
+
+    handler() {
+        return async (req, res) => {
+            let body;
+            if (ipc.isWorker) {
+                // Soma de todos os workers; sem o primário, só a deste processo
+                body = await ipc.request('metrics:collect').catch(() => null);
+            }
+            res.set('Content-Type', 'text/plain; version=0.0.4; charset=utf-8');
+            res.send(body || this.render());
+        };
+    }
+}
+
+// Instância global das métricas
+const metrics = new MetricsRegistry();
+
+module.exports = metrics;
+module.exports.MetricsRegistry = MetricsRegistry;
+module.exports.Counter = Counter;
+module.exports.Histogram = Histogram;
+module.exports.mergeRendered = mergeRendered;
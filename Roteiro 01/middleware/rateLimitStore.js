@@ -0,0 +1,105 @@
+const ipc = require('./clusterIpc');
+
+/**
+ * Contadores do rate limiting compartilhados entre os workers do cluster
+ *
+ * O store padrão do express-rate-limit é a memória de cada processo: com N
+ * workers, cada IP teria N vezes o limite. No cluster, os contadores ficam no
+ * primário (WindowCounter) e cada worker usa o ClusterRateLimitStore, que
+ * implementa a interface de store do express-rate-limit (v6) com uma consulta
+ * por IPC (ordem de dezenas de microssegundos, sem rede nem disco).
+ */
+
+// Janela fixa por chave, iniciada na primeira requisição (mantida no primário)
+class WindowCounter {
+    constructor() {
+        this.windows = new Map(); // chave -> { hits, resetTime }
+
+        // Remover janelas vencidas
+        setInterval(() => this.prune(), 60 * 1000).unref();
+    }
+
+    increment(key, windowMs) {
+        const now = Date.now();
+        let window = this.windows.get(key);
+
+        if (!window || window.resetTime <= now) {
+            window = { hits: 0, resetTime: now + windowMs };
+            this.windows.set(key, window);
+        }
+
+        window.hits++;
+        return { totalHits: window.hits, resetTime: window.resetTime };
+    }
+
+    decrement(key) {
+        const window = this.windows.get(key);
+        if (window && window.hits > 0) {
+            window.hits--;
+        }
+        return null;
+    }
+
+    resetKey(key) {
+        this.windows.delete(key);
+        return null;
+    }
+
+    prune(now = Date.now()) {
+        for (const [key, window] of this.windows) {
+            if (window.resetTime <= now) {
+                this.windows.delete(key);
+            }
+        }
+    }
+
+    // Mensagens 'rate-limit' dos workers
+    serve() {
+        ipc.handle('rate-limit', ({ op, key, windowMs }) => {
+            if (op !== 'increment' && op !== 'decrement' && op !== 'resetKey') {
+                throw new Error(`Operação de rate limit inválida: ${op}`);
+            }
+            return this[op](key, windowMs);
+        });
+        return this;
+    }
+}
+
+class ClusterRateLimitStore {
+    constructor(options = {}) {
+        this.prefix = options.prefix || 'rl:';
+        this.timeout = options.timeout || 1000;
+        this.windowMs = 60 * 1000;
+        this.errors = 0;
+    }
+
+    // Chamado pelo express-rate-limit com as opções do limitador
+    init(options) {
+        this.windowMs = options.windowMs;
+    }
+
+    async increment(key) {
+        try {
+            const { totalHits, resetTime } = await this.request('increment', key);
+            return { totalHits, resetTime: new Date(resetTime) };
+        } catch (error) {
+            // Primário indisponível (ex: reiniciando): não bloquear a requisição
+            this.errors++;
+            return { totalHits: 0, resetTime: undefined };
+        }
+    }
+
+    async decrement(key) {
+        await this.request('decrement', key).catch(() => this.errors++);
+    }
+
+    async resetKey(key) {
+        await this.request('resetKey', key).catch(() => this.errors++);
+    }
+
+    request(op, key) {
+        return ipc.request('rate-limit', { op, key: this.prefix + key, windowMs: this.windowMs }, this.timeout);
+    }
+}
+
+module.exports = { WindowCounter, ClusterRateLimitStore };
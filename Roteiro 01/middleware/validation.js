@@ -36,4 +36,26 @@ const validate = (schemaName) => (req, res, next) => {
     next();
 };
 
-module.exports = { validate };
\ No newline at end of file
+// Lote em req.body[field]: cada item é validado pelo schema e o resultado vai para
+// req.batch ({ index, value } ou { index, errors }), sem recusar o lote por um item inválido
+const validateBatch = (schemaName, field, maxItems) => (req, res, next) => {
+    const items = req.body && req.body[field];
+    
+    if (!Array.isArray(items) || items.length === 0 || items.length > maxItems) {
+        return res.status(400).json({
+            success: false,
+            message: 'Dados inválidos',
+            errors: [`"${field}" deve ser um array com 1 a ${maxItems} itens`]
+        });
+    }
+    
+    req.batch = items.map((item, index) => {
+        const { error, value } = schemas[schemaName].validate(item);
+        return error
+            ? { index, errors: error.details.map(detail => detail.message) }
+            : { index, value };
+    });
+    next();
+};
+
+module.exports = { validate, validateBatch };
\ No newline at end of file
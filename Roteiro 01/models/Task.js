@@ -1,3 +1,6 @@
+const INSERT_SQL = `INSERT INTO tasks (id, title, description, completed, priority, userId, createdAt, updatedAt, dueDate, category, tags) 
+             VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)`;
+
 class Task {
     constructor(data) {
         this.id = data.id;
@@ -33,32 +36,49 @@ class Task {
     }
 
     static async create(taskData) {
-        const { v4: uuidv4 } = require('uuid');
         const database = require('../database/database');
         const db = database;
 
-        const task = {
+        const task = Task.newRecord(taskData);
+        await db.run(INSERT_SQL, Task.insertParams(task));
+
+        return new Task(task);
+    }
+
+    // Várias tarefas em uma única transação; um resultado por item ({ task } ou { error })
+    static async createMany(items, userId) {
+        const database = require('../database/database');
+        const db = database;
+
+        const tasks = items.map(taskData => Task.newRecord({ ...taskData, userId }));
+        const results = await db.runBatch(tasks.map(task => ({ sql: INSERT_SQL, params: Task.insertParams(task) })));
+
+        return results.map((result, i) => (result.error ? { error: result.error } : { task: new Task(tasks[i]) }));
+    }
+
+    // Linha da tabela tasks para uma nova tarefa
+    static newRecord(taskData) {
+        const { v4: uuidv4 } = require('uuid');
+        const now = new Date().toISOString();
+
+        return {
             id: uuidv4(),
             title: taskData.title,
             description: taskData.description || '',
             completed: 0,
             priority: taskData.priority || 'medium',
             userId: taskData.userId,
-            createdAt: new Date().toISOString(),
-            updatedAt: new Date().toISOString(),
+            createdAt: now,
+            updatedAt: now,
             dueDate: taskData.dueDate || null,
             category: taskData.category || 'general',
             tags: JSON.stringify(taskData.tags || [])
         };
+    }
 
-        await db.run(
-            `INSERT INTO tasks (id, title, description, completed, priority, userId, createdAt, updatedAt, dueDate, category, tags) 
-             VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)`,
-            [task.id, task.title, task.description, task.completed, task.priority, task.userId, 
-             task.createdAt, task.updatedAt, task.dueDate, task.category, task.tags]
-        );
-
-        return new Task(task);
+    static insertParams(task) {
+        return [task.id, task.title, task.description, task.completed, task.priority, task.userId,
+            task.createdAt, task.updatedAt, task.dueDate, task.category, task.tags];
     }
 
     static async findById(id) {
@@ -68,6 +88,29 @@ class Task {
         return task ? new Task(task) : null;
     }
 
+    // Cursor opaco da paginação por keyset: posição (createdAt, id) do último item da página
+    static encodeCursor(task) {
+        return Buffer.from(JSON.stringify([task.createdAt, task.id])).toString('base64url');
+    }
+
+    static decodeCursor(cursor) {
+        try {
+            const [createdAt, id] = JSON.parse(Buffer.from(cursor, 'base64url').toString());
+            return typeof createdAt === 'string' && typeof id === 'string' ? { createdAt, id } : null;
+        } catch (error) {
+            return null;
+        }
+    }
+
+    // Converte o texto da busca em uma consulta FTS5: cada palavra como prefixo, todas obrigatórias
+    static searchQuery(search) {
+        return search
+            .split(/\s+/)
+            .filter(Boolean)
+            .map(word => `"${word.replace(/"/g, '""')}"*`)
+            .join(' ');
+    }
+
     static async findByUserId(userId, options = {}) {
         const database = require('../database/database');
         const db = database;
@@ -75,6 +118,7 @@ class Task {
         const {
             page = 1,
             limit = 10,
+            cursor,
             completed,
             priority,
             category,
@@ -86,96 +130,88 @@ class Task {
             search
         } = options;
 
-        let query = 'SELECT * FROM tasks WHERE userId = ?';
-        let countQuery = 'SELECT COUNT(*) as total FROM tasks WHERE userId = ?';
+        const conditions = ['userId = ?'];
         const params = [userId];
-        const countParams = [userId];
 
         // Filtros de status
         if (completed !== undefined) {
-            query += ' AND completed = ?';
-            countQuery += ' AND completed = ?';
+            conditions.push('completed = ?');
             params.push(completed ? 1 : 0);
-            countParams.push(completed ? 1 : 0);
         }
 
         // Filtro de prioridade
         if (priority) {
-            query += ' AND priority = ?';
-            countQuery += ' AND priority = ?';
+            conditions.push('priority = ?');
             params.push(priority);
-            countParams.push(priority);
         }
 
         // Filtro de categoria
         if (category) {
-            query += ' AND category = ?';
-            countQuery += ' AND category = ?';
+            conditions.push('category = ?');
             params.push(category);
-            countParams.push(category);
         }
 
-        // Filtro de tags
+        // Filtro de tags (qualquer uma das tags), pela tabela normalizada
         if (tags && tags.length > 0) {
-            const tagConditions = tags.map(() => 'tags LIKE ?').join(' OR ');
-            query += ` AND (${tagConditions})`;
-            countQuery += ` AND (${tagConditions})`;
-            
-            tags.forEach(tag => {
-                params.push(`%"${tag}"%`);
-                countParams.push(`%"${tag}"%`);
-            });
+            conditions.push(`id IN (SELECT taskId FROM task_tags WHERE userId = ? AND tag IN (${tags.map(() => '?').join(', ')}))`);
+            params.push(userId, ...tags);
         }
 
         // Filtros de data de criação
         if (dateFrom) {
-            query += ' AND createdAt >= ?';
-            countQuery += ' AND createdAt >= ?';
+            conditions.push('createdAt >= ?');
             params.push(dateFrom);
-            countParams.push(dateFrom);
         }
 
         if (dateTo) {
-            query += ' AND createdAt <= ?';
-            countQuery += ' AND createdAt <= ?';
+            conditions.push('createdAt <= ?');
             params.push(dateTo);
-            countParams.push(dateTo);
         }
 
         // Filtros de data de vencimento
         if (dueDateFrom) {
-            query += ' AND dueDate >= ?';
-            countQuery += ' AND dueDate >= ?';
+            conditions.push('dueDate >= ?');
             params.push(dueDateFrom);
-            countParams.push(dueDateFrom);
         }
 
         if (dueDateTo) {
-            query += ' AND dueDate <= ?';
-            countQuery += ' AND dueDate <= ?';
+            conditions.push('dueDate <= ?');
             params.push(dueDateTo);
-            countParams.push(dueDateTo);
         }
 
-        // Busca por texto
+        // Busca por texto no índice FTS5
         if (search) {
-            query += ' AND (title LIKE ? OR description LIKE ?)';
-            countQuery += ' AND (title LIKE ? OR description LIKE ?)';
-            const searchParam = `%${search}%`;
-            params.push(searchParam, searchParam);
-            countParams.push(searchParam, searchParam);
+            const match = Task.searchQuery(search);
+            if (match) {
+                conditions.push('rowid IN (SELECT rowid FROM tasks_fts WHERE tasks_fts MATCH ?)');
+                params.push(match);
+            }
         }
 
-        // Ordenação e paginação
-        query += ' ORDER BY createdAt DESC';
-        
-        const offset = (page - 1) * limit;
-        query += ' LIMIT ? OFFSET ?';
-        params.push(limit, offset);
+        const where = conditions.join(' AND ');
+
+        // Paginação por keyset: custo independente da profundidade da página e sem COUNT
+        if (cursor) {
+            const position = typeof cursor === 'string' ? Task.decodeCursor(cursor) : cursor;
+            if (!position) {
+                throw new Error('Cursor inválido');
+            }
+            const rows = await db.all(
+                `SELECT * FROM tasks WHERE ${where} AND (createdAt < ? OR (createdAt = ? AND id < ?))
+                 ORDER BY createdAt DESC, id DESC LIMIT ?`,
+                [...params, position.createdAt, position.createdAt, position.id, limit + 1]
+            );
+            return Task.cursorPage(rows, limit, cursor);
+        }
 
+        // Paginação por página (LIMIT/OFFSET) com total
+        const offset = (page - 1) * limit;
         const [tasks, countResult] = await Promise.all([
-            db.all(query, params),
-            db.get(countQuery, countParams)
+            db.all(
+                `SELECT * FROM tasks WHERE ${where} ORDER BY createdAt DESC, id DESC LIMIT ? OFFSET ?`,
+                [...params, limit, offset]
+            ),
+            db.get(`SELECT COUNT(*) as total FROM tasks WHERE ${where}`, params)
         ]);
 
         const totalTasks = countResult.total;
@@ -188,7 +224,22 @@ class Task {
                 totalPages,
                 totalTasks,
                 hasNextPage: page < totalPages,
-                hasPrevPage: page > 1
+                hasPrevPage: page > 1,
+                nextCursor: tasks.length === limit && page < totalPages ? Task.encodeCursor(tasks[tasks.length - 1]) : null
+            }
+        };
+    }
+
+    static cursorPage(rows, limit, cursor) {
+        const hasNextPage = rows.length > limit;
+        const tasks = rows.slice(0, limit).map(task => new Task(task));
+
+        return {
+            tasks,
+            pagination: {
+                cursor,
+                nextCursor: hasNextPage ? Task.encodeCursor(tasks[tasks.length - 1]) : null,
+                hasNextPage
             }
         };
     }
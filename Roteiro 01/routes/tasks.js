@@ -3,9 +3,10 @@ const { v4: uuidv4 } = require('uuid');
 const Task = require('../models/Task');
 const database = require('../database/database');
 const { authMiddleware } = require('../middleware/auth');
-const { validate } = require('../middleware/validation');
-const { cacheMiddleware, invalidateCacheMiddleware, memoryCache } = require('../middleware/cache');
+const { validate, validateBatch } = require('../middleware/validation');
+const { cacheMiddleware, invalidateCacheMiddleware, cache } = require('../middleware/cache');
 const logger = require('../middleware/logger');
+const config = require('../config/database');
 
 const router = express.Router();
 
@@ -22,6 +23,7 @@ router.get('/', cacheMiddleware('tasks', 3 * 60 * 1000), async (req, res) => {
             priority, 
             page, 
             limit,
+            cursor,
             category,
             tags,
             dateFrom,
@@ -35,7 +37,7 @@ router.get('/', cacheMiddleware('tasks', 3 * 60 * 1000), async (req, res) => {
             requestId: req.requestId,
             userId: req.user.id,
             filters: { 
-                completed, priority, page, limit, category, tags, 
+                completed, priority, page, limit, cursor, category, tags, 
                 dateFrom, dateTo, dueDateFrom, dueDateTo, search 
             }
         });
@@ -46,6 +48,17 @@ router.get('/', cacheMiddleware('tasks', 3 * 60 * 1000), async (req, res) => {
             limit: parseInt(limit) || 10,
         };
 
+        // Paginação por cursor (keyset) para páginas profundas
+        if (cursor) {
+            if (!Task.decodeCursor(cursor)) {
+                return res.status(400).json({
+                    success: false,
+                    message: 'Cursor de paginação inválido'
+                });
+            }
+            options.cursor = cursor;
+        }
+
         // Aplicar filtros
         if (completed !== undefined) {
             options.completed = completed === 'true';
@@ -101,15 +114,20 @@ router.get('/', cacheMiddleware('tasks', 3 * 60 * 1000), async (req, res) => {
             filters: options
         });
 
+        const pagination = options.cursor ? {
+            ...result.pagination,
+            itemsPerPage: options.limit
+        } : {
+            ...result.pagination,
+            itemsPerPage: options.limit,
+            nextPage: result.pagination.hasNextPage ? result.pagination.currentPage + 1 : null,
+            prevPage: result.pagination.hasPrevPage ? result.pagination.currentPage - 1 : null
+        };
+
         res.json({
             success: true,
             data: result.tasks.map(task => task.toJSON()),
-            pagination: {
-                ...result.pagination,
-                itemsPerPage: options.limit,
-                nextPage: result.pagination.hasNextPage ? result.pagination.currentPage + 1 : null,
-                prevPage: result.pagination.hasPrevPage ? result.pagination.currentPage - 1 : null
-            },
+            pagination,
             filters: options
         });
     } catch (error) {
@@ -173,6 +191,63 @@ router.post('/', validate('task'), invalidateCacheMiddleware(['tasks', 'stats'])
     }
 });
 
+// Criar tarefas em lote: validação de todos os itens, uma transação e uma única
+// invalidação de cache. Itens inválidos não impedem os demais (201, 207 ou 400)
+router.post('/batch', validateBatch('task', 'tasks', config.batch.maxItems), invalidateCacheMiddleware(['tasks', 'stats']), async (req, res) => {
+    const startTime = Date.now();
+    
+    try {
+        const valid = req.batch.filter(item => item.value);
+        const created = await Task.createMany(valid.map(item => item.value), req.user.id);
+        created.forEach((result, i) => {
+            valid[i].result = result;
+        });
+
+        const results = req.batch.map(({ index, errors, result }) => {
+            if (errors) {
+                return { index, success: false, errors };
+            }
+            if (result.error) {
+                return { index, success: false, errors: [result.error.message] };
+            }
+            return { index, success: true, data: result.task.toJSON() };
+        });
+        const createdCount = results.filter(result => result.success).length;
+        
+        const duration = Date.now() - startTime;
+        logger.performanceLog('task-create-batch', duration, {
+            userId: req.user.id,
+            received: results.length,
+            created: createdCount
+        });
+
+        const status = createdCount === results.length ? 201 : (createdCount > 0 ? 207 : 400);
+        res.status(status).json({
+            success: createdCount > 0,
+            message: `${createdCount} de ${results.length} tarefas criadas`,
+            data: {
+                created: createdCount,
+                failed: results.length - createdCount,
+                results
+            }
+        });
+    } catch (error) {
+        const duration = Date.now() - startTime;
+        logger.error('Error creating task batch', {
+            error: error.message,
+            stack: error.stack,
+            requestId: req.requestId,
+            userId: req.user.id,
+            duration
+        });
+        
+        res.status(500).json({ 
+            success: false, 
+            message: 'Erro interno do servidor' 
+        });
+    }
+});
+
 // Buscar tarefa por ID (com cache de 5 minutos)
 router.get('/:id', cacheMiddleware('task-detail', 5 * 60 * 1000), async (req, res) => {
     const startTime = Date.now();
@@ -365,9 +440,9 @@ router.get('/stats/summary', cacheMiddleware('stats', 2 * 60 * 1000), async (req
 });
 
 // Estatísticas do cache (rota de debug)
-router.get('/cache/stats', (req, res) => {
+router.get('/cache/stats', async (req, res) => {
     try {
-        const stats = memoryCache.getStats();
+        const stats = await cache.getStats();
         res.json({
             success: true,
             data: {
@@ -388,9 +463,9 @@ router.get('/cache/stats', (req, res) => {
 });
 
 // Limpar cache (rota de debug)
-router.delete('/cache/clear', (req, res) => {
+router.delete('/cache/clear', async (req, res) => {
     try {
-        memoryCache.invalidateUser(req.user.id);
+        await cache.invalidateUser(req.user.id);
         res.json({
             success: true,
             message: 'Cache limpo com sucesso'
@@ -503,17 +578,12 @@ router.post('/test/create-samples', async (req, res) => {
             }
         ];
 
-        const createdTasks = [];
-        for (const taskData of sampleTasks) {
-            const task = await Task.create({
-                ...taskData,
-                userId: req.user.id
-            });
-            createdTasks.push(task);
-        }
+        const createdTasks = (await Task.createMany(sampleTasks, req.user.id))
+            .filter(result => result.task)
+            .map(result => result.task);
 
         // Invalidar cache
-        memoryCache.invalidatePattern('tasks');
+        await cache.invalidateEndpoint(req.user.id, 'tasks');
 
         res.status(201).json({
             success: true,
@@ -561,6 +631,7 @@ router.get('/filters/info', (req, res) => {
             parameters: {
                 page: { type: 'number', description: 'Número da página (padrão: 1)' },
                 limit: { type: 'number', description: 'Itens por página (padrão: 10)' },
+                cursor: { type: 'string', description: 'Cursor da próxima página (pagination.nextCursor), substitui page em páginas profundas' },
                 completed: { type: 'boolean', description: 'Filtrar por status de conclusão' },
                 priority: { type: 'string', enum: ['low', 'medium', 'high'], description: 'Filtrar por prioridade' },
                 category: { type: 'string', description: 'Filtrar por categoria' },
@@ -569,7 +640,7 @@ router.get('/filters/info', (req, res) => {
                 dateTo: { type: 'string', format: 'ISO 8601', description: 'Data final de criação' },
                 dueDateFrom: { type: 'string', format: 'ISO 8601', description: 'Data inicial de vencimento' },
                 dueDateTo: { type: 'string', format: 'ISO 8601', description: 'Data final de vencimento' },
-                search: { type: 'string', description: 'Busca por texto no título ou descrição' }
+                search: { type: 'string', description: 'Busca por palavras (ou prefixos) no título ou descrição' }
             },
             examples: {
                 'Tarefas de trabalho': '/api/tasks?category=work',
@@ -3,10 +3,14 @@ const cors = require('cors');
 const bodyParser = require('body-parser');
 const helmet = require('helmet');
 const rateLimit = require('express-rate-limit');
+const cluster = require('cluster');
 
 const config = require('./config/database');
 const database = require('./database/database');
 const logger = require('./middleware/logger');
+const metrics = require('./middleware/metrics');
+const ipc = require('./middleware/clusterIpc');
+const { ClusterRateLimitStore } = require('./middleware/rateLimitStore');
 const authRoutes = require('./routes/auth');
 const taskRoutes = require('./routes/tasks');
 const userRoutes = require('./routes/users');
@@ -22,10 +26,16 @@ const userRoutes = require('./routes/users');
  */
 
 const app = express();
+let server = null;
+
+// Métricas (Prometheus): fora do rate limiting e dos logs por requisição
+app.get('/metrics', metrics.handler());
+app.use(metrics.middleware());
 
 // Middleware de segurança
 app.use(helmet());
-app.use(rateLimit(config.rateLimit));
+// No cluster os contadores ficam no primário, para o limite valer por IP e não por worker
+app.use(rateLimit(cluster.isWorker ? { ...config.rateLimit, store: new ClusterRateLimitStore() } : config.rateLimit));
 app.use(cors());
 
 // Logger middleware (antes de outros middlewares)
@@ -53,7 +63,8 @@ app.get('/', (req, res) => {
             auth: ['POST /api/auth/register', 'POST /api/auth/login'],
             tasks: ['GET /api/tasks', 'POST /api/tasks', 'PUT /api/tasks/:id', 'DELETE /api/tasks/:id'],
             users: ['GET /api/users', 'GET /api/users/:id', 'PUT /api/users/:id', 'DELETE /api/users/:id'],
-            logs: ['GET /api/logs/stats']
+            logs: ['GET /api/logs/stats'],
+            metrics: ['GET /metrics']
         }
     });
 });
@@ -69,9 +80,9 @@ app.get('/health', (req, res) => {
 });
 
 // Logs stats endpoint
-app.get('/api/logs/stats', (req, res) => {
+app.get('/api/logs/stats', async (req, res) => {
     try {
-        const stats = logger.getStats();
+        const stats = await logger.getStats();
         logger.info('Log stats accessed', { requestId: req.requestId });
         res.json({
             success: true,
@@ -118,28 +129,73 @@ async function startServer() {
         
         await database.init();
         logger.systemLog('Database initialized');
+
+        metrics.startRuntimeMetrics();
         
-        app.listen(config.port, () => {
+        server = app.listen(config.port, () => {
             logger.systemLog('Server started successfully', {
                 port: config.port,
                 url: `http://localhost:${config.port}`
             });
             
+            if (cluster.isWorker) {
+                console.log(`🚀 Worker ${cluster.worker.id} (pid ${process.pid}) pronto na porta ${config.port}`);
+                return;
+            }
+            
             console.log('🚀 =================================');
             console.log(`🚀 Servidor iniciado na porta ${config.port}`);
             console.log(`🚀 URL: http://localhost:${config.port}`);
             console.log(`🚀 Health: http://localhost:${config.port}/health`);
             console.log(`🚀 Logs: http://localhost:${config.port}/api/logs/stats`);
+            console.log(`🚀 Métricas: http://localhost:${config.port}/metrics`);
             console.log('🚀 =================================');
         });
     } catch (error) {
         logger.error('Server startup failed', { error: error.message, stack: error.stack });
         console.error('❌ Falha na inicialização:', error);
+        await logger.close();
         process.exit(1);
     }
 }
 
+// Para de aceitar conexões e aguarda as requisições em andamento
+// (no Node 20 o close também fecha as conexões keep-alive ociosas)
+function closeServer() {
+    return new Promise(resolve => {
+        if (!server || !server.listening) return resolve();
+        server.close(() => resolve());
+    });
+}
+
+// Encerramento gracioso: conclui as requisições e as escritas e grava os logs pendentes antes de sair
+let shuttingDown = false;
+
+async function shutdown(signal) {
+    if (shuttingDown) return;
+    shuttingDown = true;
+    
+    logger.systemLog('Server shutting down', { signal });
+    await closeServer();
+    await database.close();
+    await logger.close();
+    process.exit(0);
+}
+
 if (require.main === module) {
+    // Worker parado pelo primário (reinício gradual ou encerramento): primeiro para
+    // de aceitar conexões e conclui as em andamento, entregando as métricas finais;
+    // depois o primário desconecta e o worker encerra
+    if (cluster.isWorker) {
+        ipc.handle('cluster:drain', () => closeServer().then(() => metrics.render()));
+        process.on('disconnect', () => shutdown('disconnect'));
+
+        // Ctrl+C chega a todo o grupo de processos: quem conduz o encerramento é o primário
+        ['SIGINT', 'SIGTERM'].forEach(signal => process.on(signal, () => {}));
+    } else {
+        ['SIGINT', 'SIGTERM'].forEach(signal => process.on(signal, () => shutdown(signal)));
+    }
+
     startServer();
 }
 
@@ -0,0 +1,287 @@
+"""Escalabilidade do modo cluster (cluster.js) com o número de workers.
+
+Para cada quantidade de workers, sobe `node cluster.js` do zero (banco
+temporário, sem logs no console), registra o usuário dos testes de estresse e
+mede a vazão em malha fechada com vários processos cliente, cada um com o
+StressTestRunner. A visão do servidor vem de /metrics, já somada entre os
+workers pelo primário.
+
+Antes da medição verifica o rate limiting compartilhado: com RATE_LIMIT_MAX=M e
+N workers, exatamente M requisições de um mesmo IP devem passar.
+
+    python cluster_scaling.py                       # 1, 2, 4... até os núcleos da máquina
+    python cluster_scaling.py --workers 1 2 4 --requests 20000 --endpoint /health
+
+O gerador de carga roda na mesma máquina: para medir a escala do servidor use
+menos workers do que núcleos, deixando núcleos livres para os clientes.
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import shutil
+import socket
+import subprocess
+import tempfile
+import time
+import urllib.error
+import urllib.request
+from datetime import datetime
+
+import aiohttp
+
+import metrics_scraper
+from distributed_load import COUNTER_KEYS, merge_reports
+from stress_test import StressTestRunner
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+API_DIR = os.path.normpath(os.path.join(TESTS_DIR, '..'))
+RESULTS_DIR = os.path.join(TESTS_DIR, 'results')
+
+STARTUP_TIMEOUT = 60
+RATE_LIMIT_CHECK = 300
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def default_worker_counts():
+    cores = os.cpu_count() or 1
+    counts = [1]
+    while counts[-1] * 2 <= cores:
+        counts.append(counts[-1] * 2)
+    if counts[-1] != cores:
+        counts.append(cores)
+    return counts
+
+
+class LocalCluster:
+    """Sobe `node cluster.js` com N workers em uma porta livre e banco temporário."""
+
+    def __init__(self, workers, rate_limit_max=10 ** 9, verbose=False):
+        self.workers = workers
+        self.rate_limit_max = rate_limit_max
+        self.verbose = verbose
+        self.port = free_port()
+        self.base_url = f"http://127.0.0.1:{self.port}"
+        self.process = None
+        self.tmpdir = None
+
+    def __enter__(self):
+        self.tmpdir = tempfile.mkdtemp(prefix='cluster_scaling_')
+        env = {
+            **os.environ,
+            'PORT': str(self.port),
+            'CLUSTER_WORKERS': str(self.workers),
+            'DB_PATH': os.path.join(self.tmpdir, 'tasks.db'),
+            'RATE_LIMIT_MAX': str(self.rate_limit_max),
+            'LOG_CONSOLE': 'false'
+        }
+        output = None if self.verbose else subprocess.DEVNULL
+        self.process = subprocess.Popen(['node', 'cluster.js'], cwd=API_DIR, env=env, stdout=output, stderr=output)
+
+        try:
+            self.wait_ready()
+        except Exception:
+            self.__exit__(None, None, None)
+            raise
+        return self
+
+    def wait_ready(self):
+        # Os workers sobem em paralelo; /metrics do primário diz quantos já respondem
+        deadline = time.time() + STARTUP_TIMEOUT
+        while time.time() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"cluster.js encerrou durante a inicialização (código {self.process.returncode})")
+            snapshot = metrics_scraper.scrape(self.base_url, timeout=1)
+            if snapshot and self.live_workers(snapshot) >= self.workers:
+                return
+            time.sleep(0.2)
+        raise RuntimeError(f"Cluster com {self.workers} workers não ficou pronto em {STARTUP_TIMEOUT}s")
+
+    @staticmethod
+    def live_workers(snapshot):
+        # cluster_workers: quantos workers responderam à coleta do primário
+        return int(snapshot['samples'].get(('cluster_workers', ()), 0))
+
+    def __exit__(self, *exc):
+        if self.process:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+            self.process = None
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+
+def register_test_user(base_url):
+    body = json.dumps({
+        'email': 'testuser@example.com', 'username': 'testuser', 'password': '123456',
+        'firstName': 'Test', 'lastName': 'User'
+    }).encode()
+    request = urllib.request.Request(f"{base_url}/api/auth/register", data=body,
+                                     headers={'Content-Type': 'application/json'})
+    try:
+        urllib.request.urlopen(request, timeout=10).close()
+    except urllib.error.HTTPError as e:
+        if e.code != 409:
+            raise
+
+
+async def count_statuses(base_url, total, concurrency=20):
+    statuses = {}
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async with aiohttp.ClientSession() as session:
+        async def hit():
+            async with semaphore:
+                async with session.get(f"{base_url}/health") as response:
+                    statuses[response.status] = statuses.get(response.status, 0) + 1
+
+        await asyncio.gather(*(hit() for _ in range(total)))
+    return statuses
+
+
+def check_rate_limit(workers, limit=RATE_LIMIT_CHECK, verbose=False):
+    """Com o store no primário, o limite vale para o IP e não para cada worker."""
+    with LocalCluster(workers, rate_limit_max=limit, verbose=verbose) as cluster:
+        statuses = asyncio.run(count_statuses(cluster.base_url, limit * 2))
+
+    passed = statuses.get(200, 0)
+    ok = passed == limit
+    print(f"Rate limiting com {workers} workers: {passed} de {limit * 2} liberadas (limite {limit}) "
+          f"{'✓' if ok else '✗ contadores não são compartilhados'}")
+    return ok
+
+
+def client_main(conn, base_url, endpoint, concurrency, requests, start_at):
+    """Processo cliente: malha fechada com `concurrency` requisições simultâneas."""
+    try:
+        runner = StressTestRunner(base_url)
+        time.sleep(max(start_at - time.time(), 0))
+        duration = asyncio.run(runner.stress_test_endpoint(endpoint, concurrent_requests=concurrency,
+                                                           total_requests=requests))
+        conn.send({
+            'duration': duration,
+            'counters': {key: runner.results[key] for key in COUNTER_KEYS},
+            'errors': dict(runner.results['errors']),
+            'latency': runner.results['latency'].to_dict(),
+            'curve': []
+        })
+    except Exception as e:
+        conn.send({'error': str(e)})
+    finally:
+        conn.close()
+
+
+def measure(workers, endpoint, requests, clients, concurrency, verbose=False):
+    with LocalCluster(workers, verbose=verbose) as cluster:
+        register_test_user(cluster.base_url)
+
+        # Aquecimento: JIT, cache de statements e cache de respostas de todos os workers
+        warmup = StressTestRunner(cluster.base_url)
+        asyncio.run(warmup.stress_test_endpoint(endpoint, concurrent_requests=concurrency,
+                                                total_requests=max(requests // 10, 100)))
+
+        before = metrics_scraper.scrape(cluster.base_url)
+        start_at = time.time() + 1 + 0.2 * clients
+        processes, connections = [], []
+        for _ in range(clients):
+            parent_conn, child_conn = multiprocessing.Pipe(duplex=False)
+            process = multiprocessing.Process(
+                target=client_main,
+                args=(child_conn, cluster.base_url, endpoint, concurrency, requests // clients, start_at),
+                daemon=True
+            )
+            process.start()
+            child_conn.close()
+            processes.append(process)
+            connections.append(parent_conn)
+
+        reports = []
+        for conn in connections:
+            report = conn.recv()
+            if 'error' in report:
+                raise RuntimeError(f"Cliente falhou: {report['error']}")
+            reports.append(report)
+        for process in processes:
+            process.join()
+
+        after = metrics_scraper.scrape(cluster.base_url)
+
+    merged, _ = merge_reports(reports)
+    latency = merged.results['latency'].total()
+    duration = max(report['duration'] for report in reports)
+    server = metrics_scraper.summarize(metrics_scraper.diff(before, after)) if before and after else None
+
+    return {
+        'workers': workers,
+        'requests': merged.results['total_requests'],
+        'successful': merged.results['successful'],
+        'failed': merged.results['failed'] + merged.results['timeouts'] + merged.results['connection_errors'],
+        'rate_limited': merged.results['rate_limited'],
+        'duration': duration,
+        'rps': merged.results['total_requests'] / duration if duration > 0 else 0,
+        'p50': latency.percentile(50),
+        'p99': latency.percentile(99),
+        'server_cpu_seconds': server['cpu_seconds'] if server else None,
+        'server_eventloop_p99': server['event_loop_lag']['p99'] if server else None
+    }
+
+
+def print_table(results):
+    base = results[0]['rps'] if results and results[0]['rps'] > 0 else None
+    print(f"\n{'='*86}")
+    print(f"{'Workers':>7} {'Req':>8} {'Falhas':>7} {'RPS':>9} {'Escala':>7} {'p50':>9} {'p99':>9} "
+          f"{'CPU serv.':>10} {'Lag p99':>9}")
+    for r in results:
+        scale = f"{r['rps'] / base:.2f}x" if base else '-'
+        cpu = f"{r['server_cpu_seconds']:.1f}s" if r['server_cpu_seconds'] is not None else '-'
+        lag = f"{r['server_eventloop_p99'] * 1000:.1f}ms" if r['server_eventloop_p99'] is not None else '-'
+        print(f"{r['workers']:>7} {r['requests']:>8} {r['failed']:>7} {r['rps']:>9.1f} {scale:>7} "
+              f"{r['p50'] * 1000:>7.2f}ms {r['p99'] * 1000:>7.2f}ms {cpu:>10} {lag:>9}")
+    print(f"{'='*86}")
+    print(f"Núcleos na máquina: {os.cpu_count()} (clientes e servidor dividem a mesma CPU)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Vazão da API em cluster por número de workers")
+    parser.add_argument('--workers', type=int, nargs='+', default=default_worker_counts())
+    parser.add_argument('--endpoint', default="/api/tasks")
+    parser.add_argument('--requests', type=int, default=10000, help="requisições medidas por execução")
+    parser.add_argument('--clients', type=int, default=max((os.cpu_count() or 1) // 2, 1),
+                        help="processos geradores de carga")
+    parser.add_argument('--concurrency', type=int, default=50, help="requisições simultâneas por cliente")
+    parser.add_argument('--skip-rate-limit-check', action='store_true')
+    parser.add_argument('--output', help="arquivo JSON (padrão: results/cluster_scaling-<data>.json)")
+    parser.add_argument('--verbose', action='store_true', help="mostrar a saída do cluster")
+    args = parser.parse_args()
+
+    if not args.skip_rate_limit_check:
+        check_rate_limit(max(args.workers), verbose=args.verbose)
+
+    results = []
+    for workers in args.workers:
+        print(f"\n▶ {workers} worker(s): {args.requests} requisições em {args.endpoint} "
+              f"({args.clients} clientes x {args.concurrency} simultâneas)")
+        results.append(measure(workers, args.endpoint, args.requests, args.clients, args.concurrency,
+                               verbose=args.verbose))
+
+    print_table(results)
+
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f"cluster_scaling-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump({'cpu_count': os.cpu_count(), 'config': vars(args), 'results': results}, f, indent=2)
+    print(f"Resultados salvos em {output}")
+
+
+if __name__ == "__main__":
+    main()
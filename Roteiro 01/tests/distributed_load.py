@@ -0,0 +1,197 @@
+"""Gerador de carga distribuído em vários processos.
+
+Um único loop asyncio satura um núcleo do cliente antes de saturar o servidor.
+O coordenador abaixo cria N processos, cada um com seu próprio event loop e
+uma fração da taxa alvo, executando o teste em malha aberta do
+StressTestRunner, ou uma fração dos usuários virtuais de um cenário
+(scenario.py). Ao final, cada processo envia pelo pipe seus contadores e
+histogramas, que são mesclados em um único relatório. O coordenador também lê
+/metrics do servidor antes e depois da execução (visão do servidor no relatório).
+
+Exemplos:
+
+    python distributed_load.py --workers 4 --rps 2000
+    python distributed_load.py --url http://localhost:3000 --endpoints /health /api/products
+    python distributed_load.py --workers 4 --scenario scenarios/producao.json
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import time
+
+import metrics_scraper
+from latency_histogram import HistogramSet, LatencyHistogram
+from scenario import ScenarioRunner, load_scenario
+from stress_test import SCRAPE_METRICS, StressTestRunner
+
+COUNTER_KEYS = ('total_requests', 'successful', 'failed', 'rate_limited', 'timeouts', 'connection_errors', 'dropped')
+
+
+def serialize_curve(curve):
+    return [{**point, 'histogram': point['histogram'].to_dict()} for point in curve]
+
+
+def worker_main(conn, worker_id, workers, base_url, endpoints, rate, ramp_steps, step_duration, max_in_flight,
+                start_at, scenario=None):
+    """Processo gerador: executa a malha aberta (ou o cenário) e devolve o resultado pelo pipe."""
+    try:
+        report = {'worker': worker_id}
+
+        if scenario is not None:
+            runner = ScenarioRunner(scenario, base_url, worker_index=worker_id)
+            # Cada processo fica com uma fatia dos usuários virtuais
+            users = runner.build_users()[worker_id::workers]
+            report['duration'] = asyncio.run(runner.run(users, start_at=start_at))
+            report['cache'] = [[label, kind, count] for (label, kind), count in runner.cache_stats.items()]
+            report['skipped'] = dict(runner.skipped)
+            report['setup_failures'] = [[status, count] for status, count in runner.setup_failures.items()]
+            curve = []
+        else:
+            runner = StressTestRunner(base_url)
+            # Desencontrar a ordem dos endpoints entre processos
+            offset = worker_id % len(endpoints)
+            rotated = endpoints[offset:] + endpoints[:offset]
+
+            curve = asyncio.run(runner.open_loop_test(
+                rotated,
+                target_rps=rate,
+                ramp_steps=ramp_steps,
+                step_duration=step_duration,
+                max_in_flight=max_in_flight,
+                start_at=start_at
+            ))
+
+        report.update({
+            'counters': {key: runner.results[key] for key in COUNTER_KEYS},
+            'errors': dict(runner.results['errors']),
+            'latency': runner.results['latency'].to_dict(),
+            'curve': serialize_curve(curve)
+        })
+        conn.send(report)
+    except Exception as e:
+        conn.send({'worker': worker_id, 'error': str(e)})
+    finally:
+        conn.close()
+
+
+def merge_reports(reports, scenario=None):
+    """Mescla os relatórios dos processos em um único runner e em uma curva única."""
+    merged = ScenarioRunner(scenario) if scenario is not None else StressTestRunner()
+
+    for report in reports:
+        for key in COUNTER_KEYS:
+            merged.results[key] += report['counters'][key]
+        merged.results['errors'].update(report['errors'])
+        merged.results['latency'].merge(HistogramSet.from_dict(report['latency']))
+        if scenario is not None:
+            for label, kind, count in report['cache']:
+                merged.cache_stats[(label, kind)] += count
+            merged.skipped.update(report['skipped'])
+            for status, count in report['setup_failures']:
+                merged.setup_failures[status] += count
+
+    curve = []
+    for points in zip(*(report['curve'] for report in reports)):
+        histogram = LatencyHistogram()
+        for point in points:
+            histogram.merge(LatencyHistogram.from_dict(point['histogram']))
+
+        curve.append(StressTestRunner.curve_point(
+            points[0]['step'],
+            sum(point['target_rps'] for point in points),
+            histogram,
+            achieved_rps=sum(point['achieved_rps'] for point in points),
+            errors=sum(point['errors'] for point in points),
+            rate_limited=sum(point['rate_limited'] for point in points),
+            dropped=sum(point['dropped'] for point in points)
+        ))
+
+    return merged, curve
+
+
+def run_distributed(base_url, endpoints, target_rps, workers, ramp_steps=5, step_duration=10, max_in_flight=1000,
+                    scenario=None):
+    if scenario is not None:
+        print(f"Coordenador: {workers} processos, cenário '{scenario.get('name', '')}' "
+              f"com {scenario.get('users', {}).get('count', 10)} usuários virtuais")
+    else:
+        print(f"Coordenador: {workers} processos, {target_rps} RPS no total ({target_rps / workers:.1f} RPS por processo)")
+
+    # Margem para todos os processos subirem e fazerem login antes do início sincronizado
+    start_at = time.time() + 2 + 0.2 * workers
+    if scenario is not None:
+        # Registro com bcrypt dos usuários virtuais é lento
+        start_at += 0.3 * scenario.get('users', {}).get('count', 10) / workers
+    processes = []
+    connections = []
+
+    # Base da visão do servidor: uma leitura para todos os processos
+    metrics_before = metrics_scraper.scrape(base_url) if SCRAPE_METRICS else None
+
+    for worker_id in range(workers):
+        parent_conn, child_conn = multiprocessing.Pipe(duplex=False)
+        process = multiprocessing.Process(
+            target=worker_main,
+            args=(child_conn, worker_id, workers, base_url, endpoints, target_rps / workers,
+                  ramp_steps, step_duration, max_in_flight, start_at, scenario),
+            daemon=True
+        )
+        process.start()
+        child_conn.close()
+        processes.append(process)
+        connections.append(parent_conn)
+
+    reports = []
+    for worker_id, conn in enumerate(connections):
+        try:
+            report = conn.recv()
+        except EOFError:
+            report = {'worker': worker_id, 'error': 'processo terminou sem enviar resultados'}
+
+        if 'error' in report:
+            print(f"❌ Processo {report['worker']} falhou: {report['error']}")
+        else:
+            reports.append(report)
+
+    for process in processes:
+        process.join()
+
+    if not reports:
+        raise RuntimeError("Nenhum processo gerador concluiu o teste")
+
+    merged, curve = merge_reports(reports, scenario)
+    merged.base_url = base_url
+    merged.metrics_before = metrics_before
+    return merged, curve
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gerador de carga distribuído (malha aberta, vários processos)")
+    parser.add_argument('--url', default="http://localhost:3000")
+    parser.add_argument('--endpoints', nargs='+', default=["/api/tasks"])
+    parser.add_argument('--rps', type=float, default=1000, help="taxa alvo total no último degrau")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--steps', type=int, default=5)
+    parser.add_argument('--duration', type=float, default=10, help="duração de cada degrau em segundos")
+    parser.add_argument('--max-in-flight', type=int, default=1000, help="limite de requisições pendentes por processo")
+    parser.add_argument('--scenario', help="arquivo de cenário (JSON/YAML) em vez de endpoints fixos")
+    args = parser.parse_args()
+
+    scenario = load_scenario(args.scenario) if args.scenario else None
+
+    merged, curve = run_distributed(
+        args.url, args.endpoints, args.rps, args.workers,
+        ramp_steps=args.steps, step_duration=args.duration, max_in_flight=args.max_in_flight,
+        scenario=scenario
+    )
+
+    if scenario is not None:
+        merged.print_scenario_results(scenario.get('duration', 60))
+    else:
+        merged.print_latency_curve(curve)
+        merged.print_results(f"Distribuído ({args.workers} processos)")
+
+
+if __name__ == "__main__":
+    main()
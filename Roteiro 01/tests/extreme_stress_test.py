@@ -7,6 +7,12 @@ import threading
 import subprocess
 import signal
 import os
+from collections import Counter
+
+from latency_histogram import HistogramSet
+
+# Diretório opcional para salvar os histogramas de cada teste (comparação entre builds)
+HISTOGRAM_DIR = os.environ.get('STRESS_HISTOGRAM_DIR')
 
 class ExtremeStressTest:
     def __init__(self, base_url="http://localhost:3000"):
@@ -19,8 +25,8 @@ class ExtremeStressTest:
             'rate_limited': 0,
             'timeouts': 0,
             'connection_errors': 0,
-            'response_times': [],
-            'errors': []
+            'latency': HistogramSet(),
+            'errors': Counter()
         }
     
     async def login(self, session):
@@ -65,7 +71,7 @@ class ExtremeStressTest:
                     status = response.status
             
             response_time = time.time() - start_time
-            self.results['response_times'].append(response_time)
+            self.results['latency'].record(endpoint, status, response_time)
             self.results['total_requests'] += 1
             
             if status == 200 or status == 201:
@@ -74,20 +80,20 @@ class ExtremeStressTest:
                 self.results['rate_limited'] += 1
             else:
                 self.results['failed'] += 1
-                self.results['errors'].append(f"Status {status}")
+                self.results['errors'][f"Status {status}"] += 1
                 
         except asyncio.TimeoutError:
             self.results['total_requests'] += 1
             self.results['timeouts'] += 1
-            self.results['errors'].append("Timeout")
+            self.results['errors']["Timeout"] += 1
         except aiohttp.ClientConnectorError as e:
             self.results['total_requests'] += 1
             self.results['connection_errors'] += 1
-            self.results['errors'].append(f"Connection Error: {str(e)}")
+            self.results['errors'][f"Connection Error: {str(e)}"] += 1
         except Exception as e:
             self.results['total_requests'] += 1
             self.results['failed'] += 1
-            self.results['errors'].append(str(e))
+            self.results['errors'][str(e)] += 1
     
     async def extreme_load_test(self):
         """Teste extremo com timeout muito baixo para forçar perda de pacotes"""
@@ -213,8 +219,7 @@ class ExtremeStressTest:
         print(f"Flood curl completado em {duration:.2f} segundos")
     
     def print_results(self, test_name, duration=None):
-        avg_response_time = sum(self.results['response_times']) / len(self.results['response_times']) if self.results['response_times'] else 0
-        max_response_time = max(self.results['response_times']) if self.results['response_times'] else 0
+        latency = self.results['latency'].total()
         
         print(f"\n{'='*60}")
         print(f"🔥 RESULTADOS EXTREMOS: {test_name}")
@@ -239,9 +244,13 @@ class ExtremeStressTest:
             else:
                 print("⚠️ Sistema muito robusto - sem perda de pacotes detectada")
         
-        if avg_response_time > 0:
-            print(f"⏱️ Tempo médio: {avg_response_time:.3f}s")
-            print(f"⏱️ Tempo máximo: {max_response_time:.3f}s")
+        if latency.count > 0:
+            print(f"⏱️ Tempo médio: {latency.mean:.3f}s")
+            print(f"⏱️ Tempo máximo: {latency.max:.3f}s")
+            print(f"⏱️ p50={latency.percentile(50):.3f}s p90={latency.percentile(90):.3f}s "
+                  f"p99={latency.percentile(99):.3f}s p99.9={latency.percentile(99.9):.3f}s")
+            print("\n📈 Latência por endpoint e classe de status:")
+            self.results['latency'].print_table()
         
         if duration:
             rps = self.results['total_requests'] / duration if duration > 0 else 0
@@ -250,14 +259,16 @@ class ExtremeStressTest:
         # Mostrar erros específicos
         if self.results['errors']:
             print(f"\n🔍 Tipos de erros encontrados:")
-            error_counts = {}
-            for error in self.results['errors'][:20]:  # Primeiros 20
-                error_counts[error] = error_counts.get(error, 0) + 1
-            
-            for error, count in error_counts.items():
+            for error, count in self.results['errors'].most_common(20):
                 print(f"  • {error}: {count}x")
         
         print(f"{'='*60}\n")
+        
+        if HISTOGRAM_DIR:
+            path = os.path.join(HISTOGRAM_DIR, f"{test_name}.json")
+            os.makedirs(HISTOGRAM_DIR, exist_ok=True)
+            self.results['latency'].dump(path)
+            print(f"Histogramas salvos em {path}")
     
     def reset_results(self):
         self.results = {
@@ -267,8 +278,8 @@ class ExtremeStressTest:
             'rate_limited': 0,
             'timeouts': 0,
             'connection_errors': 0,
-            'response_times': [],
-            'errors': []
+            'latency': HistogramSet(),
+            'errors': Counter()
         }
 
 async def main():
@@ -0,0 +1,692 @@
+"""Benchmark reproduzível gRPC x REST com a mesma carga nas duas APIs.
+
+Compara a API Express (Roteiro 01, /api/tasks) com o TaskService gRPC
+(Roteiro 02, protos/task_service.proto) usando clientes assíncronos dos dois
+lados: aiohttp para REST e stubs grpc.aio gerados em tempo de execução a partir
+do .proto (requer grpcio e grpcio-tools).
+
+Cargas (cada uma sobe os dois servidores do zero, com bancos temporários):
+
+    crud     create -> get -> update -> delete por iteração
+    list     páginas de GET /api/tasks x GetTasks sobre uma coleção semeada
+    stream   StreamTasks lendo todas as tarefas x REST paginado por cursor
+
+Métricas por carga e transporte: vazão (operações/s), percentis de latência
+(LatencyHistogram), bytes trafegados em cada sentido e tempo de CPU do cliente.
+Os bytes são contados por um relay TCP em outro processo, entre o cliente e o
+servidor: incluem cabeçalhos HTTP/1.1 e quadros HTTP/2 (HPACK), mas não TCP/IP.
+
+Os resultados são salvos em JSON (com o commit atual) para comparar execuções:
+
+    python grpc_vs_rest.py --iterations 500 --concurrency 20
+    python grpc_vs_rest.py --workloads stream --tasks 1000
+    python grpc_vs_rest.py --compare results/antes.json results/depois.json
+"""
+import argparse
+import asyncio
+import json
+import math
+import multiprocessing
+import os
+import platform
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime
+
+import aiohttp
+
+from latency_histogram import LatencyHistogram
+
+try:
+    import grpc
+except ImportError:
+    grpc = None
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+REST_DIR = os.path.normpath(os.path.join(TESTS_DIR, '..'))
+GRPC_DIR = os.path.normpath(os.path.join(TESTS_DIR, '..', '..', 'Roteiro 02', 'Aluno'))
+PROTO_DIR = os.path.join(GRPC_DIR, 'protos')
+RESULTS_DIR = os.path.join(TESTS_DIR, 'results')
+
+WORKLOADS = ('crud', 'list', 'stream')
+TRANSPORTS = ('rest', 'grpc')
+PRIORITIES = ('low', 'medium', 'high', 'urgent')
+
+# Regressão: vazão menor ou p99 maior que este percentual em relação à base
+REGRESSION_THRESHOLD = 10
+
+STARTUP_TIMEOUT = 30
+
+# Página usada pelo equivalente REST do StreamTasks (máximo aceito pelas duas APIs)
+STREAM_PAGE_SIZE = 100
+
+
+# ---------------------------------------------------------------------------
+# Servidores e relay de contagem de bytes
+# ---------------------------------------------------------------------------
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def wait_for_port(port, process, timeout=STARTUP_TIMEOUT):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Servidor encerrou durante a inicialização (código {process.returncode})")
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"Servidor não respondeu na porta {port} em {timeout}s")
+
+
+class LocalServers:
+    """Sobe a API REST e o servidor gRPC com bancos temporários e sem logs por requisição."""
+
+    def __init__(self, rest_port=None, grpc_port=None, verbose=False):
+        self.rest_port = rest_port or free_port()
+        self.grpc_port = grpc_port or free_port()
+        self.verbose = verbose
+        self.processes = []
+        self.tmpdir = None
+
+    def spawn(self, cwd, port, extra_env):
+        env = {
+            **os.environ,
+            'PORT': str(port),
+            'LOG_CONSOLE': 'false',
+            'GRPC_ERROR_LOGGING': 'false',
+            **extra_env
+        }
+        output = None if self.verbose else subprocess.DEVNULL
+        process = subprocess.Popen(['node', 'server.js'], cwd=cwd, env=env, stdout=output, stderr=output)
+        self.processes.append(process)
+        wait_for_port(port, process)
+
+    def __enter__(self):
+        self.tmpdir = tempfile.mkdtemp(prefix='grpc_vs_rest_')
+        try:
+            self.spawn(REST_DIR, self.rest_port, {
+                'DB_PATH': os.path.join(self.tmpdir, 'rest.db'),
+                'RATE_LIMIT_MAX': str(10 ** 9)
+            })
+            self.spawn(GRPC_DIR, self.grpc_port, {
+                'DB_PATH': os.path.join(self.tmpdir, 'grpc.db'),
+                'STREAM_REPLAY_DELAY': '0'
+            })
+        except Exception:
+            self.__exit__(None, None, None)
+            raise
+        return self
+
+    def __exit__(self, *exc):
+        for process in self.processes:
+            process.terminate()
+        for process in self.processes:
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        self.processes = []
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+
+def relay_main(listen_port, target_port, sent, received, ready):
+    """Processo relay: repassa as conexões para o servidor contando os bytes de cada sentido."""
+
+    async def pipe(reader, writer, counter):
+        try:
+            while True:
+                data = await reader.read(65536)
+                if not data:
+                    break
+                with counter.get_lock():
+                    counter.value += len(data)
+                writer.write(data)
+                await writer.drain()
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            writer.close()
+
+    async def handle(client_reader, client_writer):
+        try:
+            server_reader, server_writer = await asyncio.open_connection('127.0.0.1', target_port)
+        except OSError:
+            client_writer.close()
+            return
+        for sock in (client_writer, server_writer):
+            sock.get_extra_info('socket').setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        await asyncio.gather(
+            pipe(client_reader, server_writer, sent),
+            pipe(server_reader, client_writer, received)
+        )
+
+    async def serve():
+        server = await asyncio.start_server(handle, '127.0.0.1', listen_port)
+        ready.set()
+        async with server:
+            await server.serve_forever()
+
+    asyncio.run(serve())
+
+
+class WireCounter:
+    """Relay TCP em outro processo, para não somar o custo da contagem à CPU do cliente."""
+
+    def __init__(self, target_port):
+        self.target_port = target_port
+        self.port = free_port()
+        self.sent = multiprocessing.Value('q', 0)
+        self.received = multiprocessing.Value('q', 0)
+        ready = multiprocessing.Event()
+        self.process = multiprocessing.Process(
+            target=relay_main,
+            args=(self.port, target_port, self.sent, self.received, ready),
+            daemon=True
+        )
+        self.process.start()
+        if not ready.wait(STARTUP_TIMEOUT):
+            raise RuntimeError("Relay de contagem de bytes não iniciou")
+
+    def snapshot(self):
+        return self.sent.value, self.received.value
+
+    def close(self):
+        self.process.terminate()
+        self.process.join()
+
+
+# ---------------------------------------------------------------------------
+# Medição
+# ---------------------------------------------------------------------------
+
+class Measurement:
+    """Latência por operação, vazão, bytes e CPU do cliente de uma carga em um transporte."""
+
+    def __init__(self, workload, transport, wire=None):
+        self.workload = workload
+        self.transport = transport
+        self.wire = wire
+        self.histograms = {}
+        self.operations = 0
+        self.errors = Counter()
+        self.items = 0
+        self.cache = Counter()
+
+    def record(self, operation, seconds):
+        histogram = self.histograms.get(operation)
+        if histogram is None:
+            histogram = self.histograms[operation] = LatencyHistogram()
+        histogram.record(seconds)
+        self.operations += 1
+
+    def error(self, operation, error):
+        self.errors[f"{operation}: {error}"] += 1
+
+    async def timed(self, operation, coroutine):
+        start = time.perf_counter()
+        try:
+            result = await coroutine
+        except Exception as e:
+            if grpc is not None and isinstance(e, grpc.aio.AioRpcError):
+                self.error(operation, e.code().name)
+            else:
+                self.error(operation, str(e) or type(e).__name__)
+            return None
+        self.record(operation, time.perf_counter() - start)
+        return result
+
+    def __enter__(self):
+        self.wire_start = self.wire.snapshot() if self.wire else (0, 0)
+        self.cpu_start = time.process_time()
+        self.wall_start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.duration = time.perf_counter() - self.wall_start
+        self.cpu = time.process_time() - self.cpu_start
+        wire_end = self.wire.snapshot() if self.wire else (0, 0)
+        self.bytes_sent = wire_end[0] - self.wire_start[0]
+        self.bytes_received = wire_end[1] - self.wire_start[1]
+
+    def to_dict(self):
+        total = LatencyHistogram()
+        for histogram in self.histograms.values():
+            total.merge(histogram)
+        operations = max(self.operations, 1)
+        return {
+            'operations': self.operations,
+            'errors': sum(self.errors.values()),
+            'error_details': dict(self.errors),
+            'items': self.items,
+            'duration': self.duration,
+            'throughput': self.operations / self.duration if self.duration else 0,
+            'latency': {name: histogram.summary() for name, histogram in sorted(self.histograms.items())},
+            'latency_total': total.summary(),
+            'histograms': {name: histogram.to_dict() for name, histogram in sorted(self.histograms.items())},
+            'bytes_sent': self.bytes_sent if self.wire else None,
+            'bytes_received': self.bytes_received if self.wire else None,
+            'bytes_per_operation': (self.bytes_sent + self.bytes_received) / operations if self.wire else None,
+            'client_cpu_seconds': self.cpu,
+            'client_cpu_us_per_operation': self.cpu / operations * 1_000_000,
+            'cache': dict(self.cache)
+        }
+
+
+# ---------------------------------------------------------------------------
+# Clientes com a mesma interface para as duas APIs
+# ---------------------------------------------------------------------------
+
+class RestTasks:
+    transport = 'rest'
+
+    def __init__(self, port, measurement_cache=None):
+        self.base_url = f"http://127.0.0.1:{port}"
+        self.session = None
+        self.headers = {}
+        self.cache = measurement_cache
+
+    async def open(self, username, password):
+        connector = aiohttp.TCPConnector(limit=0)
+        self.session = aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=30))
+        data = await self.call('POST', '/api/auth/register', {
+            'email': f"{username}@example.com", 'username': username, 'password': password,
+            'firstName': 'Bench', 'lastName': 'User'
+        }, expected=201)
+        self.headers = {'Authorization': f"Bearer {data['data']['token']}"}
+
+    async def close(self):
+        await self.session.close()
+
+    async def call(self, method, path, body=None, params=None, expected=200):
+        async with self.session.request(method, self.base_url + path, json=body, params=params,
+                                        headers=self.headers) as response:
+            data = await response.json()
+            if response.status != expected:
+                raise RuntimeError(f"HTTP {response.status}")
+            if self.cache is not None and 'X-Cache' in response.headers:
+                self.cache[response.headers['X-Cache']] += 1
+            return data
+
+    async def create(self, title, description, priority):
+        data = await self.call('POST', '/api/tasks', {
+            'title': title, 'description': description, 'priority': priority
+        }, expected=201)
+        return data['data']['id']
+
+    async def get(self, task_id):
+        return await self.call('GET', f'/api/tasks/{task_id}')
+
+    async def update(self, task_id, completed):
+        return await self.call('PUT', f'/api/tasks/{task_id}', {'completed': completed})
+
+    async def delete(self, task_id):
+        return await self.call('DELETE', f'/api/tasks/{task_id}')
+
+    async def list(self, page, limit):
+        data = await self.call('GET', '/api/tasks', params={'page': str(page), 'limit': str(limit)})
+        return len(data['data'])
+
+    async def stream(self, expected, page_size):
+        """Equivalente REST do StreamTasks: todas as tarefas em páginas por cursor."""
+        received = 0
+        params = {'limit': str(page_size)}
+        while True:
+            data = await self.call('GET', '/api/tasks', params=params)
+            received += len(data['data'])
+            cursor = data['pagination'].get('nextCursor')
+            if not cursor or received >= expected:
+                return received
+            params = {'limit': str(page_size), 'cursor': cursor}
+
+
+def load_task_stubs():
+    """Gera as mensagens e o stub do TaskService a partir do .proto (grpcio-tools)."""
+    if grpc is None:
+        raise RuntimeError("grpcio não instalado: pip install grpcio grpcio-tools")
+    if PROTO_DIR not in sys.path:
+        sys.path.append(PROTO_DIR)
+    return grpc.protos_and_services('task_service.proto')
+
+
+def load_auth_stubs():
+    return grpc.protos_and_services('auth_service.proto')
+
+
+class GrpcTasks:
+    transport = 'grpc'
+
+    # measurement_cache só mantém a mesma assinatura de RestTasks (CLIENTS[transport]):
+    # o serviço gRPC não devolve o estado do cache, então não há o que contar
+    def __init__(self, port, measurement_cache=None):
+        self.target = f"127.0.0.1:{port}"
+        self.pb, self.services = load_task_stubs()
+        self.auth_pb, self.auth_services = load_auth_stubs()
+        self.channel = None
+        self.metadata = ()
+
+    async def open(self, username, password):
+        self.channel = grpc.aio.insecure_channel(self.target)
+        self.stub = self.services.TaskServiceStub(self.channel)
+        auth = self.auth_services.AuthServiceStub(self.channel)
+        response = await auth.Register(self.auth_pb.RegisterRequest(
+            email=f"{username}@example.com", username=username, password=password,
+            first_name='Bench', last_name='User'
+        ))
+        if not response.success:
+            raise RuntimeError(f"Registro gRPC falhou: {response.message}")
+        self.metadata = (('authorization', f"Bearer {response.token}"),)
+
+    async def close(self):
+        await self.channel.close()
+
+    async def create(self, title, description, priority):
+        response = await self.stub.CreateTask(self.pb.CreateTaskRequest(
+            title=title, description=description, priority=PRIORITIES.index(priority)
+        ), metadata=self.metadata)
+        return response.task.id
+
+    async def get(self, task_id):
+        return await self.stub.GetTask(self.pb.GetTaskRequest(task_id=task_id), metadata=self.metadata)
+
+    async def update(self, task_id, completed):
+        return await self.stub.UpdateTask(
+            self.pb.UpdateTaskRequest(task_id=task_id, completed=completed), metadata=self.metadata
+        )
+
+    async def delete(self, task_id):
+        return await self.stub.DeleteTask(self.pb.DeleteTaskRequest(task_id=task_id), metadata=self.metadata)
+
+    async def list(self, page, limit):
+        response = await self.stub.GetTasks(self.pb.GetTasksRequest(page=page, limit=limit), metadata=self.metadata)
+        return len(response.tasks)
+
+    async def stream(self, expected, page_size):
+        # O stream continua aberto para atualizações: encerra após as tarefas existentes
+        call = self.stub.StreamTasks(self.pb.StreamTasksRequest(), metadata=self.metadata)
+        received = 0
+        async for _ in call:
+            received += 1
+            if received >= expected:
+                break
+        call.cancel()
+        return received
+
+
+CLIENTS = {'rest': RestTasks, 'grpc': GrpcTasks}
+
+
+# ---------------------------------------------------------------------------
+# Cargas
+# ---------------------------------------------------------------------------
+
+class GrpcVsRestBenchmark:
+    def __init__(self, iterations=200, concurrency=10, tasks=500, page_size=20, stream_rounds=20,
+                 warmup=20, wire=True, verbose=False):
+        self.iterations = iterations
+        self.concurrency = concurrency
+        self.tasks = tasks
+        self.page_size = page_size
+        self.stream_rounds = stream_rounds
+        self.warmup = warmup
+        self.wire = wire
+        self.verbose = verbose
+
+    def config(self):
+        return {
+            'iterations': self.iterations,
+            'concurrency': self.concurrency,
+            'tasks': self.tasks,
+            'page_size': self.page_size,
+            'stream_rounds': self.stream_rounds,
+            'warmup': self.warmup,
+            'wire': self.wire
+        }
+
+    async def run_workers(self, count, job):
+        """Executa job(i) para i em [0, count) com `concurrency` workers (malha fechada)."""
+        queue = iter(range(count))
+
+        async def worker():
+            for i in queue:
+                await job(i)
+
+        await asyncio.gather(*(worker() for _ in range(min(self.concurrency, count))))
+
+    async def seed(self, client, count):
+        async def create(i):
+            await client.create(f"Tarefa {i}", f"Descrição da tarefa {i}", PRIORITIES[i % len(PRIORITIES)])
+        await self.run_workers(count, create)
+
+    async def crud(self, client, measurement, count, record=True):
+        async def iteration(i):
+            target = measurement if record else Measurement(measurement.workload, client.transport)
+            task_id = await target.timed('create', client.create(
+                f"Tarefa {i}", f"Descrição da tarefa {i}", PRIORITIES[i % len(PRIORITIES)]
+            ))
+            if task_id is None:
+                return
+            await target.timed('get', client.get(task_id))
+            await target.timed('update', client.update(task_id, i % 2 == 0))
+            await target.timed('delete', client.delete(task_id))
+
+        await self.run_workers(count, iteration)
+
+    async def list_pages(self, client, measurement, count, record=True):
+        pages = max(1, math.ceil(self.tasks / self.page_size))
+
+        async def iteration(i):
+            target = measurement if record else Measurement(measurement.workload, client.transport)
+            items = await target.timed('list', client.list(i % pages + 1, self.page_size))
+            if items is not None and record:
+                measurement.items += items
+
+        await self.run_workers(count, iteration)
+
+    async def stream_all(self, client, measurement, count, record=True):
+        async def iteration(i):
+            target = measurement if record else Measurement(measurement.workload, client.transport)
+            items = await target.timed('stream', client.stream(self.tasks, STREAM_PAGE_SIZE))
+            if items is not None and record:
+                measurement.items += items
+                if items < self.tasks:
+                    measurement.error('stream', f"{items}/{self.tasks} tarefas")
+
+        await self.run_workers(count, iteration)
+
+    async def run_transport(self, workload, transport, port):
+        wire = WireCounter(port) if self.wire else None
+        measurement = Measurement(workload, transport, wire)
+        client = CLIENTS[transport](wire.port if wire else port, measurement.cache)
+
+        try:
+            await client.open(f"bench{transport}{workload}{os.getpid()}", 'bench123')
+
+            if workload == 'crud':
+                await self.crud(client, measurement, self.warmup, record=False)
+                with measurement:
+                    await self.crud(client, measurement, self.iterations)
+            elif workload == 'list':
+                await self.seed(client, self.tasks)
+                await self.list_pages(client, measurement, self.warmup, record=False)
+                measurement.cache.clear()
+                with measurement:
+                    await self.list_pages(client, measurement, self.iterations)
+            else:
+                await self.seed(client, self.tasks)
+                await self.stream_all(client, measurement, min(self.warmup, 2), record=False)
+                measurement.cache.clear()
+                with measurement:
+                    await self.stream_all(client, measurement, self.stream_rounds)
+        finally:
+            await client.close()
+            if wire:
+                wire.close()
+
+        return measurement.to_dict()
+
+    def run(self, workloads=WORKLOADS):
+        results = {}
+        for workload in workloads:
+            results[workload] = {}
+            # Servidores novos por carga: bancos vazios e caches frios
+            with LocalServers(verbose=self.verbose) as servers:
+                ports = {'rest': servers.rest_port, 'grpc': servers.grpc_port}
+                for transport in TRANSPORTS:
+                    print(f"▶ {workload} / {transport}...")
+                    results[workload][transport] = asyncio.run(
+                        self.run_transport(workload, transport, ports[transport])
+                    )
+        return results
+
+
+# ---------------------------------------------------------------------------
+# Relatórios
+# ---------------------------------------------------------------------------
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=TESTS_DIR,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'desconhecido'
+
+
+def node_version():
+    try:
+        return subprocess.check_output(['node', '--version'], text=True).strip()
+    except OSError:
+        return None
+
+
+def build_report(benchmark, results):
+    return {
+        'meta': {
+            'commit': git_commit(),
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'node': node_version(),
+            'grpcio': getattr(grpc, '__version__', None),
+            'aiohttp': aiohttp.__version__,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'config': benchmark.config()
+        },
+        'results': results
+    }
+
+
+def save_report(report, output=None):
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+        output = os.path.join(RESULTS_DIR, f"grpc_vs_rest-{report['meta']['commit']}-{stamp}.json")
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    return output
+
+
+def format_bytes(value):
+    if value is None:
+        return '-'
+    for unit in ('B', 'KB', 'MB'):
+        if value < 1024:
+            return f"{value:.0f}{unit}"
+        value /= 1024
+    return f"{value:.1f}GB"
+
+
+def print_report(report):
+    print(f"\n{'='*100}")
+    print(f"gRPC x REST — commit {report['meta']['commit']} ({report['meta']['timestamp']})")
+    print(f"{'='*100}")
+    print(f"{'Carga':<8} {'Transp.':<6} {'Ops':>6} {'Erros':>6} {'ops/s':>9} {'p50':>8} {'p99':>8} "
+          f"{'enviado':>9} {'recebido':>9} {'B/op':>8} {'CPU µs/op':>10}")
+    for workload, transports in report['results'].items():
+        for transport, r in transports.items():
+            latency = r['latency_total']
+            print(f"{workload:<8} {transport:<6} {r['operations']:>6} {r['errors']:>6} {r['throughput']:>9.1f} "
+                  f"{latency['p50'] * 1000:>6.2f}ms {latency['p99'] * 1000:>6.2f}ms "
+                  f"{format_bytes(r['bytes_sent']):>9} {format_bytes(r['bytes_received']):>9} "
+                  f"{format_bytes(r['bytes_per_operation']):>8} {r['client_cpu_us_per_operation']:>10.0f}")
+        cache = transports.get('rest', {}).get('cache')
+        if cache:
+            print(f"{'':<8} (cache REST: {', '.join(f'{k}={v}' for k, v in sorted(cache.items()))})")
+    print(f"{'='*100}\n")
+
+
+def compare_reports(base_path, new_path, threshold=REGRESSION_THRESHOLD):
+    """Compara duas execuções salvas; retorna True se houver regressão acima do limite."""
+    with open(base_path, encoding='utf-8') as f:
+        base = json.load(f)
+    with open(new_path, encoding='utf-8') as f:
+        new = json.load(f)
+
+    print(f"\nBase: {base['meta']['commit']} ({base['meta']['timestamp']})  "
+          f"Nova: {new['meta']['commit']} ({new['meta']['timestamp']})")
+    if base['meta']['config'] != new['meta']['config']:
+        print("⚠ Configurações diferentes entre as execuções; a comparação pode não ser válida")
+
+    print(f"{'Carga':<8} {'Transp.':<6} {'ops/s':>20} {'p99 (ms)':>22} {'B/op':>20}")
+    regressed = False
+    for workload, transports in new['results'].items():
+        for transport, r in transports.items():
+            old = base['results'].get(workload, {}).get(transport)
+            if old is None:
+                continue
+
+            throughput = (r['throughput'] / old['throughput'] - 1) * 100 if old['throughput'] else 0
+            p99_old, p99_new = old['latency_total']['p99'], r['latency_total']['p99']
+            p99 = (p99_new / p99_old - 1) * 100 if p99_old else 0
+            flag = ''
+            if throughput < -threshold or p99 > threshold:
+                flag = '  ⚠ regressão'
+                regressed = True
+
+            bytes_old, bytes_new = old['bytes_per_operation'], r['bytes_per_operation']
+            bytes_delta = f"{format_bytes(bytes_old)}→{format_bytes(bytes_new)}" if bytes_new is not None else '-'
+            print(f"{workload:<8} {transport:<6} {old['throughput']:>8.1f}→{r['throughput']:<8.1f}({throughput:+.0f}%) "
+                  f"{p99_old * 1000:>7.2f}→{p99_new * 1000:<7.2f}({p99:+.0f}%) {bytes_delta:>20}{flag}")
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark gRPC x REST com servidores locais")
+    parser.add_argument('--workloads', nargs='+', choices=WORKLOADS, default=list(WORKLOADS))
+    parser.add_argument('--iterations', type=int, default=200, help="iterações medidas de crud/list")
+    parser.add_argument('--concurrency', type=int, default=10)
+    parser.add_argument('--tasks', type=int, default=500, help="tarefas semeadas para list/stream")
+    parser.add_argument('--page-size', type=int, default=20)
+    parser.add_argument('--stream-rounds', type=int, default=20, help="leituras completas no stream")
+    parser.add_argument('--warmup', type=int, default=20, help="iterações descartadas antes da medição")
+    parser.add_argument('--no-wire', action='store_true', help="sem relay: não mede bytes, conexão direta")
+    parser.add_argument('--output', help="arquivo JSON de saída (padrão: results/grpc_vs_rest-<commit>-<data>.json)")
+    parser.add_argument('--compare', nargs=2, metavar=('BASE', 'NOVA'), help="comparar dois resultados salvos")
+    parser.add_argument('--verbose', action='store_true', help="mostrar a saída dos servidores")
+    args = parser.parse_args()
+
+    if args.compare:
+        sys.exit(1 if compare_reports(*args.compare) else 0)
+
+    benchmark = GrpcVsRestBenchmark(
+        iterations=args.iterations, concurrency=args.concurrency, tasks=args.tasks,
+        page_size=args.page_size, stream_rounds=args.stream_rounds, warmup=args.warmup,
+        wire=not args.no_wire, verbose=args.verbose
+    )
+    report = build_report(benchmark, benchmark.run(args.workloads))
+    print_report(report)
+    print(f"Resultados salvos em {save_report(report, args.output)}")
+
+
+if __name__ == "__main__":
+    main()
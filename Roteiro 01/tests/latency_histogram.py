@@ -0,0 +1,209 @@
+"""Histogramas de latência com memória fixa (estilo HDR Histogram).
+
+Os valores são gravados em microssegundos em buckets log-lineares: cada
+potência de dois é dividida em sub-buckets de mesma largura, o que mantém o
+erro relativo abaixo de ~1,6% com SUB_BUCKET_BITS = 7. Gravar e mesclar são
+operações O(1) por amostra/bucket e a memória não cresce com o número de
+requisições, permitindo testes de longa duração (soak) com milhões de amostras.
+
+Uso para comparar execuções salvas com HistogramSet.dump():
+
+    python latency_histogram.py antes.json depois.json
+"""
+import json
+import math
+import sys
+
+SUB_BUCKET_BITS = 7
+MAX_VALUE_US = 3600 * 1000 * 1000  # 1 hora
+
+REPORT_PERCENTILES = (50, 90, 99, 99.9)
+
+
+class LatencyHistogram:
+    def __init__(self, sub_bucket_bits=SUB_BUCKET_BITS, max_value_us=MAX_VALUE_US):
+        self.sub_bucket_bits = sub_bucket_bits
+        self.max_value_us = max_value_us
+        self.sub_bucket_count = 1 << sub_bucket_bits
+        self.half_count = self.sub_bucket_count >> 1
+        self.counts = [0] * (self._index_of(max_value_us) + 1)
+        self.count = 0
+        self.total_us = 0
+        self.min_us = None
+        self.max_us = 0
+
+    def _index_of(self, value):
+        if value < self.sub_bucket_count:
+            return value
+        magnitude = value.bit_length() - self.sub_bucket_bits
+        sub_bucket = value >> magnitude
+        return self.sub_bucket_count + (magnitude - 1) * self.half_count + (sub_bucket - self.half_count)
+
+    def _bounds_of(self, index):
+        if index < self.sub_bucket_count:
+            return index, index + 1
+        offset = index - self.sub_bucket_count
+        magnitude = offset // self.half_count + 1
+        sub_bucket = offset % self.half_count + self.half_count
+        return sub_bucket << magnitude, (sub_bucket + 1) << magnitude
+
+    def record(self, seconds):
+        value = min(max(int(seconds * 1_000_000), 0), self.max_value_us)
+        self.counts[self._index_of(value)] += 1
+        self.count += 1
+        self.total_us += value
+        if self.min_us is None or value < self.min_us:
+            self.min_us = value
+        if value > self.max_us:
+            self.max_us = value
+
+    def merge(self, other):
+        if (other.sub_bucket_bits, other.max_value_us) != (self.sub_bucket_bits, self.max_value_us):
+            raise ValueError("Histogramas com configurações diferentes não podem ser mesclados")
+
+        for index, bucket_count in enumerate(other.counts):
+            if bucket_count:
+                self.counts[index] += bucket_count
+        self.count += other.count
+        self.total_us += other.total_us
+        if other.min_us is not None and (self.min_us is None or other.min_us < self.min_us):
+            self.min_us = other.min_us
+        self.max_us = max(self.max_us, other.max_us)
+        return self
+
+    def percentile(self, p):
+        """Latência (em segundos) no percentil p."""
+        if self.count == 0:
+            return 0
+        target = max(1, math.ceil(p / 100 * self.count))
+        cumulative = 0
+        for index, bucket_count in enumerate(self.counts):
+            cumulative += bucket_count
+            if cumulative >= target:
+                low, high = self._bounds_of(index)
+                value = (low + high - 1) / 2
+                return min(max(value, self.min_us), self.max_us) / 1_000_000
+        return self.max_us / 1_000_000
+
+    @property
+    def mean(self):
+        return self.total_us / self.count / 1_000_000 if self.count else 0
+
+    @property
+    def min(self):
+        return (self.min_us or 0) / 1_000_000
+
+    @property
+    def max(self):
+        return self.max_us / 1_000_000
+
+    def summary(self):
+        data = {'count': self.count, 'mean': self.mean, 'min': self.min, 'max': self.max}
+        for p in REPORT_PERCENTILES:
+            data[f"p{p:g}"] = self.percentile(p)
+        return data
+
+    def to_dict(self):
+        return {
+            'sub_bucket_bits': self.sub_bucket_bits,
+            'max_value_us': self.max_value_us,
+            'count': self.count,
+            'total_us': self.total_us,
+            'min_us': self.min_us,
+            'max_us': self.max_us,
+            # Formato esparso: apenas buckets ocupados
+            'counts': {str(i): c for i, c in enumerate(self.counts) if c}
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        histogram = cls(data['sub_bucket_bits'], data['max_value_us'])
+        for index, bucket_count in data['counts'].items():
+            histogram.counts[int(index)] = bucket_count
+        histogram.count = data['count']
+        histogram.total_us = data['total_us']
+        histogram.min_us = data['min_us']
+        histogram.max_us = data['max_us']
+        return histogram
+
+
+def status_class(status):
+    return f"{status // 100}xx"
+
+
+class HistogramSet:
+    """Um histograma por (endpoint, classe de status), mesclável entre execuções."""
+
+    def __init__(self):
+        self.histograms = {}
+
+    def record(self, endpoint, status, seconds):
+        key = (endpoint, status_class(status))
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = LatencyHistogram()
+        histogram.record(seconds)
+
+    def total(self):
+        merged = LatencyHistogram()
+        for histogram in self.histograms.values():
+            merged.merge(histogram)
+        return merged
+
+    def merge(self, other):
+        for key, histogram in other.histograms.items():
+            if key in self.histograms:
+                self.histograms[key].merge(histogram)
+            else:
+                self.histograms[key] = LatencyHistogram().merge(histogram)
+        return self
+
+    def items(self):
+        return sorted(self.histograms.items())
+
+    def to_dict(self):
+        return {
+            f"{endpoint} {klass}": histogram.to_dict()
+            for (endpoint, klass), histogram in self.items()
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        histogram_set = cls()
+        for key, histogram in data.items():
+            endpoint, klass = key.rsplit(' ', 1)
+            histogram_set.histograms[(endpoint, klass)] = LatencyHistogram.from_dict(histogram)
+        return histogram_set
+
+    def dump(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, encoding='utf-8') as f:
+            return cls.from_dict(json.load(f))
+
+    def print_table(self):
+        header = ' '.join(f"{'p' + format(p, 'g'):>8}" for p in REPORT_PERCENTILES)
+        print(f"{'Endpoint':<28} {'Status':>6} {'Amostras':>9} {header} {'máx':>8}")
+        for (endpoint, klass), histogram in self.items():
+            values = ' '.join(f"{histogram.percentile(p):>7.3f}s" for p in REPORT_PERCENTILES)
+            print(f"{endpoint:<28} {klass:>6} {histogram.count:>9} {values} {histogram.max:>7.3f}s")
+
+
+def main(paths):
+    merged = HistogramSet()
+    for path in paths:
+        histogram_set = HistogramSet.load(path)
+        print(f"\n== {path}")
+        histogram_set.print_table()
+        merged.merge(histogram_set)
+
+    if len(paths) > 1:
+        print("\n== Mesclado")
+        merged.print_table()
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,241 @@
+"""Leitura do endpoint /metrics do servidor (formato texto do Prometheus).
+
+Os contadores e histogramas do servidor são cumulativos desde o início do
+processo. Os testes de estresse leem /metrics antes e depois de cada execução
+e comparam a diferença com o que o cliente mediu: a latência vista pelo
+servidor não inclui rede nem fila do cliente, então uma distância grande entre
+as duas aponta para o gerador de carga ou para o caminho até o servidor, e não
+para a aplicação.
+
+Uso isolado (duas leituras com um intervalo entre elas):
+
+    python metrics_scraper.py http://localhost:3000 10
+"""
+import json
+import math
+import re
+import sys
+import time
+import urllib.request
+from collections import defaultdict
+
+SAMPLE_RE = re.compile(r'^([a-zA-Z_:][a-zA-Z0-9_:]*)(?:\{(.*)\})?\s+(\S+)$')
+LABEL_RE = re.compile(r'(\w+)="((?:[^"\\]|\\.)*)"')
+
+
+def _unescape(value):
+    return value.replace('\\n', '\n').replace('\\"', '"').replace('\\\\', '\\')
+
+
+def parse(text):
+    """Converte o texto do Prometheus em {(nome, ((rótulo, valor), ...)): número}."""
+    samples = {}
+    for line in text.splitlines():
+        if not line or line.startswith('#'):
+            continue
+        match = SAMPLE_RE.match(line)
+        if not match:
+            continue
+        name, labels, value = match.groups()
+        pairs = tuple((key, _unescape(val)) for key, val in LABEL_RE.findall(labels or ''))
+        try:
+            samples[(name, pairs)] = float(value)
+        except ValueError:
+            continue
+    return samples
+
+
+def scrape(base_url, timeout=5):
+    """Lê {base_url}/metrics; devolve None se o servidor não expõe métricas."""
+    try:
+        with urllib.request.urlopen(f"{base_url.rstrip('/')}/metrics", timeout=timeout) as response:
+            return {'time': time.time(), 'samples': parse(response.read().decode('utf-8'))}
+    except Exception:
+        return None
+
+
+def diff(before, after):
+    """Diferença entre duas leituras (gauges ficam com o valor da segunda)."""
+    delta = {}
+    for key, value in after['samples'].items():
+        name = key[0]
+        if _is_gauge(name):
+            delta[key] = value
+        else:
+            delta[key] = value - before['samples'].get(key, 0)
+    return {'elapsed': after['time'] - before['time'], 'samples': delta}
+
+
+def _is_gauge(name):
+    return (name.endswith('_bytes') or name.endswith('_entries') or name.endswith('_length')
+            or name in ('process_start_time_seconds', 'cluster_workers'))
+
+
+def _histograms(samples, name, group_by):
+    """Agrupa as séries de um histograma: chave -> {'buckets': [(le, n)], 'count', 'sum'}."""
+    groups = defaultdict(lambda: {'buckets': [], 'count': 0, 'sum': 0})
+    for (sample_name, pairs), value in samples.items():
+        labels = dict(pairs)
+        key = tuple(labels.get(label, '') for label in group_by)
+        if sample_name == f"{name}_bucket":
+            le = labels['le']
+            groups[key]['buckets'].append((math.inf if le == '+Inf' else float(le), value))
+        elif sample_name == f"{name}_count":
+            groups[key]['count'] += value
+        elif sample_name == f"{name}_sum":
+            groups[key]['sum'] += value
+
+    for group in groups.values():
+        # Somar buckets de mesmo limite (séries com rótulos agrupados juntos)
+        merged = defaultdict(float)
+        for le, value in group['buckets']:
+            merged[le] += value
+        group['buckets'] = sorted(merged.items())
+    return groups
+
+
+def bucket_percentile(buckets, count, p):
+    """Percentil por interpolação linear dentro do bucket (como histogram_quantile)."""
+    if count <= 0:
+        return 0
+    target = p / 100 * count
+    previous_le, previous_count = 0, 0
+    for le, cumulative in buckets:
+        if cumulative >= target:
+            if math.isinf(le):
+                return previous_le
+            in_bucket = cumulative - previous_count
+            fraction = (target - previous_count) / in_bucket if in_bucket > 0 else 1
+            return previous_le + (le - previous_le) * fraction
+        previous_le, previous_count = le, cumulative
+    return previous_le
+
+
+def _counter(samples, name, group_by):
+    totals = defaultdict(float)
+    for (sample_name, pairs), value in samples.items():
+        if sample_name == name:
+            labels = dict(pairs)
+            totals[tuple(labels.get(label, '') for label in group_by)] += value
+    return totals
+
+
+def summarize(delta):
+    """Resumo da visão do servidor entre duas leituras (serializável em JSON)."""
+    samples = delta['samples']
+    elapsed = delta['elapsed']
+
+    routes = []
+    for (method, route, status), group in _histograms(samples, 'http_request_duration_seconds',
+                                                      ('method', 'route', 'status')).items():
+        if group['count'] <= 0 or route == '/metrics':
+            continue
+        routes.append({
+            'method': method,
+            'route': route,
+            'status': status,
+            'count': int(group['count']),
+            'rps': group['count'] / elapsed if elapsed > 0 else 0,
+            'mean': group['sum'] / group['count'],
+            'p50': bucket_percentile(group['buckets'], group['count'], 50),
+            'p99': bucket_percentile(group['buckets'], group['count'], 99)
+        })
+    routes.sort(key=lambda route: -route['count'])
+
+    statements = []
+    errors = _counter(samples, 'db_query_errors_total', ('method', 'statement'))
+    for (method, statement), group in _histograms(samples, 'db_query_duration_seconds',
+                                                  ('method', 'statement')).items():
+        if group['count'] <= 0:
+            continue
+        statements.append({
+            'method': method,
+            'statement': statement,
+            'count': int(group['count']),
+            'total': group['sum'],
+            'mean': group['sum'] / group['count'],
+            'p99': bucket_percentile(group['buckets'], group['count'], 99),
+            'errors': int(errors.get((method, statement), 0))
+        })
+    statements.sort(key=lambda statement: -statement['total'])
+
+    cache = defaultdict(dict)
+    for (endpoint, result), value in _counter(samples, 'cache_requests_total', ('cache', 'result')).items():
+        if value > 0:
+            cache[endpoint][result] = int(value)
+
+    lag = _histograms(samples, 'nodejs_eventloop_lag_seconds', ()).get((), {'buckets': [], 'count': 0, 'sum': 0})
+    gc = _histograms(samples, 'nodejs_gc_duration_seconds', ('kind',))
+    cpu = sum(samples.get((name, ()), 0) for name in
+              ('process_cpu_user_seconds_total', 'process_cpu_system_seconds_total'))
+
+    return {
+        'elapsed': elapsed,
+        'routes': routes,
+        'statements': statements,
+        'cache': dict(cache),
+        'event_loop_lag': {
+            'samples': int(lag['count']),
+            'mean': lag['sum'] / lag['count'] if lag['count'] > 0 else 0,
+            'p99': bucket_percentile(lag['buckets'], lag['count'], 99)
+        },
+        'gc': {kind: {'count': int(group['count']), 'total': group['sum']}
+               for (kind,), group in gc.items() if group['count'] > 0},
+        'cpu_seconds': cpu,
+        'rss_bytes': samples.get(('process_resident_memory_bytes', ()), 0)
+    }
+
+
+def print_summary(summary, top=5):
+    print("\nVisão do servidor (/metrics, diferença entre antes e depois):")
+    if summary['routes']:
+        print(f"  {'Rota':<42} {'Status':>6} {'N':>8} {'RPS':>8} {'p50':>9} {'p99':>9}")
+        for route in summary['routes']:
+            name = f"{route['method']} {route['route']}"
+            print(f"  {name:<42} {route['status']:>6} {route['count']:>8} {route['rps']:>8.1f} "
+                  f"{route['p50']:>8.3f}s {route['p99']:>8.3f}s")
+    else:
+        print("  Nenhuma requisição registrada pelo servidor")
+
+    lag = summary['event_loop_lag']
+    gc_count = sum(kind['count'] for kind in summary['gc'].values())
+    gc_total = sum(kind['total'] for kind in summary['gc'].values())
+    cpu_share = summary['cpu_seconds'] / summary['elapsed'] * 100 if summary['elapsed'] > 0 else 0
+    print(f"  Event loop: atraso médio {lag['mean'] * 1000:.1f}ms, p99 {lag['p99'] * 1000:.1f}ms")
+    print(f"  GC: {gc_count} pausas, {gc_total * 1000:.1f}ms no total | "
+          f"CPU: {summary['cpu_seconds']:.2f}s ({cpu_share:.0f}% de um núcleo) | "
+          f"RSS: {summary['rss_bytes'] / 1024 / 1024:.0f}MB")
+
+    for endpoint, results in summary['cache'].items():
+        total = sum(results.values())
+        hits = total - results.get('miss', 0)
+        detail = ', '.join(f"{result}={count}" for result, count in sorted(results.items()))
+        print(f"  Cache {endpoint}: {hits / total * 100:.1f}% de acertos ({detail})")
+
+    if summary['statements']:
+        print(f"  Consultas SQL com maior tempo total (top {top}):")
+        for statement in summary['statements'][:top]:
+            errors = f", {statement['errors']} erros" if statement['errors'] else ''
+            print(f"    {statement['count']:>7}x {statement['total']:>7.3f}s (p99 {statement['p99'] * 1000:.1f}ms{errors}) "
+                  f"{statement['method']}: {statement['statement'][:70]}")
+
+
+def save_summary(summary, path):
+    with open(path, 'w') as f:
+        json.dump(summary, f, indent=2)
+
+
+if __name__ == "__main__":
+    url = sys.argv[1] if len(sys.argv) > 1 else "http://localhost:3000"
+    interval = float(sys.argv[2]) if len(sys.argv) > 2 else 10
+
+    first = scrape(url)
+    if first is None:
+        print(f"Não foi possível ler {url}/metrics")
+        sys.exit(1)
+    time.sleep(interval)
+    second = scrape(url)
+    if second is None:
+        print(f"Não foi possível ler {url}/metrics")
+        sys.exit(1)
+    print_summary(summarize(diff(first, second)))
@@ -0,0 +1,330 @@
+"""Motor de cenários declarativos para os testes de carga.
+
+Um arquivo de cenário (JSON, ou YAML se o PyYAML estiver instalado) descreve
+um conjunto de usuários virtuais, cada um com seu próprio login e sua própria
+coleção de tarefas, executando uma mistura ponderada de operações com tempo
+de reflexão (think time) entre elas. Assim o cache por usuário
+(cacheMiddleware) e a invalidação nas escritas (invalidateCacheMiddleware)
+são exercitados como no tráfego real, e a taxa de acertos é medida pelo
+cabeçalho X-Cache das respostas.
+
+Operações suportadas (ver routes/tasks.js):
+
+    login   POST   /api/auth/login
+    list    GET    /api/tasks            ("filters": valores sorteados por parâmetro)
+    detail  GET    /api/tasks/:id
+    create  POST   /api/tasks            ("body": modelo com {n} e {user})
+    update  PUT    /api/tasks/:id        ("body")
+    delete  DELETE /api/tasks/:id
+    stats   GET    /api/tasks/stats/summary
+
+Uso:
+
+    python scenario.py scenarios/producao.json
+"""
+import asyncio
+import json
+import random
+import sys
+import time
+from collections import Counter
+
+import aiohttp
+
+from stress_test import StressTestRunner
+
+try:
+    import yaml
+except ImportError:
+    yaml = None
+
+OPERATIONS = ('login', 'list', 'detail', 'create', 'update', 'delete', 'stats')
+
+# Tarefas conhecidas por usuário virtual (as mais antigas são descartadas)
+MAX_TASKS_PER_USER = 200
+
+
+def load_scenario(path):
+    with open(path, encoding='utf-8') as f:
+        if path.endswith(('.yml', '.yaml')):
+            if yaml is None:
+                raise RuntimeError("PyYAML não instalado: use um cenário em JSON ou instale pyyaml")
+            scenario = yaml.safe_load(f)
+        else:
+            scenario = json.load(f)
+
+    for operation in scenario.get('operations', []):
+        if operation.get('type') not in OPERATIONS:
+            raise ValueError(f"Operação inválida no cenário: {operation.get('type')}")
+
+    if not scenario.get('operations'):
+        raise ValueError("Cenário sem operações")
+
+    return scenario
+
+
+class VirtualUser:
+    def __init__(self, index, username, password):
+        self.index = index
+        self.username = username
+        self.password = password
+        self.token = None
+        self.task_ids = []
+        self.counter = 0
+
+    def remember_task(self, task_id):
+        self.task_ids.append(task_id)
+        if len(self.task_ids) > MAX_TASKS_PER_USER:
+            self.task_ids.pop(0)
+
+
+class ScenarioRunner(StressTestRunner):
+    def __init__(self, scenario, base_url=None, worker_index=0):
+        super().__init__(base_url or scenario.get('base_url', "http://localhost:3000"))
+        self.scenario = scenario
+        self.operations = scenario['operations']
+        self.weights = [operation.get('weight', 1) for operation in self.operations]
+        self.timeout = scenario.get('timeout', 5)
+        # Reprodutível por processo, mas cada processo com a sua sequência de operações
+        seed = scenario.get('seed')
+        self.rng = random.Random(seed + worker_index if seed is not None else None)
+        self.cache_stats = Counter()
+        self.skipped = Counter()
+        self.setup_failures = Counter()
+
+    def reset_results(self):
+        super().reset_results()
+        self.cache_stats = Counter()
+        self.skipped = Counter()
+        self.setup_failures = Counter()
+
+    def build_users(self):
+        users = self.scenario.get('users', {})
+        prefix = users.get('username_prefix', 'loaduser')
+        password = users.get('password', '123456')
+        return [VirtualUser(i, f"{prefix}{i}", password) for i in range(users.get('count', 10))]
+
+    def pick(self, value):
+        return self.rng.choice(value) if isinstance(value, list) else value
+
+    def render(self, template, user):
+        body = {}
+        for key, value in template.items():
+            value = self.pick(value)
+            if isinstance(value, str):
+                value = value.format(n=user.counter, user=user.username)
+            body[key] = value
+        return body
+
+    def think_time(self):
+        think = self.scenario.get('think_time', {})
+        return self.rng.uniform(think.get('min', 0), think.get('max', 0))
+
+    async def request(self, session, user, label, method, path, params=None, body=None, record=True):
+        headers = {'Authorization': f'Bearer {user.token}'} if user.token else {}
+
+        start_time = time.time()
+        try:
+            async with session.request(
+                method,
+                f"{self.base_url}{path}",
+                headers=headers,
+                params=params,
+                json=body,
+                timeout=aiohttp.ClientTimeout(total=self.timeout)
+            ) as response:
+                text = await response.text()
+                status = response.status
+                cache = response.headers.get('X-Cache')
+        except asyncio.TimeoutError:
+            if record:
+                self.results['total_requests'] += 1
+                self.results['timeouts'] += 1
+                self.results['errors']["Timeout"] += 1
+            return None, None
+        except aiohttp.ClientConnectorError:
+            if record:
+                self.results['total_requests'] += 1
+                self.results['connection_errors'] += 1
+                self.results['errors']["Connection Error"] += 1
+            return None, None
+        except Exception as e:
+            if record:
+                self.results['total_requests'] += 1
+                self.results['failed'] += 1
+                self.results['errors'][str(e)] += 1
+            return None, None
+
+        if record:
+            self.record_response(label, status, time.time() - start_time)
+            if cache:
+                self.cache_stats[(label, cache)] += 1
+
+        try:
+            data = json.loads(text) if text else None
+        except ValueError:
+            data = None
+        return status, data
+
+    async def op_login(self, session, user, operation, record=True):
+        user.token = None
+        status, data = await self.request(
+            session, user, 'login', 'POST', '/api/auth/login',
+            body={'identifier': user.username, 'password': user.password},
+            record=record
+        )
+        if status == 200:
+            user.token = data['data']['token']
+        return status
+
+    async def op_list(self, session, user, operation):
+        params = {}
+        for key, value in operation.get('filters', {}).items():
+            value = self.pick(value)
+            if value is None:
+                continue
+            params[key] = str(value).lower() if isinstance(value, bool) else str(value)
+        await self.request(session, user, 'list', 'GET', '/api/tasks', params=params)
+
+    async def op_detail(self, session, user, operation):
+        if not user.task_ids:
+            self.skipped['detail'] += 1
+            return
+        task_id = self.rng.choice(user.task_ids)
+        await self.request(session, user, 'detail', 'GET', f'/api/tasks/{task_id}')
+
+    async def op_create(self, session, user, operation):
+        user.counter += 1
+        template = operation.get('body', {'title': 'Tarefa de carga {n}', 'priority': 'medium'})
+        status, data = await self.request(
+            session, user, 'create', 'POST', '/api/tasks', body=self.render(template, user)
+        )
+        if status == 201:
+            user.remember_task(data['data']['id'])
+
+    async def op_update(self, session, user, operation):
+        if not user.task_ids:
+            self.skipped['update'] += 1
+            return
+        task_id = self.rng.choice(user.task_ids)
+        template = operation.get('body', {'completed': [True, False]})
+        await self.request(
+            session, user, 'update', 'PUT', f'/api/tasks/{task_id}', body=self.render(template, user)
+        )
+
+    async def op_delete(self, session, user, operation):
+        if not user.task_ids:
+            self.skipped['delete'] += 1
+            return
+        task_id = self.rng.choice(user.task_ids)
+        status, _ = await self.request(session, user, 'delete', 'DELETE', f'/api/tasks/{task_id}')
+        if status in (200, 404):
+            user.task_ids.remove(task_id)
+
+    async def op_stats(self, session, user, operation):
+        await self.request(session, user, 'stats', 'GET', '/api/tasks/stats/summary')
+
+    async def setup_user(self, session, user):
+        """Registra (se necessário), autentica e carrega as tarefas já existentes do usuário.
+
+        Retorna False se o login falhou: o usuário fica fora da execução em vez de
+        interromper todos os outros (ex: um 429 ou 5xx durante a preparação).
+        """
+        await self.request(
+            session, user, 'register', 'POST', '/api/auth/register',
+            body={
+                'email': f"{user.username}@example.com",
+                'username': user.username,
+                'password': user.password,
+                'firstName': 'Usuario',
+                'lastName': 'Carga'
+            },
+            record=False
+        )
+        status = await self.op_login(session, user, {}, record=False)
+        if status != 200:
+            self.setup_failures[status if status is not None else 'sem resposta'] += 1
+            return False
+
+        status, data = await self.request(
+            session, user, 'seed', 'GET', '/api/tasks', params={'limit': str(MAX_TASKS_PER_USER)}, record=False
+        )
+        if status == 200:
+            for task in data['data']:
+                user.remember_task(task['id'])
+        return True
+
+    async def user_loop(self, session, user, deadline):
+        # Desencontrar o início dos usuários virtuais
+        await asyncio.sleep(self.think_time())
+
+        while time.time() < deadline:
+            operation = self.rng.choices(self.operations, weights=self.weights)[0]
+            await getattr(self, f"op_{operation['type']}")(session, user, operation)
+            await asyncio.sleep(self.think_time())
+
+    async def run(self, users=None, start_at=None):
+        users = self.build_users() if users is None else users
+        duration = self.scenario.get('duration', 60)
+        connector = aiohttp.TCPConnector(limit=max(len(users), 1) * 2)
+
+        async with aiohttp.ClientSession(connector=connector) as session:
+            print(f"Preparando {len(users)} usuários virtuais...")
+            setup_limit = asyncio.Semaphore(10)
+
+            async def limited_setup(user):
+                async with setup_limit:
+                    return await self.setup_user(session, user)
+
+            ready = await asyncio.gather(*(limited_setup(user) for user in users))
+            dropped = len(users) - sum(ready)
+            users = [user for user, ok in zip(users, ready) if ok]
+            if dropped:
+                print(f"⚠️ {dropped} usuários virtuais sem login ficaram fora da execução")
+            if not users:
+                raise RuntimeError("Nenhum usuário virtual conseguiu fazer login")
+
+            if start_at is not None and start_at > time.time():
+                await asyncio.sleep(start_at - time.time())
+
+            print(f"Executando cenário '{self.scenario.get('name', 'sem nome')}' por {duration}s")
+            start_time = time.time()
+            await asyncio.gather(*(self.user_loop(session, user, start_time + duration) for user in users))
+            return time.time() - start_time
+
+    def print_scenario_results(self, duration=None):
+        self.print_results(f"Cenário {self.scenario.get('name', '')}".strip(), duration)
+
+        labels = sorted({label for label, _ in self.cache_stats})
+        if labels:
+            print("Cache por operação (cabeçalho X-Cache):")
+            for label in labels:
+                hits = self.cache_stats[(label, 'HIT')]
+                misses = self.cache_stats[(label, 'MISS')]
+                ratio = hits / (hits + misses) * 100 if hits + misses else 0
+                print(f"  {label:<10} HIT={hits:<7} MISS={misses:<7} taxa de acerto={ratio:.1f}%")
+
+        if self.setup_failures:
+            print("Usuários virtuais descartados na preparação (status do login):")
+            for status, count in self.setup_failures.most_common():
+                print(f"  {status}: {count}x")
+
+        if self.skipped:
+            print("Operações puladas (usuário sem tarefas):")
+            for label, count in self.skipped.most_common():
+                print(f"  {label}: {count}x")
+
+
+async def main(path):
+    scenario = load_scenario(path)
+    runner = ScenarioRunner(scenario)
+    runner.begin_server_metrics()
+    duration = await runner.run()
+    runner.print_scenario_results(duration)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print("Uso: python scenario.py <cenario.json|cenario.yaml>")
+        sys.exit(1)
+    asyncio.run(main(sys.argv[1]))
@@ -2,8 +2,21 @@ import asyncio
 import aiohttp
 import time
 import json
+import os
+from collections import Counter
 from datetime import datetime
 
+import metrics_scraper
+from latency_histogram import HistogramSet, LatencyHistogram
+
+# Diretório opcional para salvar os histogramas de cada teste (comparação entre builds)
+HISTOGRAM_DIR = os.environ.get('STRESS_HISTOGRAM_DIR')
+
+# Ler /metrics do servidor antes e depois de cada teste (STRESS_SCRAPE_METRICS=false desativa)
+SCRAPE_METRICS = os.environ.get('STRESS_SCRAPE_METRICS', 'true').lower() != 'false'
+
+REQUEST_TIMEOUT = 5  # segundos
+
 class StressTestRunner:
     def __init__(self, base_url="http://localhost:3000"):
         self.base_url = base_url
@@ -15,9 +28,16 @@ class StressTestRunner:
             'rate_limited': 0,
             'timeouts': 0,
             'connection_errors': 0,
-            'response_times': [],
-            'errors': []
+            'dropped': 0,
+            'latency': HistogramSet(),
+            'errors': Counter()
         }
+        self.metrics_before = None
+    
+    def begin_server_metrics(self):
+        """Leitura de /metrics que serve de base para a visão do servidor em print_results."""
+        self.metrics_before = metrics_scraper.scrape(self.base_url) if SCRAPE_METRICS else None
+        return self.metrics_before
     
     async def login(self, session):
         try:
@@ -35,18 +55,22 @@ class StressTestRunner:
             print(f"Login error: {e}")
             return False
     
-    async def make_request(self, session, endpoint, method="GET", data=None):
+    async def make_request(self, session, endpoint, method="GET", data=None, intended_start=None):
+        """Retorna (tempo de resposta, status); em timeouts e erros de conexão o
+        status é None e o tempo é o decorrido até a falha (no mínimo o timeout)."""
         headers = {}
         if self.token:
             headers['Authorization'] = f'Bearer {self.token}'
         
-        start_time = time.time()
+        # Em malha aberta a latência é contada a partir do horário agendado,
+        # incluindo o tempo que a requisição esperou na fila do cliente
+        start_time = intended_start if intended_start is not None else time.time()
         try:
             if method == "GET":
                 async with session.get(
                     f"{self.base_url}{endpoint}", 
                     headers=headers,
-                    timeout=aiohttp.ClientTimeout(total=5)
+                    timeout=aiohttp.ClientTimeout(total=REQUEST_TIMEOUT)
                 ) as response:
                     await response.text()
                     status = response.status
@@ -55,35 +79,41 @@ class StressTestRunner:
                     f"{self.base_url}{endpoint}", 
                     headers=headers, 
                     json=data,
-                    timeout=aiohttp.ClientTimeout(total=5)
+                    timeout=aiohttp.ClientTimeout(total=REQUEST_TIMEOUT)
                 ) as response:
                     await response.text()
                     status = response.status
             
             response_time = time.time() - start_time
-            self.results['response_times'].append(response_time)
-            self.results['total_requests'] += 1
-            
-            if status == 200 or status == 201:
-                self.results['successful'] += 1
-            elif status == 429:  # Rate limited
-                self.results['rate_limited'] += 1
-            else:
-                self.results['failed'] += 1
-                self.results['errors'].append(f"Status {status}")
+            self.record_response(endpoint, status, response_time)
+            return response_time, status
                 
         except asyncio.TimeoutError:
             self.results['total_requests'] += 1
             self.results['timeouts'] += 1
-            self.results['errors'].append("Timeout")
+            self.results['errors']["Timeout"] += 1
+            return max(time.time() - start_time, REQUEST_TIMEOUT), None
         except aiohttp.ClientConnectorError:
             self.results['total_requests'] += 1
             self.results['connection_errors'] += 1
-            self.results['errors'].append("Connection Error")
+            self.results['errors']["Connection Error"] += 1
         except Exception as e:
             self.results['total_requests'] += 1
             self.results['failed'] += 1
-            self.results['errors'].append(str(e))
+            self.results['errors'][str(e)] += 1
+        return time.time() - start_time, None
+    
+    def record_response(self, label, status, response_time):
+        self.results['latency'].record(label, status, response_time)
+        self.results['total_requests'] += 1
+        
+        if status == 200 or status == 201:
+            self.results['successful'] += 1
+        elif status == 429:  # Rate limited
+            self.results['rate_limited'] += 1
+        else:
+            self.results['failed'] += 1
+            self.results['errors'][f"Status {status}"] += 1
     
     async def stress_test_endpoint(self, endpoint, concurrent_requests=50, total_requests=500):
         connector = aiohttp.TCPConnector(limit=concurrent_requests, limit_per_host=concurrent_requests)
@@ -117,11 +147,139 @@ class StressTestRunner:
             # Fazer 100 requisições muito rapidamente
             tasks = [self.make_request(session, "/api/tasks") for _ in range(100)]
             await asyncio.gather(*tasks, return_exceptions=True)
-    
+
+    async def open_loop_test(self, endpoint, target_rps=200, ramp_steps=5, step_duration=10, max_in_flight=1000,
+                             start_at=None):
+        """Teste em malha aberta: taxa de chegada constante com rampa de RPS.
+
+        Cada requisição tem um horário de envio agendado e a latência é medida a
+        partir desse horário, evitando a omissão coordenada do teste com semáforo.
+        `endpoint` pode ser uma lista, percorrida em rodízio. `start_at` permite
+        sincronizar o início entre vários processos geradores de carga.
+        Retorna a curva vazão x latência, com um ponto por degrau da rampa.
+        """
+        endpoints = [endpoint] if isinstance(endpoint, str) else list(endpoint)
+        connector = aiohttp.TCPConnector(limit=max_in_flight, limit_per_host=max_in_flight)
+        curve = []
+
+        async with aiohttp.ClientSession(connector=connector) as session:
+            if self.token is None and any(e != "/health" for e in endpoints):
+                await self.login(session)
+
+            print(f"Iniciando teste em malha aberta: até {target_rps} RPS em {ramp_steps} degraus de {step_duration}s")
+
+            if start_at is not None and start_at > time.time():
+                await asyncio.sleep(start_at - time.time())
+
+            # Todas as chegadas seguem a mesma linha do tempo: o degrau seguinte começa
+            # no horário previsto, mesmo com respostas do anterior ainda pendentes
+            in_flight = set()
+            steps = []
+            test_start = time.time()
+
+            for step in range(1, ramp_steps + 1):
+                rate = target_rps * step / ramp_steps
+                interval = 1.0 / rate
+                scheduled = int(rate * step_duration)
+                step_start = test_start + (step - 1) * step_duration
+                record = {'step': step, 'rate': rate, 'start': step_start, 'finished': step_start,
+                          'tasks': [], 'dropped': 0}
+                steps.append(record)
+
+                for i in range(scheduled):
+                    intended_start = step_start + i * interval
+                    delay = intended_start - time.time()
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+
+                    # Cliente saturado: registrar em vez de atrasar o agendamento
+                    if len(in_flight) >= max_in_flight:
+                        self.results['dropped'] += 1
+                        record['dropped'] += 1
+                        continue
+
+                    task = asyncio.ensure_future(
+                        self.make_request(session, endpoints[i % len(endpoints)], intended_start=intended_start)
+                    )
+                    in_flight.add(task)
+                    task.add_done_callback(in_flight.discard)
+                    task.add_done_callback(lambda _, record=record: record.update(finished=time.time()))
+                    record['tasks'].append(task)
+
+            await asyncio.gather(*(task for record in steps for task in record['tasks']), return_exceptions=True)
+
+            # Cada resposta conta no degrau que agendou a requisição. Os percentis
+            # incluem as falhas (timeout conta como o tempo esperado): na saturação a
+            # cauda não pode sumir da curva
+            for record in steps:
+                step_histogram = LatencyHistogram()
+                answered = errors = rate_limited = 0
+                for task in record['tasks']:
+                    if task.cancelled() or task.exception() is not None:
+                        continue
+                    response_time, status = task.result()
+                    step_histogram.record(response_time)
+                    if status is not None:
+                        answered += 1
+                    if status == 429:
+                        rate_limited += 1
+                    elif status not in (200, 201):
+                        errors += 1
+
+                elapsed = record['finished'] - record['start']
+                curve.append(self.curve_point(
+                    record['step'], record['rate'], step_histogram,
+                    achieved_rps=answered / elapsed if elapsed > 0 else 0,
+                    errors=errors,
+                    rate_limited=rate_limited,
+                    dropped=record['dropped']
+                ))
+
+        return curve
+
+    @staticmethod
+    def curve_point(step, target_rps, histogram, achieved_rps, errors, rate_limited, dropped):
+        return {
+            'step': step,
+            'target_rps': target_rps,
+            'achieved_rps': achieved_rps,
+            'p50': histogram.percentile(50),
+            'p90': histogram.percentile(90),
+            'p99': histogram.percentile(99),
+            'max': histogram.max,
+            'errors': errors,
+            'rate_limited': rate_limited,
+            'dropped': dropped,
+            'histogram': histogram
+        }
+
+    def print_latency_curve(self, curve):
+        print(f"\n{'='*60}")
+        print("CURVA VAZÃO x LATÊNCIA (MALHA ABERTA)")
+        print(f"{'='*60}")
+        print(f"{'Degrau':>6} {'RPS alvo':>9} {'RPS real':>9} {'p50':>8} {'p90':>8} {'p99':>8} {'máx':>8} {'Erros':>6} {'429':>5} {'Desc.':>6}")
+        for point in curve:
+            print(f"{point['step']:>6} {point['target_rps']:>9.1f} {point['achieved_rps']:>9.1f} "
+                  f"{point['p50']:>7.3f}s {point['p90']:>7.3f}s {point['p99']:>7.3f}s {point['max']:>7.3f}s "
+                  f"{point['errors']:>6} {point['rate_limited']:>5} {point['dropped']:>6}")
+
+        # Saturação: vazão abaixo de 95% do alvo ou p99 10x maior que no primeiro degrau
+        baseline_p99 = curve[0]['p99'] if curve else 0
+        saturation = next(
+            (point for point in curve
+             if point['achieved_rps'] < 0.95 * point['target_rps']
+             or (baseline_p99 > 0 and point['p99'] > 10 * baseline_p99)),
+            None
+        )
+        if saturation:
+            print(f"⚠ Ponto de saturação estimado: ~{saturation['target_rps']:.1f} RPS (degrau {saturation['step']})")
+        else:
+            print("✓ Saturação não atingida dentro da rampa testada")
+
+        print(f"{'='*60}\n")
+
     def print_results(self, test_name, duration=None):
-        avg_response_time = sum(self.results['response_times']) / len(self.results['response_times']) if self.results['response_times'] else 0
-        max_response_time = max(self.results['response_times']) if self.results['response_times'] else 0
-        min_response_time = min(self.results['response_times']) if self.results['response_times'] else 0
+        latency = self.results['latency'].total()
         
         print(f"\n{'='*60}")
         print(f"RESULTADOS DO TESTE: {test_name}")
@@ -132,6 +290,8 @@ class StressTestRunner:
         print(f"Rate Limited (429): {self.results['rate_limited']}")
         print(f"Timeouts: {self.results['timeouts']}")
         print(f"Erros de conexão: {self.results['connection_errors']}")
+        if self.results['dropped'] > 0:
+            print(f"Descartadas pelo cliente (saturado): {self.results['dropped']}")
         
         # Cálculo de pacotes perdidos
         packets_lost = self.results['timeouts'] + self.results['connection_errors']
@@ -141,9 +301,15 @@ class StressTestRunner:
             print(f"Taxa de sucesso: {success_rate:.1f}%")
             print(f"Taxa de perda de pacotes: {loss_rate:.1f}%")
         
-        print(f"Tempo médio de resposta: {avg_response_time:.3f}s")
-        print(f"Tempo máximo de resposta: {max_response_time:.3f}s")
-        print(f"Tempo mínimo de resposta: {min_response_time:.3f}s")
+        print(f"Tempo médio de resposta: {latency.mean:.3f}s")
+        print(f"Tempo máximo de resposta: {latency.max:.3f}s")
+        print(f"Tempo mínimo de resposta: {latency.min:.3f}s")
+        print(f"Percentis: p50={latency.percentile(50):.3f}s p90={latency.percentile(90):.3f}s "
+              f"p99={latency.percentile(99):.3f}s p99.9={latency.percentile(99.9):.3f}s")
+        
+        if latency.count > 0:
+            print("\nLatência por endpoint e classe de status:")
+            self.results['latency'].print_table()
         
         if duration:
             rps = self.results['total_requests'] / duration if duration > 0 else 0
@@ -155,13 +321,35 @@ class StressTestRunner:
         else:
             print("⚠ VULNERABILIDADE: Sistema SEM proteção Rate Limiting!")
         
-        # Mostrar primeiros erros
+        # Mostrar erros mais frequentes
         if self.results['errors']:
-            print(f"\nPrimeiros 5 erros encontrados:")
-            for i, error in enumerate(self.results['errors'][:5]):
-                print(f"  {i+1}. {error}")
+            print(f"\n5 erros mais frequentes:")
+            for i, (error, count) in enumerate(self.results['errors'].most_common(5)):
+                print(f"  {i+1}. {error}: {count}x")
         
+        server = self.print_server_metrics()
         print(f"{'='*60}\n")
+        
+        if HISTOGRAM_DIR:
+            self.save_histograms(os.path.join(HISTOGRAM_DIR, f"{test_name}.json"))
+            if server:
+                metrics_scraper.save_summary(server, os.path.join(HISTOGRAM_DIR, f"{test_name}.server.json"))
+    
+    def print_server_metrics(self):
+        """Visão do servidor no mesmo intervalo do teste (None se /metrics não estiver disponível)."""
+        if self.metrics_before is None:
+            return None
+        after = metrics_scraper.scrape(self.base_url)
+        if after is None:
+            return None
+        summary = metrics_scraper.summarize(metrics_scraper.diff(self.metrics_before, after))
+        metrics_scraper.print_summary(summary)
+        return summary
+    
+    def save_histograms(self, path):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.results['latency'].dump(path)
+        print(f"Histogramas salvos em {path}")
     
     def reset_results(self):
         self.results = {
@@ -171,15 +359,18 @@ class StressTestRunner:
             'rate_limited': 0,
             'timeouts': 0,
             'connection_errors': 0,
-            'response_times': [],
-            'errors': []
+            'dropped': 0,
+            'latency': HistogramSet(),
+            'errors': Counter()
         }
+        self.begin_server_metrics()
 
 async def main():
     print("INICIANDO TESTES DE ESTRESSE DA API")
     print("="*60)
     
     test = StressTestRunner()
+    test.begin_server_metrics()
     
     # Teste 1: Health Check (sem autenticação)
     print("1. TESTE DE HEALTH CHECK")
@@ -217,6 +408,15 @@ async def main():
     print("5. TESTE DE CARGA EXTREMA")
     duration = await test.stress_test_endpoint("/api/tasks", concurrent_requests=100, total_requests=500)
     test.print_results("Carga Extrema", duration)
+    
+    # Reset para próximo teste
+    test.reset_results()
+    
+    # Teste 6: Malha aberta com rampa de RPS (curva de saturação)
+    print("6. TESTE EM MALHA ABERTA (TAXA DE CHEGADA CONSTANTE)")
+    curve = await test.open_loop_test("/api/tasks", target_rps=500, ramp_steps=5, step_duration=10)
+    test.print_latency_curve(curve)
+    test.print_results("Malha Aberta")
 
 if __name__ == "__main__":
     asyncio.run(main())
@@ -76,6 +76,38 @@ class GrpcClient {
         });
     }
 
+    /**
+     * Criar várias tarefas em uma única chamada (client streaming),
+     * respeitando o controle de fluxo do stream
+     */
+    async createTasks(tasks) {
+        const metadata = new grpc.Metadata();
+        metadata.set('authorization', `Bearer ${this.currentToken}`);
+
+        let call;
+        const response = new Promise((resolve, reject) => {
+            call = this.taskClient.CreateTasks(metadata, (error, result) => {
+                if (error) {
+                    reject(error);
+                } else {
+                    resolve(result);
+                }
+            });
+        });
+        // Erro do servidor antes do fim do envio: parar de esperar o drain
+        const failed = response.then(() => false, () => true);
+
+        for (const task of tasks) {
+            if (!call.write(task)) {
+                const stop = await Promise.race([new Promise(resolve => call.once('drain', () => resolve(false))), failed]);
+                if (stop) break;
+            }
+        }
+        call.end();
+
+        return await response;
+    }
+
     async getTasks(filters = {}) {
         const getTasksPromise = this.promisify(this.taskClient, 'GetTasks');
         return await getTasksPromise({
@@ -3,8 +3,9 @@ const path = require('path');
 
 class Database {
     constructor() {
-        this.dbPath = path.join(__dirname, 'tasks_grpc.db');
+        this.dbPath = process.env.DB_PATH || path.join(__dirname, 'tasks_grpc.db');
         this.db = null;
+        this.writeQueue = Promise.resolve();
     }
 
     async init() {
@@ -45,7 +46,13 @@ class Database {
     }
 
     // Métodos auxiliares para promisificar SQLite
+    // Escritas passam pela fila: nenhuma entra na transação de um lote em andamento
+    // (nem é desfeita pelo ROLLBACK dele)
     run(sql, params = []) {
+        return this.exclusive(() => this.execute(sql, params));
+    }
+
+    execute(sql, params = []) {
         return new Promise((resolve, reject) => {
             this.db.run(sql, params, function(err) {
                 if (err) reject(err);
@@ -54,6 +61,45 @@ class Database {
         });
     }
 
+    exclusive(work) {
+        const result = this.writeQueue.then(work);
+        this.writeQueue = result.catch(() => {});
+        return result;
+    }
+
+    /**
+     * Mesmo comando com vários conjuntos de parâmetros em uma única transação
+     * (statement preparado uma vez). Violação de restrição afeta só a própria linha.
+     * Se o BEGIN falhar, rejeita sem executar nenhuma linha.
+     * @returns {Promise<Array>} um resultado por linha: { id, changes } ou { error }
+     */
+    runBatch(sql, paramsList) {
+        return this.exclusive(async () => {
+            await this.execute('BEGIN IMMEDIATE');
+
+            try {
+                const results = await new Promise((resolve) => {
+                    const rows = new Array(paramsList.length);
+                    this.db.serialize(() => {
+                        const stmt = this.db.prepare(sql);
+                        paramsList.forEach((params, i) => {
+                            stmt.run(params, function(err) {
+                                rows[i] = err ? { error: err } : { id: this.lastID, changes: this.changes };
+                            });
+                        });
+                        stmt.finalize(() => resolve(rows));
+                    });
+                });
+
+                await this.execute('COMMIT');
+                return results;
+            } catch (error) {
+                await this.execute('ROLLBACK').catch(() => {});
+                throw error;
+            }
+        });
+    }
+
     get(sql, params = []) {
         return new Promise((resolve, reject) => {
             this.db.get(sql, params, (err, row) => {
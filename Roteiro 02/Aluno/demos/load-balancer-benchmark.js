@@ -0,0 +1,208 @@
+const grpc = require('@grpc/grpc-js');
+const ProtoLoader = require('../utils/protoLoader');
+const { BackendCluster } = require('../utils/backendCluster');
+const { GrpcLoadBalancer, LoadBalancingStrategies } = require('../utils/loadBalancer');
+
+/**
+ * Benchmark das estratégias de Load Balancing
+ *
+ * Sobe um cluster (backendCluster.js) com servidores rápidos e um servidor
+ * artificialmente lento, e envia requisições ValidateToken em malha aberta
+ * (taxa fixa, independente das respostas) usando o GrpcLoadBalancer do lado
+ * do cliente. Compara a latência (p50/p95/p99) de cada estratégia.
+ *
+ * Uso:
+ *   node demos/load-balancer-benchmark.js [--rate 200] [--duration 10] [--slow 150-400]
+ */
+
+const DEFAULTS = {
+    rate: 200,       // requisições por segundo
+    duration: 10,    // segundos por estratégia
+    warmup: 2,       // segundos descartados no início
+    fast: [5, 20],   // latência dos servidores rápidos (ms)
+    slow: [150, 400] // latência do servidor lento (ms)
+};
+
+const STRATEGIES = [
+    LoadBalancingStrategies.ROUND_ROBIN,
+    LoadBalancingStrategies.LEAST_CONNECTIONS,
+    LoadBalancingStrategies.P2C_PEAK_EWMA
+];
+
+function parseArgs(argv) {
+    const options = { ...DEFAULTS };
+    for (let i = 0; i < argv.length; i += 2) {
+        const value = argv[i + 1];
+        switch (argv[i]) {
+            case '--rate': options.rate = parseFloat(value); break;
+            case '--duration': options.duration = parseFloat(value); break;
+            case '--warmup': options.warmup = parseFloat(value); break;
+            case '--slow': options.slow = value.split('-').map(Number); break;
+            case '--fast': options.fast = value.split('-').map(Number); break;
+        }
+    }
+    return options;
+}
+
+function percentile(sorted, p) {
+    if (sorted.length === 0) return 0;
+    const index = Math.min(sorted.length - 1, Math.ceil((p / 100) * sorted.length) - 1);
+    return sorted[Math.max(index, 0)];
+}
+
+class LoadBalancerBenchmark {
+    constructor(options) {
+        this.options = options;
+        this.cluster = new BackendCluster();
+        this.authProto = new ProtoLoader().loadProto('auth_service.proto', 'auth');
+        this.backends = [
+            { id: 'fast-1', port: 50061, latency: options.fast },
+            { id: 'fast-2', port: 50062, latency: options.fast },
+            { id: 'fast-3', port: 50063, latency: options.fast },
+            { id: 'slow-1', port: 50064, latency: options.slow }
+        ];
+        this.clients = new Map(); // "host:port" -> AuthService client
+    }
+
+    async setup() {
+        this.backends.forEach(backend => {
+            this.cluster.addServer(backend.port, backend.id, {
+                simulateLatency: true,
+                minLatency: backend.latency[0],
+                maxLatency: backend.latency[1],
+                logRequests: false
+            });
+        });
+        await this.cluster.startAll();
+
+        this.backends.forEach(backend => {
+            this.clients.set(
+                `localhost:${backend.port}`,
+                new this.authProto.AuthService(`localhost:${backend.port}`, grpc.credentials.createInsecure())
+            );
+        });
+    }
+
+    call(client) {
+        return new Promise(resolve => {
+            client.ValidateToken({ token: '' }, error => resolve(!error));
+        });
+    }
+
+    async runStrategy(strategy) {
+        const { rate, duration, warmup } = this.options;
+        const loadBalancer = new GrpcLoadBalancer({ strategy, enableHealthChecks: false });
+        this.backends.forEach(backend => {
+            loadBalancer.addServer('localhost', backend.port, { maxConnections: 10000 });
+        });
+
+        const latencies = [];
+        const perServer = new Map();
+        let errors = 0;
+        const pending = new Set();
+
+        const start = Date.now();
+        const measureFrom = start + warmup * 1000;
+        const end = measureFrom + duration * 1000;
+        const interval = 10; // ms
+        let sent = 0;
+
+        await new Promise(resolve => {
+            const timer = setInterval(() => {
+                const now = Date.now();
+                if (now >= end) {
+                    clearInterval(timer);
+                    return resolve();
+                }
+
+                // Malha aberta: quantas requisições já deveriam ter sido enviadas até agora
+                const due = Math.floor(((now - start) / 1000) * rate);
+                for (; sent < due; sent++) {
+                    const server = loadBalancer.selectServer();
+                    const client = this.clients.get(server.id);
+                    const requestStart = process.hrtime.bigint();
+
+                    const request = this.call(client).then(ok => {
+                        const elapsed = Number(process.hrtime.bigint() - requestStart) / 1e6;
+                        loadBalancer.onRequestCompleted(server.id, ok, elapsed);
+
+                        if (Date.now() >= measureFrom) {
+                            latencies.push(elapsed);
+                            perServer.set(server.id, (perServer.get(server.id) || 0) + 1);
+                            if (!ok) errors++;
+                        }
+                        pending.delete(request);
+                    });
+                    pending.add(request);
+                }
+            }, interval);
+        });
+
+        await Promise.all(pending);
+        loadBalancer.destroy();
+
+        latencies.sort((a, b) => a - b);
+        const slowPort = this.backends.find(backend => backend.id === 'slow-1').port;
+        return {
+            strategy,
+            requests: latencies.length,
+            errors,
+            p50: percentile(latencies, 50),
+            p95: percentile(latencies, 95),
+            p99: percentile(latencies, 99),
+            max: latencies[latencies.length - 1] || 0,
+            slowShare: latencies.length > 0 ? (perServer.get(`localhost:${slowPort}`) || 0) / latencies.length : 0
+        };
+    }
+
+    printResults(results) {
+        console.log('\n📊 ===== BENCHMARK DE LOAD BALANCING =====');
+        console.log(`   Taxa: ${this.options.rate} req/s | Duração: ${this.options.duration}s por estratégia`);
+        console.log(`   Servidores: 3 rápidos (${this.options.fast.join('-')}ms) + 1 lento (${this.options.slow.join('-')}ms)\n`);
+        console.log('   Estratégia            Req     Erros   p50(ms)   p95(ms)   p99(ms)   max(ms)   % no lento');
+
+        results.forEach(r => {
+            console.log(
+                `   ${r.strategy.padEnd(20)}  ${String(r.requests).padEnd(6)}  ${String(r.errors).padEnd(6)}` +
+                `  ${r.p50.toFixed(1).padStart(7)}   ${r.p95.toFixed(1).padStart(7)}   ${r.p99.toFixed(1).padStart(7)}` +
+                `   ${r.max.toFixed(1).padStart(7)}   ${(r.slowShare * 100).toFixed(1).padStart(6)}%`
+            );
+        });
+
+        const baseline = results.find(r => r.strategy === LoadBalancingStrategies.LEAST_CONNECTIONS);
+        const p2c = results.find(r => r.strategy === LoadBalancingStrategies.P2C_PEAK_EWMA);
+        if (baseline && p2c && baseline.p99 > 0) {
+            const improvement = (1 - p2c.p99 / baseline.p99) * 100;
+            console.log(`\n   p99 P2C + Peak EWMA vs Least Connections: ${improvement.toFixed(1)}% menor`);
+        }
+        console.log('==========================================\n');
+    }
+
+    async run() {
+        await this.setup();
+        const results = [];
+        try {
+            for (const strategy of STRATEGIES) {
+                console.log(`\n🏁 Executando estratégia ${strategy}...`);
+                results.push(await this.runStrategy(strategy));
+            }
+        } finally {
+            this.clients.forEach(client => client.close());
+            await this.cluster.stopAll();
+        }
+        this.printResults(results);
+        return results;
+    }
+}
+
+if (require.main === module) {
+    new LoadBalancerBenchmark(parseArgs(process.argv.slice(2)))
+        .run()
+        .then(() => process.exit(0))
+        .catch(error => {
+            console.error('❌ Erro no benchmark:', error);
+            process.exit(1);
+        });
+}
+
+module.exports = LoadBalancerBenchmark;
@@ -0,0 +1,194 @@
+const grpc = require('@grpc/grpc-js');
+const ProtoLoader = require('./utils/protoLoader');
+const database = require('./database/database');
+const AuthService = require('./services/AuthService');
+const TaskService = require('./services/TaskService');
+const ChatService = require('./services/ChatService');
+const { GrpcAuthMiddleware } = require('./middleware/grpcAuth');
+const { GrpcErrorHandler } = require('./utils/errorHandler');
+
+/**
+ * Servidor gRPC Principal
+ *
+ * Registra os serviços de autenticação, tarefas e chat em um único servidor:
+ * - AuthService: Register/Login/ValidateToken sem autenticação
+ * - TaskService: JWT validado antes do handler (metadado "authorization"
+ *   ou campo token da requisição), com o usuário disponível em call.user
+ * - ChatService: autenticação feita pelo próprio serviço nas mensagens
+ *
+ * Uso: PORT=50051 node server.js
+ */
+class GrpcServer {
+    constructor(options = {}) {
+        this.port = options.port || process.env.PORT || 50051;
+        this.server = null;
+        this.protoLoader = new ProtoLoader();
+        this.authMiddleware = new GrpcAuthMiddleware();
+        this.errorHandler = new GrpcErrorHandler({
+            enableLogging: process.env.GRPC_ERROR_LOGGING !== 'false'
+        });
+
+        this.authService = new AuthService();
+        this.taskService = new TaskService();
+        this.chatService = new ChatService();
+    }
+
+    async initialize() {
+        await database.init();
+
+        const authProto = this.protoLoader.loadProto('auth_service.proto', 'auth');
+        const taskProto = this.protoLoader.loadProto('task_service.proto', 'tasks');
+        const chatProto = this.protoLoader.loadProto('chat_service.proto', 'chat');
+
+        this.server = new grpc.Server();
+
+        this.server.addService(authProto.AuthService.service, {
+            Register: this.unary('AuthService', this.authService, 'register'),
+            Login: this.unary('AuthService', this.authService, 'login'),
+            ValidateToken: this.unary('AuthService', this.authService, 'validateToken')
+        });
+
+        this.server.addService(taskProto.TaskService.service, {
+            CreateTask: this.unary('TaskService', this.taskService, 'createTask', true),
+            GetTasks: this.unary('TaskService', this.taskService, 'getTasks', true),
+            GetTask: this.unary('TaskService', this.taskService, 'getTask', true),
+            UpdateTask: this.unary('TaskService', this.taskService, 'updateTask', true),
+            DeleteTask: this.unary('TaskService', this.taskService, 'deleteTask', true),
+            GetTaskStats: this.unary('TaskService', this.taskService, 'getTaskStats', true),
+            CreateTasks: this.unary('TaskService', this.taskService, 'createTasks', true),
+            StreamTasks: this.streaming('TaskService', this.taskService, 'streamTasks', true),
+            StreamNotifications: this.streaming('TaskService', this.taskService, 'streamNotifications', true)
+        });
+
+        this.server.addService(chatProto.ChatService.service, {
+            StreamChat: this.streaming('ChatService', this.chatService, 'streamChat'),
+            JoinRoom: this.unary('ChatService', this.chatService, 'joinRoom'),
+            LeaveRoom: this.unary('ChatService', this.chatService, 'leaveRoom'),
+            GetChatHistory: this.unary('ChatService', this.chatService, 'getChatHistory'),
+            GetActiveUsers: this.unary('ChatService', this.chatService, 'getActiveUsers')
+        });
+
+        return this.server;
+    }
+
+    /**
+     * Validar o JWT da chamada e anexar o usuário (call.user)
+     * @returns {Object|null} erro gRPC ou null
+     */
+    authenticate(call) {
+        const validation = this.authMiddleware.validateToken(this.authMiddleware.extractToken(call));
+        if (!validation.valid) {
+            return {
+                code: grpc.status.UNAUTHENTICATED,
+                message: `Falha na autenticação: ${validation.error}`
+            };
+        }
+
+        call.user = validation.user;
+        return null;
+    }
+
+    /**
+     * Handler unário (ou client streaming, que também responde por callback):
+     * erros síncronos ou lançados por métodos async (ErrorFactory) são
+     * convertidos em status gRPC
+     */
+    unary(serviceName, service, methodName, requireAuth = false) {
+        const method = service[methodName];
+
+        return (call, callback) => {
+            const handleError = error => this.errorHandler.handleError(error, callback, {
+                service: serviceName,
+                method: methodName,
+                userId: call.user?.id
+            });
+
+            if (requireAuth) {
+                const authError = this.authenticate(call);
+                if (authError) return callback(authError);
+            }
+
+            try {
+                const result = method.call(service, call, callback);
+                if (result && typeof result.catch === 'function') {
+                    result.catch(handleError);
+                }
+            } catch (error) {
+                handleError(error);
+            }
+        };
+    }
+
+    streaming(serviceName, service, methodName, requireAuth = false) {
+        const method = service[methodName];
+
+        return (call) => {
+            if (requireAuth) {
+                const authError = this.authenticate(call);
+                if (authError) {
+                    call.emit('error', authError);
+                    return;
+                }
+            }
+
+            const result = method.call(service, call);
+            if (result && typeof result.catch === 'function') {
+                result.catch(error => this.errorHandler.handleStreamError(error, call, {
+                    service: serviceName,
+                    method: methodName,
+                    userId: call.user?.id
+                }));
+            }
+        };
+    }
+
+    async start() {
+        if (!this.server) {
+            await this.initialize();
+        }
+
+        const boundPort = await new Promise((resolve, reject) => {
+            this.server.bindAsync(`0.0.0.0:${this.port}`, grpc.ServerCredentials.createInsecure(), (error, port) => {
+                if (error) reject(error);
+                else resolve(port);
+            });
+        });
+
+        console.log(`🚀 Servidor gRPC executando na porta ${boundPort}`);
+        console.log('📋 Serviços: AuthService, TaskService, ChatService');
+        return boundPort;
+    }
+
+    stop() {
+        return new Promise(resolve => {
+            if (!this.server) return resolve();
+            this.server.tryShutdown(() => {
+                console.log('🛑 Servidor gRPC encerrado');
+                resolve();
+            });
+        });
+    }
+}
+
+if (require.main === module) {
+    const server = new GrpcServer();
+
+    server.start().catch(error => {
+        console.error('❌ Falha ao iniciar servidor gRPC:', error);
+        process.exit(1);
+    });
+
+    const shutdown = () => {
+        server.stop().then(() => process.exit(0));
+        // Streams abertos (StreamNotifications, chat) impedem o tryShutdown de concluir
+        setTimeout(() => {
+            server.server.forceShutdown();
+            process.exit(0);
+        }, 5000).unref();
+    };
+
+    process.on('SIGINT', shutdown);
+    process.on('SIGTERM', shutdown);
+}
+
+module.exports = GrpcServer;
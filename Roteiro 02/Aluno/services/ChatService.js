@@ -1,6 +1,10 @@
 const grpc = require('@grpc/grpc-js');
 const { v4: uuidv4 } = require('uuid');
 const jwt = require('jsonwebtoken');
+const ProtoLoader = require('../utils/protoLoader');
+const { StreamHub } = require('../utils/streamHub');
+
+const streamMethods = new ProtoLoader().loadProto('chat_service.proto', 'chat').ChatService.service;
 
 /**
  * Serviço de Chat com Streaming Bidirecional
@@ -15,7 +19,13 @@ const jwt = require('jsonwebtoken');
 class ChatService {
     constructor() {
         // Armazenar conexões ativas por sala
-        this.rooms = new Map(); // roomId -> Set de streams
+        // roomId -> streams (fila limitada por cliente; cliente lento é desconectado
+        // e pode recuperar as mensagens com GetChatHistory)
+        this.rooms = new StreamHub({
+            name: 'chat',
+            serialize: streamMethods.StreamChat.responseSerialize,
+            overflow: process.env.STREAM_OVERFLOW_POLICY || 'disconnect'
+        });
         this.userSessions = new Map(); // userId -> { stream, roomId, username, lastSeen }
         this.chatHistory = new Map(); // roomId -> Array de mensagens
         this.activeUsers = new Map(); // roomId -> Map(userId -> userData)
@@ -236,10 +246,7 @@ class ChatService {
         });
 
         // Adicionar stream à sala
-        if (!this.rooms.has(roomId)) {
-            this.rooms.set(roomId, new Set());
-        }
-        this.rooms.get(roomId).add(stream);
+        this.rooms.subscribe(roomId, stream);
 
         // Registrar usuário ativo na sala
         if (!this.activeUsers.has(roomId)) {
@@ -262,12 +269,7 @@ class ChatService {
         const session = this.userSessions.get(userId);
         if (session) {
             // Remover stream da sala
-            if (this.rooms.has(roomId)) {
-                this.rooms.get(roomId).delete(session.stream);
-                if (this.rooms.get(roomId).size === 0) {
-                    this.rooms.delete(roomId);
-                }
-            }
+            this.rooms.unsubscribe(roomId, session.stream);
 
             // Remover usuário ativo
             if (this.activeUsers.has(roomId)) {
@@ -285,28 +287,22 @@ class ChatService {
 
     /**
      * Broadcast mensagem para todos os usuários de uma sala
+     * (serializada uma vez; clientes lentos recebem pela fila do StreamHub)
      */
     broadcastToRoom(roomId, message, excludeStream = null) {
-        const roomStreams = this.rooms.get(roomId);
-        if (!roomStreams) return;
-
-        let successCount = 0;
-        let errorCount = 0;
+        if (!this.rooms.hasSubscribers(roomId)) return;
 
-        roomStreams.forEach(stream => {
-            if (stream === excludeStream) return; // Não enviar para o remetente
+        const result = this.rooms.publish(roomId, message, { exclude: excludeStream });
 
-            try {
-                stream.write(message);
-                successCount++;
-            } catch (error) {
-                console.error('❌ Erro ao enviar mensagem para stream:', error);
-                roomStreams.delete(stream); // Remove stream inválido
-                errorCount++;
-            }
-        });
+        console.log(`📤 Mensagem broadcast para sala ${roomId}: ${result.delivered} enviadas, ` +
+            `${result.queued} em fila, ${result.dropped} descartadas, ${result.disconnected} desconectados`);
+    }
 
-        console.log(`📤 Mensagem broadcast para sala ${roomId}: ${successCount} sucessos, ${errorCount} erros`);
+    /**
+     * Métricas dos streams de chat
+     */
+    getStreamStats() {
+        return this.rooms.getStats();
     }
 
     /**
@@ -5,10 +5,35 @@ const Task = require('../models/Task');
 const database = require('../database/database');
 const ProtoLoader = require('../utils/protoLoader');
 const { ErrorFactory } = require('../utils/errorHandler');
+const { StreamHub } = require('../utils/streamHub');
+
+const streamMethods = new ProtoLoader().loadProto('task_service.proto', 'tasks').TaskService.service;
+
+const notificationTypeMap = {
+    'TASK_CREATED': 0,
+    'TASK_UPDATED': 1,
+    'TASK_DELETED': 2,
+    'TASK_COMPLETED': 3
+};
+
+// Intervalo entre as tarefas existentes enviadas pelo StreamTasks (0 desativa)
+const STREAM_REPLAY_DELAY = process.env.STREAM_REPLAY_DELAY !== undefined ? parseInt(process.env.STREAM_REPLAY_DELAY) : 100;
+
+// CreateTasks: tarefas por transação e limite de mensagens por chamada
+const CREATE_TASKS_BATCH = parseInt(process.env.CREATE_TASKS_BATCH) || 500;
+const CREATE_TASKS_MAX = parseInt(process.env.CREATE_TASKS_MAX) || 50000;
 
 class TaskService {
     constructor() {
-        this.streamingSessions = new Map(); // Para gerenciar streams ativos
+        // Streams ativos indexados por userId
+        this.taskStreams = new StreamHub({
+            name: 'tasks',
+            serialize: streamMethods.StreamTasks.responseSerialize
+        });
+        this.notificationStreams = new StreamHub({
+            name: 'notifications',
+            serialize: streamMethods.StreamNotifications.responseSerialize
+        });
     }
 
     /**
@@ -83,6 +108,101 @@ class TaskService {
         }
     }
 
+    /**
+     * Criar tarefas em lote (client streaming)
+     *
+     * Cada mensagem é validada ao chegar; as válidas são gravadas em transações
+     * de até CREATE_TASKS_BATCH tarefas, com o stream pausado durante a gravação.
+     * A resposta traz um resultado por mensagem, na ordem de envio.
+     */
+    async createTasks(call, callback) {
+        const user = call.user;
+        const results = [];
+        let pending = [];
+        let writing = Promise.resolve();
+        let received = 0;
+
+        const flush = () => {
+            const batch = pending;
+            pending = [];
+            if (batch.length === 0) {
+                return writing;
+            }
+
+            call.pause();
+            writing = writing
+                .then(() => database.runBatch(
+                    'INSERT INTO tasks (id, title, description, priority, userId) VALUES (?, ?, ?, ?, ?)',
+                    batch.map(({ task }) => [task.id, task.title, task.description, task.priority, task.userId])
+                ))
+                .then(rows => rows.forEach((row, i) => {
+                    const { index, task } = batch[i];
+                    if (row.error) {
+                        results[index] = { index, success: false, errors: [row.error.message] };
+                    } else {
+                        results[index] = { index, success: true, task_id: task.id };
+                        this.notifyStreams('TASK_CREATED', task);
+                    }
+                }))
+                .finally(() => call.resume());
+            return writing;
+        };
+
+        try {
+            await new Promise((resolve, reject) => {
+                call.on('data', ({ title, description, priority }) => {
+                    const index = received++;
+                    if (received > CREATE_TASKS_MAX) {
+                        reject(ErrorFactory.validation(`Máximo de ${CREATE_TASKS_MAX} tarefas por chamada`, {
+                            field: 'stream',
+                            received
+                        }));
+                        return;
+                    }
+
+                    const task = new Task({
+                        id: uuidv4(),
+                        title: title?.trim(),
+                        description: description || '',
+                        priority: ProtoLoader.convertFromPriority(priority),
+                        userId: user.id,
+                        completed: false
+                    });
+                    const validation = task.validate();
+
+                    if (!validation.isValid) {
+                        results[index] = { index, success: false, errors: validation.errors };
+                        return;
+                    }
+
+                    pending.push({ index, task });
+                    if (pending.length >= CREATE_TASKS_BATCH) {
+                        flush().catch(reject);
+                    }
+                });
+                call.on('end', resolve);
+                call.on('error', reject);
+            });
+
+            await flush();
+        } catch (error) {
+            console.error('Erro ao criar tarefas em lote:', error);
+            if (error.type) {
+                throw error;
+            }
+            throw ErrorFactory.database(error, 'CREATE_TASKS');
+        }
+
+        const created = results.filter(result => result.success).length;
+        callback(null, {
+            success: created > 0,
+            message: `${created} de ${results.length} tarefas criadas`,
+            created,
+            failed: results.length - created,
+            results
+        });
+    }
+
     /**
      * Listar tarefas com paginação
      */
@@ -351,19 +471,21 @@ class TaskService {
                 call.write(task.toProtobuf());
                 
                 // Simular delay para demonstrar streaming
-                await new Promise(resolve => setTimeout(resolve, 100));
+                if (STREAM_REPLAY_DELAY > 0) {
+                    await new Promise(resolve => setTimeout(resolve, STREAM_REPLAY_DELAY));
+                }
+            }
+
+            // Cliente desistiu durante o envio inicial
+            if (call.cancelled) {
+                return;
             }
 
             // Manter stream aberto para futuras atualizações
             const sessionId = uuidv4();
-            this.streamingSessions.set(sessionId, {
-                call,
-                userId: user.id,
-                filter: { completed }
-            });
+            this.taskStreams.subscribe(user.id, call, { completed });
 
             call.on('cancelled', () => {
-                this.streamingSessions.delete(sessionId);
                 console.log(`Stream cancelado: ${sessionId}`);
             });
 
@@ -383,12 +505,8 @@ class TaskService {
             const user = call.user;
 
             const sessionId = uuidv4();
-            
-            this.streamingSessions.set(sessionId, {
-                call,
-                userId: user.id,
-                type: 'notifications'
-            });
+
+            this.notificationStreams.subscribe(user.id, call);
 
             // Enviar mensagem inicial
             call.write({
@@ -399,13 +517,11 @@ class TaskService {
             });
 
             call.on('cancelled', () => {
-                this.streamingSessions.delete(sessionId);
                 console.log(`Stream de notificações cancelado: ${sessionId}`);
             });
 
             call.on('error', (error) => {
                 console.error('Erro no stream de notificações:', error);
-                this.streamingSessions.delete(sessionId);
             });
 
         } catch (error) {
@@ -415,43 +531,35 @@ class TaskService {
     }
 
     /**
-     * Notificar todos os streams ativos sobre mudanças
+     * Notificar os streams do dono da tarefa sobre mudanças
      */
     notifyStreams(action, task) {
-        const notificationTypeMap = {
-            'TASK_CREATED': 0,
-            'TASK_UPDATED': 1,
-            'TASK_DELETED': 2,
-            'TASK_COMPLETED': 3
-        };
+        if (this.notificationStreams.hasSubscribers(task.userId)) {
+            this.notificationStreams.publish(task.userId, {
+                type: notificationTypeMap[action],
+                task: task.toProtobuf(),
+                message: `Tarefa ${action.toLowerCase().replace('_', ' ')}`,
+                timestamp: Math.floor(Date.now() / 1000)
+            });
+        }
 
-        for (const [sessionId, session] of this.streamingSessions.entries()) {
-            try {
-                if (session.userId === task.userId) {
-                    if (session.type === 'notifications') {
-                        // Stream de notificações
-                        session.call.write({
-                            type: notificationTypeMap[action],
-                            task: task.toProtobuf(),
-                            message: `Tarefa ${action.toLowerCase().replace('_', ' ')}`,
-                            timestamp: Math.floor(Date.now() / 1000)
-                        });
-                    } else if (session.filter) {
-                        // Stream de tarefas com filtro
-                        const { completed } = session.filter;
-                        if (completed === undefined || completed === task.completed) {
-                            if (action !== 'TASK_DELETED') {
-                                session.call.write(task.toProtobuf());
-                            }
-                        }
-                    }
-                }
-            } catch (error) {
-                console.error(`Erro ao notificar stream ${sessionId}:`, error);
-                this.streamingSessions.delete(sessionId);
-            }
+        // Stream de tarefas com filtro
+        if (action !== 'TASK_DELETED' && this.taskStreams.hasSubscribers(task.userId)) {
+            this.taskStreams.publish(task.userId, task.toProtobuf(), {
+                filter: ({ data }) => data.completed === undefined || data.completed === task.completed
+            });
         }
     }
+
+    /**
+     * Métricas dos streams ativos
+     */
+    getStreamStats() {
+        return {
+            tasks: this.taskStreams.getStats(),
+            notifications: this.notificationStreams.getStats()
+        };
+    }
 }
 
 module.exports = TaskService;
\ No newline at end of file
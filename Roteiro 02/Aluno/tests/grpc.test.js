@@ -190,6 +190,24 @@ describe('gRPC Services Tests', () => {
             }
         });
 
+        test('deve criar tarefas em lote via client streaming', async () => {
+            const response = await client.createTasks([
+                { title: 'Lote 1', priority: 0 },
+                { title: '', priority: 1 },
+                { title: 'Lote 3', description: 'Terceira', priority: 2 }
+            ]);
+
+            expect(response.success).toBe(true);
+            expect(response.created).toBe(2);
+            expect(response.failed).toBe(1);
+            expect(response.results.map(result => result.index)).toEqual([0, 1, 2]);
+            expect(response.results[1].success).toBe(false);
+            expect(response.results[1].errors).toContain('Título é obrigatório');
+
+            const created = await client.getTask(response.results[2].task_id);
+            expect(created.task.title).toBe('Lote 3');
+        });
+
         test('deve listar tarefas com paginação', async () => {
             const response = await client.getTasks({
                 page: 1,
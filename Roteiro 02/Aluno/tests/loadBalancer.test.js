@@ -0,0 +1,86 @@
+const { GrpcLoadBalancer, BackendServer, LoadBalancingStrategies } = require('../utils/loadBalancer');
+
+/**
+ * Testes das estatísticas de latência e da estratégia P2C + Peak EWMA
+ */
+describe('Load Balancer - latência e P2C', () => {
+    test('Deve manter a média das últimas N medições em buffer circular', () => {
+        const server = new BackendServer('localhost', 1, { responseTimeHistory: 3 });
+        [10, 20, 30, 40].forEach(time => server.recordRequest(true, time));
+
+        expect(server.getAverageResponseTime()).toBe(30); // (20 + 30 + 40) / 3
+        expect(server.responseTimeCount).toBe(3);
+    });
+
+    test('Peak EWMA deve subir com picos e decair com o tempo', () => {
+        const server = new BackendServer('localhost', 1, { decayTime: 1000 });
+        const now = Date.now();
+
+        server.observeLatency(10, now);
+        server.observeLatency(500, now);
+        expect(server.getPeakEwma(now)).toBe(500);
+
+        expect(server.getPeakEwma(now + 1000)).toBeCloseTo(500 * Math.exp(-1), 5);
+    });
+
+    test('Peak EWMA deve decair uma única vez ao receber medição menor', () => {
+        const server = new BackendServer('localhost', 1, { decayTime: 1000 });
+        const now = Date.now();
+
+        server.observeLatency(500, now);
+        server.observeLatency(10, now + 1000);
+
+        const weight = Math.exp(-1);
+        expect(server.getPeakEwma(now + 1000)).toBeCloseTo(500 * weight + 10 * (1 - weight), 5);
+    });
+
+    test('Servidor sem medições e com pendentes deve ter custo alto', () => {
+        const server = new BackendServer('localhost', 1);
+        expect(server.getLoadCost()).toBe(0);
+
+        server.addConnection();
+        expect(server.getLoadCost()).toBeGreaterThan(1000);
+    });
+
+    test('P2C deve evitar o servidor lento', () => {
+        const loadBalancer = new GrpcLoadBalancer({
+            strategy: LoadBalancingStrategies.P2C_PEAK_EWMA,
+            enableHealthChecks: false
+        });
+        const ids = [1, 2, 3, 4].map(port => loadBalancer.addServer('localhost', port));
+        const slowId = ids[3];
+
+        const counts = new Map();
+        for (let i = 0; i < 1000; i++) {
+            const server = loadBalancer.selectServer();
+            counts.set(server.id, (counts.get(server.id) || 0) + 1);
+            loadBalancer.onRequestCompleted(server.id, true, server.id === slowId ? 300 : 10);
+        }
+
+        expect(counts.get(slowId) || 0).toBeLessThan(50);
+        loadBalancer.destroy();
+    });
+
+    test('P2C deve evitar o servidor que falha rápido', () => {
+        const loadBalancer = new GrpcLoadBalancer({
+            strategy: LoadBalancingStrategies.P2C_PEAK_EWMA,
+            enableHealthChecks: false
+        });
+        const ids = [1, 2, 3, 4].map(port => loadBalancer.addServer('localhost', port));
+        const failingId = ids[3];
+
+        const counts = new Map();
+        for (let i = 0; i < 1000; i++) {
+            const server = loadBalancer.selectServer();
+            counts.set(server.id, (counts.get(server.id) || 0) + 1);
+            if (server.id === failingId) {
+                loadBalancer.onRequestCompleted(server.id, false, 1);
+            } else {
+                loadBalancer.onRequestCompleted(server.id, true, 10);
+            }
+        }
+
+        expect(counts.get(failingId) || 0).toBeLessThan(50);
+        loadBalancer.destroy();
+    });
+});
@@ -0,0 +1,123 @@
+const { EventEmitter } = require('events');
+const grpc = require('@grpc/grpc-js');
+const { StreamHub } = require('../utils/streamHub');
+
+/**
+ * Stream falso: write() retorna false quando o buffer atinge o limite,
+ * como um Writable em objectMode
+ */
+class FakeStream extends EventEmitter {
+    constructor(highWaterMark = 2) {
+        super();
+        this.highWaterMark = highWaterMark;
+        this.buffered = [];
+        this.written = [];
+        this.destroyedWith = null;
+    }
+
+    write(payload) {
+        this.buffered.push(payload);
+        return this.buffered.length < this.highWaterMark;
+    }
+
+    // Simula o envio do buffer para o cliente
+    drain() {
+        this.written.push(...this.buffered);
+        this.buffered = [];
+        this.emit('drain');
+    }
+
+    destroy(error) {
+        this.destroyedWith = error;
+        this.emit('close');
+    }
+}
+
+describe('StreamHub - fan-out com backpressure', () => {
+    test('Deve entregar apenas para os assinantes da chave', () => {
+        const hub = new StreamHub();
+        const a = new FakeStream(10);
+        const b = new FakeStream(10);
+        hub.subscribe('user-a', a);
+        hub.subscribe('user-b', b);
+
+        hub.publish('user-a', { n: 1 });
+
+        expect(a.buffered).toEqual([{ n: 1 }]);
+        expect(b.buffered).toEqual([]);
+    });
+
+    test('Deve serializar a mensagem uma única vez para todos os assinantes', () => {
+        const serialize = jest.fn(message => Buffer.from(JSON.stringify(message)));
+        const hub = new StreamHub({ serialize });
+        const streams = [new FakeStream(10), new FakeStream(10), new FakeStream(10)];
+        streams.forEach(stream => hub.subscribe('sala', stream));
+
+        hub.publish('sala', { content: 'oi' }, { exclude: streams[0] });
+
+        expect(serialize).toHaveBeenCalledTimes(1);
+        expect(streams[0].buffered).toHaveLength(0);
+        expect(streams[1].buffered[0]).toBe(streams[2].buffered[0]);
+    });
+
+    test('Deve enfileirar enquanto aguarda drain e entregar na ordem', () => {
+        const hub = new StreamHub({ maxQueue: 10 });
+        const stream = new FakeStream(2);
+        hub.subscribe('k', stream);
+
+        const results = [1, 2, 3, 4].map(n => hub.publish('k', n));
+        expect(results.map(r => r.delivered)).toEqual([1, 1, 0, 0]);
+        expect(results.map(r => r.queued)).toEqual([0, 0, 1, 1]);
+        expect(hub.getStats().pending).toBe(2);
+
+        stream.drain();
+        stream.drain();
+
+        expect(stream.written).toEqual([1, 2, 3, 4]);
+        expect(hub.getStats().pending).toBe(0);
+    });
+
+    test('Deve descartar as mensagens mais antigas com a fila cheia (drop-oldest)', () => {
+        const hub = new StreamHub({ maxQueue: 2, overflow: 'drop-oldest' });
+        const stream = new FakeStream(1);
+        hub.subscribe('k', stream);
+
+        [1, 2, 3, 4, 5].forEach(n => hub.publish('k', n));
+        stream.drain();
+        stream.drain();
+        stream.drain();
+
+        expect(stream.written).toEqual([1, 4, 5]);
+        expect(hub.getStats().dropped).toBe(2);
+    });
+
+    test('Deve desconectar o cliente lento (disconnect)', () => {
+        const hub = new StreamHub({ maxQueue: 1, overflow: 'disconnect' });
+        const slow = new FakeStream(1);
+        const fast = new FakeStream(100);
+        hub.subscribe('k', slow);
+        hub.subscribe('k', fast);
+
+        [1, 2, 3].forEach(n => hub.publish('k', n));
+
+        expect(slow.destroyedWith.code).toBe(grpc.status.RESOURCE_EXHAUSTED);
+        expect(fast.buffered).toEqual([1, 2, 3]);
+
+        const stats = hub.getStats();
+        expect(stats.subscribers).toBe(1);
+        expect(stats.disconnected).toBe(1);
+    });
+
+    test('Deve remover o assinante de todas as chaves quando o stream é cancelado', () => {
+        const hub = new StreamHub();
+        const stream = new FakeStream();
+        hub.subscribe('sala-1', stream);
+        hub.subscribe('sala-2', stream);
+
+        stream.emit('cancelled');
+
+        expect(hub.hasSubscribers('sala-1')).toBe(false);
+        expect(hub.hasSubscribers('sala-2')).toBe(false);
+        expect(stream.listenerCount('drain')).toBe(0);
+    });
+});
@@ -4,8 +4,8 @@ const protoLoader = require('@grpc/proto-loader');
 const path = require('path');
 
 // Importar módulos necessários
-const { AuthService } = require('../services/AuthService');
-const { TaskService } = require('../services/TaskService');
+const AuthService = require('../services/AuthService');
+const TaskService = require('../services/TaskService');
 const { GrpcLoadBalancerGateway } = require('./loadBalancerGateway');
 const { LoadBalancingStrategies } = require('./loadBalancer');
 
@@ -30,6 +30,7 @@ class BackendServerInstance {
             maxLatency: options.maxLatency || 500,
             errorRate: options.errorRate || 0, // 0-1 (0% a 100%)
             weight: options.weight || 1,
+            logRequests: options.logRequests !== false,
             ...options
         };
         
@@ -61,8 +62,8 @@ class BackendServerInstance {
             oneofs: true,
         });
         
-        const authProto = loadPackageDefinition(authPackageDefinition);
-        const taskProto = loadPackageDefinition(taskPackageDefinition);
+        const authProto = loadPackageDefinition(authPackageDefinition).auth;
+        const taskProto = loadPackageDefinition(taskPackageDefinition).tasks;
         
         // Criar instâncias dos serviços com identificação do servidor
         const authService = new AuthService();
@@ -79,10 +80,7 @@ class BackendServerInstance {
                     
                     try {
                         // Simular latência se configurado
-                        if (this.config.simulateLatency) {
-                            const latency = Math.random() * (this.config.maxLatency - this.config.minLatency) + this.config.minLatency;
-                            await new Promise(resolve => setTimeout(resolve, latency));
-                        }
+                        await this.simulateLatency();
                         
                         // Simular erro se configurado
                         if (this.config.errorRate > 0 && Math.random() < this.config.errorRate) {
@@ -91,12 +89,12 @@ class BackendServerInstance {
                             throw error;
                         }
                         
-                        console.log(`🔧 ${this.serverId}: Processando authenticate (${serviceName})`);
+                        this.logRequest(`🔧 ${this.serverId}: Processando authenticate (${serviceName})`);
                         
                         // Executar método original
                         await serviceInstance.authenticate(call, (error, response) => {
                             if (error) {
-                                console.log(`❌ ${this.serverId}: Erro em authenticate: ${error.message}`);
+                                this.logRequest(`❌ ${this.serverId}: Erro em authenticate: ${error.message}`);
                                 callback(error);
                             } else {
                                 // Adicionar informações do servidor na resposta
@@ -106,7 +104,7 @@ class BackendServerInstance {
                                 }
                                 
                                 const processingTime = Date.now() - startTime;
-                                console.log(`✅ ${this.serverId}: authenticate concluído em ${processingTime}ms`);
+                                this.logRequest(`✅ ${this.serverId}: authenticate concluído em ${processingTime}ms`);
                                 
                                 callback(null, response);
                             }
@@ -114,17 +112,18 @@ class BackendServerInstance {
                         
                     } catch (error) {
                         const processingTime = Date.now() - startTime;
-                        console.log(`❌ ${this.serverId}: Erro em authenticate após ${processingTime}ms: ${error.message}`);
+                        this.logRequest(`❌ ${this.serverId}: Erro em authenticate após ${processingTime}ms: ${error.message}`);
                         callback(error);
                     }
                 };
                 
                 wrappedService.validateToken = async (call, callback) => {
                     try {
-                        console.log(`🔧 ${this.serverId}: Processando validateToken`);
+                        await this.simulateLatency();
+                        this.logRequest(`🔧 ${this.serverId}: Processando validateToken`);
                         await serviceInstance.validateToken(call, callback);
                     } catch (error) {
-                        console.log(`❌ ${this.serverId}: Erro em validateToken: ${error.message}`);
+                        this.logRequest(`❌ ${this.serverId}: Erro em validateToken: ${error.message}`);
                         callback(error);
                     }
                 };
@@ -140,10 +139,7 @@ class BackendServerInstance {
                         
                         try {
                             // Simular latência se configurado
-                            if (this.config.simulateLatency) {
-                                const latency = Math.random() * (this.config.maxLatency - this.config.minLatency) + this.config.minLatency;
-                                await new Promise(resolve => setTimeout(resolve, latency));
-                            }
+                            await this.simulateLatency();
                             
                             // Simular erro se configurado
                             if (this.config.errorRate > 0 && Math.random() < this.config.errorRate) {
@@ -152,12 +148,12 @@ class BackendServerInstance {
                                 throw error;
                             }
                             
-                            console.log(`🔧 ${this.serverId}: Processando ${methodName} (${serviceName})`);
+                            this.logRequest(`🔧 ${this.serverId}: Processando ${methodName} (${serviceName})`);
                             
                             // Executar método original
                             await serviceInstance[methodName](call, (error, response) => {
                                 if (error) {
-                                    console.log(`❌ ${this.serverId}: Erro em ${methodName}: ${error.message}`);
+                                    this.logRequest(`❌ ${this.serverId}: Erro em ${methodName}: ${error.message}`);
                                     callback(error);
                                 } else {
                                     // Adicionar informações do servidor na resposta
@@ -167,7 +163,7 @@ class BackendServerInstance {
                                     }
                                     
                                     const processingTime = Date.now() - startTime;
-                                    console.log(`✅ ${this.serverId}: ${methodName} concluído em ${processingTime}ms`);
+                                    this.logRequest(`✅ ${this.serverId}: ${methodName} concluído em ${processingTime}ms`);
                                     
                                     callback(null, response);
                                 }
@@ -175,7 +171,7 @@ class BackendServerInstance {
                             
                         } catch (error) {
                             const processingTime = Date.now() - startTime;
-                            console.log(`❌ ${this.serverId}: Erro em ${methodName} após ${processingTime}ms: ${error.message}`);
+                            this.logRequest(`❌ ${this.serverId}: Erro em ${methodName} após ${processingTime}ms: ${error.message}`);
                             callback(error);
                         }
                     };
@@ -195,6 +191,25 @@ class BackendServerInstance {
         console.log(`🔌 Serviços configurados para ${this.serverId}`);
     }
 
+    /**
+     * Latência artificial (uniforme entre minLatency e maxLatency)
+     */
+    async simulateLatency() {
+        if (this.config.simulateLatency) {
+            const latency = Math.random() * (this.config.maxLatency - this.config.minLatency) + this.config.minLatency;
+            await new Promise(resolve => setTimeout(resolve, latency));
+        }
+    }
+
+    /**
+     * Log por requisição (desligar com logRequests: false em benchmarks)
+     */
+    logRequest(message) {
+        if (this.config.logRequests) {
+            console.log(message);
+        }
+    }
+
     /**
      * Iniciar servidor backend
      */
@@ -389,8 +404,8 @@ class BackendCluster {
             oneofs: true,
         });
         
-        const authProto = loadPackageDefinition(authPackageDefinition);
-        const taskProto = loadPackageDefinition(taskPackageDefinition);
+        const authProto = loadPackageDefinition(authPackageDefinition).auth;
+        const taskProto = loadPackageDefinition(taskPackageDefinition).tasks;
         
         // Adicionar serviços ao gateway (os métodos serão proxied para os backends)
         this.gateway.addService(authProto.AuthService, {});
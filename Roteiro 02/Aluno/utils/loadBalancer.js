@@ -10,6 +10,8 @@ const { EventEmitter } = require('events');
  * - Least Connections: Prioriza servidores com menos conexões
  * - Health-based: Considera saúde dos servidores
  * - IP Hash: Consistente baseado no IP do cliente
+ * - P2C + Peak EWMA: sorteia dois servidores e escolhe o de menor custo
+ *   (latência observada × requisições pendentes)
  */
 
 /**
@@ -20,9 +22,16 @@ const LoadBalancingStrategies = {
     WEIGHTED_ROUND_ROBIN: 'weighted_round_robin',
     LEAST_CONNECTIONS: 'least_connections',
     HEALTH_BASED: 'health_based',
-    IP_HASH: 'ip_hash'
+    IP_HASH: 'ip_hash',
+    P2C_PEAK_EWMA: 'p2c_peak_ewma'
 };
 
+// Custo de um servidor sem medições mas com requisições pendentes (Peak EWMA)
+const UNMEASURED_PENALTY = 1e6;
+
+// Latência mínima registrada para uma falha (ms): servidor que falha rápido não deve parecer rápido
+const FAILURE_PENALTY = 1000;
+
 /**
  * Estado de saúde do servidor
  */
@@ -52,9 +61,17 @@ class BackendServer {
         this.enabled = true;
         this.metadata = options.metadata || {};
         
-        // Estatísticas de tempo
-        this.responseTimes = [];
-        this.maxResponseTimeHistory = 100;
+        // Estatísticas de tempo: buffer circular com soma acumulada (média em O(1))
+        this.maxResponseTimeHistory = options.responseTimeHistory || 100;
+        this.responseTimes = new Float64Array(this.maxResponseTimeHistory);
+        this.responseTimeCount = 0;
+        this.responseTimeIndex = 0;
+        this.responseTimeSum = 0;
+
+        // Peak EWMA: sobe imediatamente com picos e decai exponencialmente com o tempo
+        this.decayTime = options.decayTime || 10000; // ms
+        this.peakEwma = 0;
+        this.peakEwmaStamp = Date.now();
     }
 
     /**
@@ -85,23 +102,76 @@ class BackendServer {
             this.failedRequests++;
         }
 
-        // Registrar tempo de resposta
-        if (responseTime > 0) {
-            this.responseTimes.push(responseTime);
-            if (this.responseTimes.length > this.maxResponseTimeHistory) {
-                this.responseTimes.shift();
+        // Registrar tempo de resposta (falhas contam no mínimo FAILURE_PENALTY)
+        const latency = success ? responseTime : Math.max(responseTime, FAILURE_PENALTY);
+        if (latency > 0) {
+            if (this.responseTimeCount === this.maxResponseTimeHistory) {
+                this.responseTimeSum -= this.responseTimes[this.responseTimeIndex];
+            } else {
+                this.responseTimeCount++;
             }
+            this.responseTimes[this.responseTimeIndex] = latency;
+            this.responseTimeSum += latency;
+            this.responseTimeIndex = (this.responseTimeIndex + 1) % this.maxResponseTimeHistory;
+
             this.responseTime = this.getAverageResponseTime();
+            this.observeLatency(latency);
         }
     }
 
     /**
-     * Calcular tempo de resposta médio
+     * Calcular tempo de resposta médio (últimas maxResponseTimeHistory medições)
      */
     getAverageResponseTime() {
-        if (this.responseTimes.length === 0) return 0;
-        const sum = this.responseTimes.reduce((a, b) => a + b, 0);
-        return sum / this.responseTimes.length;
+        if (this.responseTimeCount === 0) return 0;
+        return this.responseTimeSum / this.responseTimeCount;
+    }
+
+    /**
+     * Atualizar o Peak EWMA com uma nova medição
+     */
+    observeLatency(responseTime, now = Date.now()) {
+        const current = this.getPeakEwma(now);
+        if (responseTime > current) {
+            this.peakEwma = responseTime;
+        } else {
+            // Média sobre o valor armazenado: o peso já aplica o decaimento desde a última medição
+            const weight = Math.exp(-Math.max(now - this.peakEwmaStamp, 0) / this.decayTime);
+            this.peakEwma = this.peakEwma * weight + responseTime * (1 - weight);
+        }
+        this.peakEwmaStamp = now;
+    }
+
+    /**
+     * Peak EWMA decaído até agora (servidor lento que ficou sem tráfego volta a ser testado)
+     */
+    getPeakEwma(now = Date.now()) {
+        const elapsed = Math.max(now - this.peakEwmaStamp, 0);
+        return this.peakEwma * Math.exp(-elapsed / this.decayTime);
+    }
+
+    /**
+     * Custo para P2C: latência esperada × (requisições pendentes + 1)
+     */
+    getLoadCost(now = Date.now()) {
+        const latency = this.getPeakEwma(now);
+        if (latency === 0 && this.currentConnections > 0) {
+            return UNMEASURED_PENALTY + this.currentConnections;
+        }
+        return latency * (this.currentConnections + 1);
+    }
+
+    /**
+     * Zerar as medições de tempo de resposta
+     */
+    resetResponseTimes() {
+        this.responseTimes.fill(0);
+        this.responseTimeCount = 0;
+        this.responseTimeIndex = 0;
+        this.responseTimeSum = 0;
+        this.responseTime = 0;
+        this.peakEwma = 0;
+        this.peakEwmaStamp = Date.now();
     }
 
     /**
@@ -152,6 +222,7 @@ class BackendServer {
             failedRequests: this.failedRequests,
             successRate: (this.getSuccessRate() * 100).toFixed(2) + '%',
             responseTime: this.responseTime.toFixed(2) + 'ms',
+            peakEwma: this.getPeakEwma().toFixed(2) + 'ms',
             healthScore: this.getHealthScore().toFixed(3),
             metadata: this.metadata
         };
@@ -271,6 +342,9 @@ class GrpcLoadBalancer extends EventEmitter {
                 case LoadBalancingStrategies.IP_HASH:
                     selectedServer = this.selectIpHash(availableServers, clientInfo.clientIp);
                     break;
+                case LoadBalancingStrategies.P2C_PEAK_EWMA:
+                    selectedServer = this.selectP2CPeakEwma(availableServers);
+                    break;
                 default:
                     selectedServer = this.selectRoundRobin(availableServers);
             }
@@ -361,6 +435,26 @@ class GrpcLoadBalancer extends EventEmitter {
         return servers[index];
     }
 
+    /**
+     * Power of Two Choices com Peak EWMA: dois servidores distintos sorteados,
+     * vence o de menor latência esperada × pendentes. Evita o efeito manada do
+     * "sempre o melhor" e reage a picos de latência, que Least Connections ignora.
+     */
+    selectP2CPeakEwma(servers) {
+        if (servers.length === 1) {
+            return servers[0];
+        }
+
+        const i = Math.floor(Math.random() * servers.length);
+        let j = Math.floor(Math.random() * (servers.length - 1));
+        if (j >= i) j++;
+
+        const now = Date.now();
+        const a = servers[i];
+        const b = servers[j];
+        return a.getLoadCost(now) <= b.getLoadCost(now) ? a : b;
+    }
+
     /**
      * Reconfigurar algoritmos quando servidores mudam
      */
@@ -539,7 +633,7 @@ class GrpcLoadBalancer extends EventEmitter {
             server.totalRequests = 0;
             server.successfulRequests = 0;
             server.failedRequests = 0;
-            server.responseTimes = [];
+            server.resetResponseTimes();
         });
         console.log('📊 Estatísticas resetadas');
     }
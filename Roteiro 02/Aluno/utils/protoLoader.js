@@ -30,8 +30,9 @@ class ProtoLoader {
             oneofs: true
         });
 
+        ProtoLoader.allowPreserializedResponses(packageDefinition);
         const protoDescriptor = grpc.loadPackageDefinition(packageDefinition);
-        
+
         this.packageDefinitions.set(packageName, packageDefinition);
         this.services.set(packageName, protoDescriptor[packageName]);
         
@@ -42,6 +43,22 @@ class ProtoLoader {
         return this.services.get(packageName);
     }
 
+    /**
+     * Respostas já serializadas (Buffer) passam direto pelo serializer.
+     * Permite serializar uma vez uma mensagem enviada para vários streams (StreamHub).
+     */
+    static allowPreserializedResponses(packageDefinition) {
+        Object.values(packageDefinition).forEach(definition => {
+            Object.values(definition).forEach(method => {
+                if (method && typeof method.responseSerialize === 'function' && !method.responseSerialize.preserialized) {
+                    const serialize = method.responseSerialize;
+                    method.responseSerialize = value => Buffer.isBuffer(value) ? value : serialize(value);
+                    method.responseSerialize.preserialized = true;
+                }
+            });
+        });
+    }
+
     // Helpers para conversão de dados
     static convertTimestamp(date) {
         return Math.floor(new Date(date).getTime() / 1000);
@@ -0,0 +1,261 @@
+const grpc = require('@grpc/grpc-js');
+
+/**
+ * Fan-out de mensagens para streams gRPC
+ *
+ * - Assinantes indexados por chave (userId, sala...), sem varrer todas as sessões
+ * - Cada mensagem é serializada uma única vez para todos os assinantes
+ *   (ver ProtoLoader.loadProto: o serializer de resposta aceita Buffer pronto)
+ * - Respeita o backpressure do stream: quando write() retorna false, as
+ *   mensagens seguintes vão para uma fila limitada até o evento 'drain'
+ * - Fila cheia: descartar a mais antiga, descartar a nova ou desconectar o assinante
+ */
+
+const OVERFLOW_POLICIES = ['drop-oldest', 'drop-newest', 'disconnect'];
+
+class StreamSubscriber {
+    constructor(hub, stream, data = {}) {
+        this.hub = hub;
+        this.stream = stream;
+        this.data = data;
+        this.keys = new Set();
+        this.queue = [];
+        this.waitingDrain = false;
+        this.closed = false;
+        this.delivered = 0;
+        this.dropped = 0;
+
+        this.onDrain = () => this.flush();
+        this.onClose = () => hub.remove(this);
+
+        stream.on('drain', this.onDrain);
+        stream.on('cancelled', this.onClose);
+        stream.on('error', this.onClose);
+        stream.on('close', this.onClose);
+        stream.on('finish', this.onClose);
+    }
+
+    /**
+     * Enviar (ou enfileirar) uma mensagem já serializada
+     * @returns {'delivered'|'queued'|'dropped'|'disconnected'}
+     */
+    send(payload) {
+        if (this.closed) return 'dropped';
+
+        if (!this.waitingDrain) {
+            return this.write(payload) ? 'delivered' : 'dropped';
+        }
+
+        if (this.queue.length < this.hub.maxQueue) {
+            this.queue.push(payload);
+            return 'queued';
+        }
+
+        switch (this.hub.overflow) {
+            case 'drop-oldest':
+                this.queue.shift();
+                this.queue.push(payload);
+                this.dropped++;
+                return 'dropped';
+            case 'drop-newest':
+                this.dropped++;
+                return 'dropped';
+            default:
+                this.disconnect('Cliente não acompanha o ritmo das mensagens');
+                return 'disconnected';
+        }
+    }
+
+    // Entrega ao stream; quando o buffer dele enche, as próximas aguardam o 'drain'
+    write(payload) {
+        try {
+            if (!this.stream.write(payload)) {
+                this.waitingDrain = true;
+            }
+            this.delivered++;
+            return true;
+        } catch (error) {
+            console.error('❌ Erro ao escrever no stream:', error.message);
+            this.hub.remove(this);
+            return false;
+        }
+    }
+
+    flush() {
+        this.waitingDrain = false;
+        while (this.queue.length > 0 && !this.waitingDrain && !this.closed) {
+            this.write(this.queue.shift());
+        }
+    }
+
+    disconnect(reason) {
+        const error = new Error(reason);
+        error.code = grpc.status.RESOURCE_EXHAUSTED;
+        this.hub.disconnected++;
+        this.hub.remove(this);
+        try {
+            this.stream.destroy(error);
+        } catch (destroyError) {
+            // Stream já encerrado
+        }
+    }
+
+    detach() {
+        this.closed = true;
+        this.queue = [];
+        this.stream.removeListener('drain', this.onDrain);
+        this.stream.removeListener('cancelled', this.onClose);
+        this.stream.removeListener('error', this.onClose);
+        this.stream.removeListener('close', this.onClose);
+        this.stream.removeListener('finish', this.onClose);
+    }
+}
+
+class StreamHub {
+    /**
+     * @param {Object} options
+     * @param {string} options.name - Nome usado nas métricas
+     * @param {Function} options.serialize - responseSerialize do método de streaming
+     * @param {number} options.maxQueue - Mensagens pendentes por assinante
+     * @param {string} options.overflow - 'drop-oldest' | 'drop-newest' | 'disconnect'
+     */
+    constructor(options = {}) {
+        this.name = options.name || 'stream';
+        this.serialize = options.serialize || null;
+        this.maxQueue = options.maxQueue || parseInt(process.env.STREAM_MAX_QUEUE) || 1000;
+        this.overflow = options.overflow || process.env.STREAM_OVERFLOW_POLICY || 'drop-oldest';
+
+        if (!OVERFLOW_POLICIES.includes(this.overflow)) {
+            throw new Error(`Política de overflow inválida: ${this.overflow}`);
+        }
+
+        this.index = new Map(); // chave -> Set(StreamSubscriber)
+        this.subscribers = new Map(); // stream -> StreamSubscriber
+
+        this.published = 0;
+        this.serialized = 0;
+        this.delivered = 0;
+        this.queued = 0;
+        this.dropped = 0;
+        this.disconnected = 0;
+    }
+
+    /**
+     * Inscrever um stream em uma chave (o mesmo stream pode estar em várias chaves)
+     */
+    subscribe(key, stream, data = {}) {
+        let subscriber = this.subscribers.get(stream);
+        if (!subscriber) {
+            subscriber = new StreamSubscriber(this, stream, data);
+            this.subscribers.set(stream, subscriber);
+        }
+
+        if (!this.index.has(key)) {
+            this.index.set(key, new Set());
+        }
+        this.index.get(key).add(subscriber);
+        subscriber.keys.add(key);
+
+        return subscriber;
+    }
+
+    unsubscribe(key, stream) {
+        const subscriber = this.subscribers.get(stream);
+        if (!subscriber) return;
+
+        this.removeFromKey(key, subscriber);
+        if (subscriber.keys.size === 0) {
+            this.remove(subscriber);
+        }
+    }
+
+    remove(subscriber) {
+        if (subscriber.closed) return;
+
+        subscriber.detach();
+        subscriber.keys.forEach(key => this.removeFromKey(key, subscriber));
+        this.subscribers.delete(subscriber.stream);
+    }
+
+    removeFromKey(key, subscriber) {
+        const set = this.index.get(key);
+        if (set) {
+            set.delete(subscriber);
+            if (set.size === 0) {
+                this.index.delete(key);
+            }
+        }
+        subscriber.keys.delete(key);
+    }
+
+    /**
+     * Publicar para os assinantes da chave
+     * @param {Object} options.exclude - Stream que não deve receber (ex: remetente)
+     * @param {Function} options.filter - (subscriber) => boolean
+     */
+    publish(key, message, options = {}) {
+        const result = { delivered: 0, queued: 0, dropped: 0, disconnected: 0 };
+        const set = this.index.get(key);
+        if (!set) return result;
+
+        this.published++;
+        let payload = null;
+
+        // Cópia: desconexões durante o envio alteram o Set
+        for (const subscriber of Array.from(set)) {
+            if (subscriber.stream === options.exclude) continue;
+            if (options.filter && !options.filter(subscriber)) continue;
+
+            if (payload === null) {
+                payload = this.serialize ? this.serialize(message) : message;
+                this.serialized++;
+            }
+
+            result[subscriber.send(payload)]++;
+        }
+
+        this.delivered += result.delivered;
+        this.queued += result.queued;
+        this.dropped += result.dropped;
+        return result;
+    }
+
+    hasSubscribers(key) {
+        return this.index.has(key);
+    }
+
+    getStats() {
+        let pending = 0;
+        let maxPending = 0;
+        let slow = 0;
+
+        for (const subscriber of this.subscribers.values()) {
+            pending += subscriber.queue.length;
+            maxPending = Math.max(maxPending, subscriber.queue.length);
+            if (subscriber.waitingDrain) slow++;
+        }
+
+        return {
+            name: this.name,
+            keys: this.index.size,
+            subscribers: this.subscribers.size,
+            slowSubscribers: slow,
+            pending,
+            maxPending,
+            maxQueue: this.maxQueue,
+            overflow: this.overflow,
+            published: this.published,
+            serialized: this.serialized,
+            delivered: this.delivered,
+            queued: this.queued,
+            dropped: this.dropped,
+            disconnected: this.disconnected
+        };
+    }
+}
+
+module.exports = {
+    StreamHub,
+    StreamSubscriber,
+    OVERFLOW_POLICIES
+};
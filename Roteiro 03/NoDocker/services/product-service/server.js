@@ -26,7 +26,7 @@ class ProductService {
 
     setupDatabase() {
         const dbPath = path.join(__dirname, 'database');
-        this.productsDb = new JsonDatabase(dbPath, 'products');
+        this.productsDb = new JsonDatabase(dbPath, 'products', { indexes: ['category.slug'] });
         console.log('Product Service: Banco NoSQL inicializado');
     }
 
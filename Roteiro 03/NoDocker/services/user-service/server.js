@@ -27,7 +27,7 @@ class UserService {
 
     setupDatabase() {
         const dbPath = path.join(__dirname, 'database');
-        this.usersDb = new JsonDatabase(dbPath, 'users');
+        this.usersDb = new JsonDatabase(dbPath, 'users', { indexes: ['email', 'username'] });
         console.log('User Service: Banco NoSQL inicializado');
     }
 
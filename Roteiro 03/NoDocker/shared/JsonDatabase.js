@@ -3,14 +3,31 @@ const fs = require('fs-extra');
 const path = require('path');
 const { v4: uuidv4 } = require('uuid');
 
+// Armazenamento da coleção:
+//  - <colecao>.json     snapshot (array de documentos), reescrito só na compactação
+//  - <colecao>.journal  log append-only (uma operação JSON por linha) desde o último snapshot
+// A coleção inteira fica em memória (Map por id + índices secundários), então as
+// leituras não tocam o disco e cada escrita acrescenta uma única linha ao journal.
+// Cada coleção deve ter um único processo escritor (o serviço dono dela).
 class JsonDatabase {
-    constructor(dbPath, collectionName) {
+    constructor(dbPath, collectionName, options = {}) {
         this.dbPath = dbPath;
         this.collectionName = collectionName;
         this.filePath = path.join(dbPath, `${collectionName}.json`);
-        this.indexPath = path.join(dbPath, `${collectionName}_index.json`);
+        this.journalPath = path.join(dbPath, `${collectionName}.journal`);
 
-        this.ensureDatabase();
+        this.indexFields = options.indexes || [];
+        this.compactThreshold = options.compactThreshold || 1000;
+        this.compactInterval = options.compactInterval || 60 * 1000;
+
+        this.documents = new Map();
+        this.indexes = new Map();
+        this.journalEntries = 0;
+        this.writeQueue = Promise.resolve();
+
+        this.ready = this.ensureDatabase();
+        // Erros de inicialização são propagados pela primeira operação
+        this.ready.catch(() => {});
     }
 
     async ensureDatabase() {
@@ -23,20 +40,60 @@ class JsonDatabase {
                 await fs.writeJson(this.filePath, []);
             }
 
-            // Criar índice se não existir
-            if (!await fs.pathExists(this.indexPath)) {
-                await fs.writeJson(this.indexPath, {});
-            }
+            await this.load();
+
+            // Compactação periódica do journal
+            const timer = setInterval(() => {
+                if (this.journalEntries > 0) {
+                    this.compact().catch(error => console.error('Erro ao compactar banco:', error));
+                }
+            }, this.compactInterval);
+            timer.unref();
         } catch (error) {
             console.error('Erro ao inicializar banco:', error);
             throw error;
         }
     }
 
+    // Carrega o snapshot e reaplica o journal
+    async load() {
+        let snapshot = [];
+        try {
+            snapshot = await fs.readJson(this.filePath);
+        } catch (error) {
+            snapshot = [];
+        }
+
+        this.documents.clear();
+        this.indexFields.forEach(field => this.indexes.set(field, new Map()));
+        snapshot.forEach(document => this.applyPut(document));
+
+        this.journalEntries = 0;
+        if (await fs.pathExists(this.journalPath)) {
+            const lines = (await fs.readFile(this.journalPath, 'utf8')).split('\n');
+            for (const line of lines) {
+                if (!line) continue;
+                let entry;
+                try {
+                    entry = JSON.parse(line);
+                } catch (error) {
+                    // Última linha incompleta (escrita interrompida)
+                    continue;
+                }
+                if (entry.op === 'put') {
+                    this.applyPut(entry.doc);
+                } else if (entry.op === 'del') {
+                    this.applyDelete(entry.id);
+                }
+                this.journalEntries++;
+            }
+        }
+    }
+
     // Criar documento
     async create(data) {
         try {
-            const documents = await this.readAll();
+            await this.ready;
             const document = {
                 id: data.id || uuidv4(),
                 ...data,
@@ -44,11 +101,9 @@ class JsonDatabase {
                 updatedAt: new Date().toISOString()
             };
 
-            documents.push(document);
-            await this.writeAll(documents);
-            await this.updateIndex(document);
+            await this.write({ op: 'put', doc: document });
 
-            return document;
+            return this.clone(document);
         } catch (error) {
             console.error('Erro ao criar documento:', error);
             throw error;
@@ -58,8 +113,9 @@ class JsonDatabase {
     // Buscar por ID
     async findById(id) {
         try {
-            const documents = await this.readAll();
-            return documents.find(doc => doc.id === id) || null;
+            await this.ready;
+            const document = this.documents.get(id);
+            return document ? this.clone(document) : null;
         } catch (error) {
             console.error('Erro ao buscar documento:', error);
             throw error;
@@ -69,8 +125,13 @@ class JsonDatabase {
     // Buscar um documento com filtro
     async findOne(filter) {
         try {
-            const documents = await this.readAll();
-            return documents.find(doc => this.matchesFilter(doc, filter)) || null;
+            await this.ready;
+            for (const doc of this.candidates(filter)) {
+                if (this.matchesFilter(doc, filter)) {
+                    return this.clone(doc);
+                }
+            }
+            return null;
         } catch (error) {
             console.error('Erro ao buscar documento:', error);
             throw error;
@@ -80,7 +141,8 @@ class JsonDatabase {
     // Buscar múltiplos documentos
     async find(filter = {}, options = {}) {
         try {
-            let documents = await this.readAll();
+            await this.ready;
+            let documents = this.candidates(filter);
 
             // Aplicar filtro
             if (Object.keys(filter).length > 0) {
@@ -99,7 +161,7 @@ class JsonDatabase {
                 documents = documents.slice(skip, skip + limit);
             }
 
-            return documents;
+            return documents.map(doc => this.clone(doc));
         } catch (error) {
             console.error('Erro ao buscar documentos:', error);
             throw error;
@@ -109,11 +171,11 @@ class JsonDatabase {
     // Contar documentos
     async count(filter = {}) {
         try {
-            const documents = await this.readAll();
+            await this.ready;
             if (Object.keys(filter).length === 0) {
-                return documents.length;
+                return this.documents.size;
             }
-            return documents.filter(doc => this.matchesFilter(doc, filter)).length;
+            return this.candidates(filter).filter(doc => this.matchesFilter(doc, filter)).length;
         } catch (error) {
             console.error('Erro ao contar documentos:', error);
             throw error;
@@ -123,25 +185,24 @@ class JsonDatabase {
     // Atualizar documento
     async update(id, updates) {
         try {
-            const documents = await this.readAll();
-            const index = documents.findIndex(doc => doc.id === id);
-
-            if (index === -1) {
-                return null;
-            }
-
-            documents[index] = {
-                ...documents[index],
-                ...updates,
-                id: documents[index].id, // Preservar ID
-                createdAt: documents[index].createdAt, // Preservar data de criação
-                updatedAt: new Date().toISOString()
-            };
+            await this.ready;
+            return await this.serialize(async () => {
+                const current = this.documents.get(id);
+                if (!current) {
+                    return null;
+                }
 
-            await this.writeAll(documents);
-            await this.updateIndex(documents[index]);
+                const document = {
+                    ...current,
+                    ...updates,
+                    id: current.id, // Preservar ID
+                    createdAt: current.createdAt, // Preservar data de criação
+                    updatedAt: new Date().toISOString()
+                };
 
-            return documents[index];
+                await this.appendToJournal({ op: 'put', doc: document });
+                return this.clone(document);
+            });
         } catch (error) {
             console.error('Erro ao atualizar documento:', error);
             throw error;
@@ -151,18 +212,15 @@ class JsonDatabase {
     // Deletar documento
     async delete(id) {
         try {
-            const documents = await this.readAll();
-            const index = documents.findIndex(doc => doc.id === id);
-
-            if (index === -1) {
-                return false;
-            }
-
-            documents.splice(index, 1);
-            await this.writeAll(documents);
-            await this.removeFromIndex(id);
+            await this.ready;
+            return await this.serialize(async () => {
+                if (!this.documents.has(id)) {
+                    return false;
+                }
 
-            return true;
+                await this.appendToJournal({ op: 'del', id });
+                return true;
+            });
         } catch (error) {
             console.error('Erro ao deletar documento:', error);
             throw error;
@@ -172,61 +230,147 @@ class JsonDatabase {
     // Busca de texto
     async search(query, fields = []) {
         try {
-            const documents = await this.readAll();
+            await this.ready;
             const searchTerm = query.toLowerCase();
+            const results = [];
 
-            return documents.filter(doc => {
+            for (const doc of this.documents.values()) {
                 // Se campos específicos foram fornecidos, buscar apenas neles
-                if (fields.length > 0) {
-                    return fields.some(field => {
+                const matches = fields.length > 0
+                    ? fields.some(field => {
                         const value = this.getNestedValue(doc, field);
                         return value && value.toString().toLowerCase().includes(searchTerm);
-                    });
+                    })
+                    // Buscar em todos os campos de string do documento
+                    : this.searchInObject(doc, searchTerm);
+
+                if (matches) {
+                    results.push(this.clone(doc));
                 }
+            }
 
-                // Buscar em todos os campos de string do documento
-                return this.searchInObject(doc, searchTerm);
-            });
+            return results;
         } catch (error) {
             console.error('Erro na busca:', error);
             throw error;
         }
     }
 
+    // Grava o snapshot atual e zera o journal
+    compact() {
+        return this.serialize(async () => {
+            const tmpPath = `${this.filePath}.tmp`;
+            await fs.writeJson(tmpPath, Array.from(this.documents.values()), { spaces: 2 });
+            await fs.rename(tmpPath, this.filePath);
+            await fs.writeFile(this.journalPath, '');
+            this.journalEntries = 0;
+        });
+    }
+
     // Métodos auxiliares
     async readAll() {
-        try {
-            return await fs.readJson(this.filePath);
-        } catch (error) {
-            return [];
+        await this.ready;
+        return Array.from(this.documents.values(), doc => this.clone(doc));
+    }
+
+    // Escritas são executadas uma de cada vez, na ordem de chegada
+    serialize(operation) {
+        const result = this.writeQueue.then(operation);
+        this.writeQueue = result.catch(() => {});
+        return result;
+    }
+
+    write(entry) {
+        return this.serialize(() => this.appendToJournal(entry));
+    }
+
+    // Grava a operação no journal e só então aplica em memória
+    async appendToJournal(entry) {
+        await fs.appendFile(this.journalPath, JSON.stringify(entry) + '\n');
+
+        if (entry.op === 'put') {
+            this.applyPut(entry.doc);
+        } else {
+            this.applyDelete(entry.id);
+        }
+
+        this.journalEntries++;
+        if (this.journalEntries >= this.compactThreshold) {
+            // Enfileirada depois da escrita atual
+            this.compact().catch(error => console.error('Erro ao compactar banco:', error));
         }
     }
 
-    async writeAll(documents) {
-        await fs.writeJson(this.filePath, documents, { spaces: 2 });
+    applyPut(document) {
+        const previous = this.documents.get(document.id);
+        if (previous) {
+            this.removeFromIndexes(previous);
+        }
+        this.documents.set(document.id, document);
+        this.addToIndexes(document);
     }
 
-    async updateIndex(document) {
-        try {
-            const index = await fs.readJson(this.indexPath);
-            index[document.id] = {
-                id: document.id,
-                updatedAt: document.updatedAt
-            };
-            await fs.writeJson(this.indexPath, index, { spaces: 2 });
-        } catch (error) {
-            console.error('Erro ao atualizar índice:', error);
+    applyDelete(id) {
+        const previous = this.documents.get(id);
+        if (previous) {
+            this.removeFromIndexes(previous);
+            this.documents.delete(id);
         }
     }
 
-    async removeFromIndex(id) {
-        try {
-            const index = await fs.readJson(this.indexPath);
-            delete index[id];
-            await fs.writeJson(this.indexPath, index, { spaces: 2 });
-        } catch (error) {
-            console.error('Erro ao remover do índice:', error);
+    addToIndexes(document) {
+        for (const [field, index] of this.indexes) {
+            const value = this.getNestedValue(document, field);
+            if (!index.has(value)) {
+                index.set(value, new Set());
+            }
+            index.get(value).add(document.id);
+        }
+    }
+
+    removeFromIndexes(document) {
+        for (const [field, index] of this.indexes) {
+            const value = this.getNestedValue(document, field);
+            const ids = index.get(value);
+            if (ids) {
+                ids.delete(document.id);
+                if (ids.size === 0) {
+                    index.delete(value);
+                }
+            }
+        }
+    }
+
+    // Documentos candidatos para o filtro: usa o id ou o menor índice de igualdade disponível
+    candidates(filter) {
+        if (filter.id !== undefined && (typeof filter.id !== 'object' || filter.id === null)) {
+            const document = this.documents.get(filter.id);
+            return document ? [document] : [];
         }
+
+        let best = null;
+        for (const [field, value] of Object.entries(filter)) {
+            const index = this.indexes.get(field);
+            if (!index || (typeof value === 'object' && value !== null)) {
+                continue;
+            }
+            const ids = index.get(value) || new Set();
+            if (!best || ids.size < best.size) {
+                best = ids;
+            }
+        }
+
+        if (!best) {
+            return Array.from(this.documents.values());
+        }
+        return Array.from(best, id => this.documents.get(id));
+    }
+
+    // Os documentos em memória nunca são expostos diretamente aos chamadores
+    clone(document) {
+        return typeof structuredClone === 'function'
+            ? structuredClone(document)
+            : JSON.parse(JSON.stringify(document));
     }
 
     matchesFilter(document, filter) {
@@ -297,4 +441,4 @@ class JsonDatabase {
     }
 }
 
-module.exports = JsonDatabase;
\ No newline at end of file
+module.exports = JsonDatabase;
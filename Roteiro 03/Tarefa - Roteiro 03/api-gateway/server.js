@@ -3,9 +3,28 @@ const cors = require('cors');
 const helmet = require('helmet');
 const morgan = require('morgan');
 const axios = require('axios');
+const http = require('http');
 
 // Importar service registry
 const serviceRegistry = require('../shared/serviceRegistry');
+const { Aggregator } = require('../shared/aggregator');
+const { TokenVerifier } = require('../shared/auth');
+
+// Tabela de rotas do proxy: prefixo público -> serviço e reescrita do path
+// (rest é o que vem depois do prefixo, incluindo a query string)
+const ROUTES = [
+    { prefix: '/api/auth', service: 'user-service', rewrite: rest => '/auth' + rest },
+    { prefix: '/api/users', service: 'user-service', rewrite: rest => rest.startsWith('/auth/') ? rest : '/users' + rest },
+    { prefix: '/api/items', service: 'item-service', rewrite: rest => '/items' + rest },
+    { prefix: '/api/products', service: 'item-service', rewrite: rest => '/products' + rest },
+    { prefix: '/api/lists', service: 'list-service', rewrite: rest => '/lists' + rest }
+];
+
+// Headers hop-by-hop não são repassados pelo proxy
+const HOP_BY_HOP_HEADERS = [
+    'connection', 'keep-alive', 'proxy-authenticate', 'proxy-authorization',
+    'te', 'trailer', 'transfer-encoding', 'upgrade', 'host'
+];
 
 class APIGateway {
     constructor() {
@@ -14,6 +33,22 @@ class APIGateway {
         
         // Circuit breaker simples
         this.circuitBreakers = new Map();
+
+        // Pools de conexões keep-alive por instância de serviço
+        this.agents = new Map();
+        this.proxyTimeout = parseInt(process.env.GATEWAY_PROXY_TIMEOUT) || 10000;
+
+        // Endpoints agregados: cache por parte com stale-while-revalidate e prazo global
+        this.aggregator = new Aggregator();
+        // Partes por usuário ficam em cache: o token é validado no gateway antes de servi-las
+        this.tokenVerifier = new TokenVerifier();
+        this.serviceTimeout = parseInt(process.env.GATEWAY_SERVICE_TIMEOUT) || 5000;
+        // Hedging: após este atraso sem resposta, repete o GET em outra réplica (0 desliga)
+        this.hedgeDelay = parseInt(process.env.GATEWAY_HEDGE_DELAY) || 0;
+        this.hedgeStats = { hedged: 0, hedgeWins: 0 };
+
+        // Log por requisição (desligar com GATEWAY_REQUEST_LOG=false em testes de carga)
+        this.requestLogging = process.env.GATEWAY_REQUEST_LOG !== 'false';
         
         this.setupMiddleware();
         this.setupRoutes();
@@ -26,9 +61,9 @@ class APIGateway {
     setupMiddleware() {
         this.app.use(helmet());
         this.app.use(cors());
-        this.app.use(morgan('combined'));
-        this.app.use(express.json());
-        this.app.use(express.urlencoded({ extended: true }));
+        if (this.requestLogging) {
+            this.app.use(morgan('combined'));
+        }
 
         // Gateway headers
         this.app.use((req, res, next) => {
@@ -38,11 +73,6 @@ class APIGateway {
             next();
         });
 
-        // Request logging
-        this.app.use((req, res, next) => {
-            console.log(`${req.method} ${req.originalUrl} - ${req.ip}`);
-            next();
-        });
     }
 
     setupRoutes() {
@@ -99,39 +129,21 @@ class APIGateway {
             res.json({
                 success: true,
                 services: serviceRegistry.listServices(),
-                stats: serviceRegistry.getStats()
+                stats: serviceRegistry.getStats(),
+                aggregation: {
+                    ...this.aggregator.getStats(),
+                    hedgeDelay: this.hedgeDelay,
+                    ...this.hedgeStats
+                }
             });
         });
 
-        // Auth Service routes
-        this.app.use('/api/auth', (req, res, next) => {
-            console.log(`🔗 Roteando para user-service (auth): ${req.method} ${req.originalUrl}`);
-            this.proxyRequest('user-service', req, res, next);
-        });
+        // Rotas dos serviços (auth, users, items, products, lists): proxy com streaming
+        this.app.use(this.proxyMiddleware());
 
-        // User Service routes
-        this.app.use('/api/users', (req, res, next) => {
-            console.log(`🔗 Roteando para user-service: ${req.method} ${req.originalUrl}`);
-            this.proxyRequest('user-service', req, res, next);
-        });
-
-        // Items Service routes (product-service)
-        this.app.use('/api/items', (req, res, next) => {
-            console.log(`🔗 Roteando para product-service (items): ${req.method} ${req.originalUrl}`);
-            this.proxyRequest('product-service', req, res, next);
-        });
-
-        // Product Service routes  
-        this.app.use('/api/products', (req, res, next) => {
-            console.log(`🔗 Roteando para product-service: ${req.method} ${req.originalUrl}`);
-            this.proxyRequest('product-service', req, res, next);
-        });
-
-        // Lists Service routes
-        this.app.use('/api/lists', (req, res, next) => {
-            console.log(`🔗 Roteando para list-service: ${req.method} ${req.originalUrl}`);
-            this.proxyRequest('list-service', req, res, next);
-        });
+        // Body parsers só para as rotas do próprio gateway (o proxy repassa o corpo sem parsear)
+        this.app.use(express.json());
+        this.app.use(express.urlencoded({ extended: true }));
 
         // Endpoints agregados
         this.app.get('/api/dashboard', this.getDashboard.bind(this));
@@ -167,156 +179,135 @@ class APIGateway {
         });
     }
 
-    // Proxy request to service
-    async proxyRequest(serviceName, req, res, next) {
-        try {
-            console.log(`🔄 Proxy request: ${req.method} ${req.originalUrl} -> ${serviceName}`);
-            
-            // Verificar circuit breaker
-            if (this.isCircuitOpen(serviceName)) {
-                console.log(`⚡ Circuit breaker open for ${serviceName}`);
-                return res.status(503).json({
-                    success: false,
-                    message: `Serviço ${serviceName} temporariamente indisponível`,
-                    service: serviceName
-                });
+    // Encontra a rota na tabela pré-compilada
+    matchRoute(url) {
+        for (const route of ROUTES) {
+            if (url.startsWith(route.prefix)) {
+                const rest = url.slice(route.prefix.length);
+                if (rest === '' || rest[0] === '/' || rest[0] === '?') {
+                    return { service: route.service, path: route.rewrite(rest) };
+                }
             }
+        }
+        return null;
+    }
 
-            // Descobrir serviço com debug
-            let service;
-            try {
-                service = serviceRegistry.discover(serviceName);
-            } catch (error) {
-                console.error(`❌ Erro na descoberta do serviço ${serviceName}:`, error.message);
-                
-                // Debug: listar serviços disponíveis
-                const availableServices = serviceRegistry.listServices();
-                console.log(`📋 Serviços disponíveis:`, Object.keys(availableServices));
-                
-                return res.status(503).json({
-                    success: false,
-                    message: `Serviço ${serviceName} não encontrado`,
-                    service: serviceName,
-                    availableServices: Object.keys(availableServices)
-                });
+    proxyMiddleware() {
+        return (req, res, next) => {
+            const route = this.matchRoute(req.originalUrl);
+            if (!route) {
+                return next();
             }
-            
-            // Construir URL de destino corrigida
-            const originalPath = req.originalUrl;
-            let targetPath = '';
-            
-            // Extrair o path correto baseado no serviço
-            if (serviceName === 'user-service') {
-                // /api/auth/login -> /auth/login
-                // /api/users/auth/login -> /auth/login
-                // /api/users -> /users
-                // /api/users/123 -> /users/123
-                if (originalPath.startsWith('/api/auth/')) {
-                    targetPath = originalPath.replace('/api/auth', '/auth');
-                } else {
-                    targetPath = originalPath.replace('/api/users', '');
-                    if (!targetPath.startsWith('/')) {
-                        targetPath = '/' + targetPath;
-                    }
-                    // Se path vazio, usar /users
-                    if (targetPath === '/' || targetPath === '') {
-                        targetPath = '/users';
-                    }
-                }
-            } else if (serviceName === 'product-service') {
-                // /api/items -> /items
-                // /api/products -> /products
-                // /api/items/123 -> /items/123
-                if (originalPath.startsWith('/api/items/')) {
-                    targetPath = originalPath.replace('/api/items', '/items');
-                } else {
-                    targetPath = originalPath.replace('/api/products', '');
-                    if (!targetPath.startsWith('/')) {
-                        targetPath = '/' + targetPath;
-                    }
-                    // Se path vazio, usar /products
-                    if (targetPath === '/' || targetPath === '') {
-                        targetPath = '/products';
-                    }
-                }
-            } else if (serviceName === 'list-service') {
-                // /api/lists -> /lists
-                // /api/lists/123 -> /lists/123
-                targetPath = originalPath.replace('/api/lists', '');
-                if (!targetPath.startsWith('/')) {
-                    targetPath = '/' + targetPath;
-                }
-                // Se path vazio, usar /lists
-                if (targetPath === '/' || targetPath === '') {
-                    targetPath = '/lists';
-                }
+            this.proxyRequest(route.service, route.path, req, res);
+        };
+    }
+
+    // Agente HTTP keep-alive por instância (url base) do serviço
+    agentFor(serviceUrl) {
+        let agent = this.agents.get(serviceUrl);
+        if (!agent) {
+            agent = new http.Agent({ keepAlive: true, maxSockets: 256, maxFreeSockets: 64 });
+            this.agents.set(serviceUrl, agent);
+        }
+        return agent;
+    }
+
+    // Proxy request to service: corpo da requisição e da resposta repassados como stream
+    proxyRequest(serviceName, targetPath, req, res) {
+        // Verificar circuit breaker
+        if (this.isCircuitOpen(serviceName)) {
+            return res.status(503).json({
+                success: false,
+                message: `Serviço ${serviceName} temporariamente indisponível`,
+                service: serviceName
+            });
+        }
+
+        let service;
+        try {
+            service = serviceRegistry.discover(serviceName);
+        } catch (error) {
+            const availableServices = serviceRegistry.listServices();
+            return res.status(503).json({
+                success: false,
+                message: `Serviço ${serviceName} não encontrado`,
+                service: serviceName,
+                availableServices: Object.keys(availableServices)
+            });
+        }
+
+        // Requisições em andamento e latência por instância alimentam o balanceamento
+        const release = serviceRegistry.track(service);
+        const target = new URL(targetPath, service.url);
+        const headers = {};
+        for (const [name, value] of Object.entries(req.headers)) {
+            if (!HOP_BY_HOP_HEADERS.includes(name)) {
+                headers[name] = value;
             }
-            
-            const targetUrl = `${service.url}${targetPath}`;
-            
-            console.log(`🎯 Target URL: ${targetUrl}`);
-            
-            // Configurar requisição
-            const config = {
-                method: req.method,
-                url: targetUrl,
-                headers: { ...req.headers },
-                timeout: 10000,
-                family: 4,  // Força IPv4
-                validateStatus: function (status) {
-                    return status < 500; // Aceitar todos os status < 500
-                }
-            };
+        }
+        headers['x-forwarded-for'] = req.ip;
+        headers['x-forwarded-host'] = req.headers.host;
+
+        const upstream = http.request({
+            hostname: target.hostname,
+            port: target.port,
+            path: target.pathname + target.search,
+            method: req.method,
+            headers,
+            agent: this.agentFor(service.url),
+            family: 4 // Força IPv4
+        });
 
-            // Adicionar body para requisições POST/PUT/PATCH
-            if (['POST', 'PUT', 'PATCH'].includes(req.method)) {
-                config.data = req.body;
+        upstream.setTimeout(this.proxyTimeout, () => {
+            const error = new Error(`Timeout de ${this.proxyTimeout}ms`);
+            error.code = 'ETIMEDOUT';
+            upstream.destroy(error);
+        });
+
+        upstream.on('response', (upstreamRes) => {
+            // Respostas 5xx contam como falha para o circuit breaker
+            if (upstreamRes.statusCode >= 500) {
+                this.recordFailure(serviceName);
+            } else {
+                this.resetCircuitBreaker(serviceName);
             }
 
-            // Adicionar query parameters
-            if (Object.keys(req.query).length > 0) {
-                config.params = req.query;
+            const responseHeaders = {};
+            for (const [name, value] of Object.entries(upstreamRes.headers)) {
+                if (!HOP_BY_HOP_HEADERS.includes(name)) {
+                    responseHeaders[name] = value;
+                }
             }
 
-            // Remover headers problemáticos
-            delete config.headers.host;
-            delete config.headers['content-length'];
+            upstreamRes.on('end', () => release(upstreamRes.statusCode < 500));
+            res.writeHead(upstreamRes.statusCode, responseHeaders);
+            upstreamRes.pipe(res);
+        });
 
-            console.log(`📤 Enviando ${req.method} para ${targetUrl}`);
+        // Cliente desconectou: o destroy abaixo gera ECONNRESET, que não é falha do serviço
+        let aborted = false;
 
-            // Fazer requisição
-            const response = await axios(config);
-            
-            // Resetar circuit breaker em caso de sucesso
-            this.resetCircuitBreaker(serviceName);
-            
-            console.log(`📥 Resposta recebida: ${response.status}`);
-            
-            // Retornar resposta
-            res.status(response.status).json(response.data);
+        upstream.on('error', (error) => {
+            if (aborted) {
+                return;
+            }
 
-        } catch (error) {
-            // Registrar falha
+            release(false);
             this.recordFailure(serviceName);
-            
-            console.error(`❌ Proxy error for ${serviceName}:`, {
-                message: error.message,
-                code: error.code,
-                url: error.config?.url,
-                status: error.response?.status
-            });
-            
-            if (error.code === 'ECONNREFUSED' || error.code === 'ETIMEDOUT') {
+            console.error(`Proxy error for ${serviceName}: ${error.code || ''} ${error.message} (${target.href})`);
+
+            if (res.headersSent) {
+                // Falha no meio da resposta: não há como enviar outro status
+                return res.destroy(error);
+            }
+
+            if (error.code === 'ECONNREFUSED' || error.code === 'ETIMEDOUT' || error.code === 'ECONNRESET') {
                 res.status(503).json({
                     success: false,
                     message: `Serviço ${serviceName} indisponível`,
                     service: serviceName,
                     error: error.code
                 });
-            } else if (error.response) {
-                // Encaminhar resposta de erro do serviço
-                console.log(`🔄 Encaminhando erro ${error.response.status} do serviço`);
-                res.status(error.response.status).json(error.response.data);
             } else {
                 res.status(500).json({
                     success: false,
@@ -325,8 +316,21 @@ class APIGateway {
                     error: error.message
                 });
             }
-        }
+        });
+
+        // Cliente desconectou antes do fim: cancelar a requisição ao serviço
+        res.on('close', () => {
+            if (res.writableFinished) {
+                return release();
+            }
+            aborted = true;
+            release(null);
+            upstream.destroy();
+        });
+
+        req.pipe(upstream);
     }
+
     // Circuit Breaker 
     isCircuitOpen(serviceName) {
         const breaker = this.circuitBreakers.get(serviceName);
@@ -369,10 +373,12 @@ class APIGateway {
     resetCircuitBreaker(serviceName) {
         const breaker = this.circuitBreakers.get(serviceName);
         if (breaker) {
+            if (breaker.failures > 0 || breaker.isOpen || breaker.isHalfOpen) {
+                console.log(`Circuit breaker reset for ${serviceName}`);
+            }
             breaker.failures = 0;
             breaker.isOpen = false;
             breaker.isHalfOpen = false;
-            console.log(`Circuit breaker reset for ${serviceName}`);
         }
     }
 
@@ -388,37 +394,47 @@ class APIGateway {
                 });
             }
 
-            // Buscar dados de múltiplos serviços
-            const [userResponse, productsResponse, categoriesResponse] = await Promise.allSettled([
-                this.callService('user-service', '/users', 'GET', authHeader, { limit: 5 }),
-                this.callService('product-service', '/products', 'GET', null, { limit: 5 }),
-                this.callService('product-service', '/categories', 'GET', null, {})
-            ]);
+            // Usuários dependem do token; produtos e categorias são compartilhados
+            let scope;
+            try {
+                scope = await this.userScope(authHeader);
+            } catch (error) {
+                return res.status(error.status).json({
+                    success: false,
+                    message: error.message
+                });
+            }
+
+            const { parts, partial } = await this.aggregator.run({
+                users: {
+                    key: `user:${scope}:users`,
+                    fetch: () => this.callService('user-service', '/users', 'GET', authHeader, { limit: 5 })
+                },
+                products: {
+                    key: 'products:limit=5',
+                    fetch: () => this.callService('item-service', '/products', 'GET', null, { limit: 5 })
+                },
+                categories: {
+                    key: 'categories',
+                    ttl: 60000,
+                    fetch: () => this.callService('item-service', '/categories', 'GET', null, {})
+                }
+            }, { budget: this.budgetFor(req) });
 
             const dashboard = {
                 timestamp: new Date().toISOString(),
                 architecture: 'Microservices with NoSQL',
                 database_approach: 'Database per Service',
                 services_status: serviceRegistry.listServices(),
+                partial,
                 data: {
-                    users: {
-                        available: userResponse.status === 'fulfilled',
-                        data: userResponse.status === 'fulfilled' ? userResponse.value.data : null,
-                        error: userResponse.status === 'rejected' ? userResponse.reason.message : null
-                    },
-                    products: {
-                        available: productsResponse.status === 'fulfilled',
-                        data: productsResponse.status === 'fulfilled' ? productsResponse.value.data : null,
-                        error: productsResponse.status === 'rejected' ? productsResponse.reason.message : null
-                    },
-                    categories: {
-                        available: categoriesResponse.status === 'fulfilled',
-                        data: categoriesResponse.status === 'fulfilled' ? categoriesResponse.value.data : null,
-                        error: categoriesResponse.status === 'rejected' ? categoriesResponse.reason.message : null
-                    }
+                    users: this.partResponse(parts.users, 'data'),
+                    products: this.partResponse(parts.products, 'data'),
+                    categories: this.partResponse(parts.categories, 'data')
                 }
             };
 
+            res.setHeader('X-Aggregate-Partial', String(partial));
             res.json({
                 success: true,
                 data: dashboard
@@ -447,37 +463,43 @@ class APIGateway {
 
             // Buscar em produtos e usuários (se autenticado)
             const authHeader = req.header('Authorization');
-            const searches = [
-                this.callService('product-service', '/search', 'GET', null, { q })
-            ];
+            const query = String(q).trim().toLowerCase();
+            const searches = {
+                products: {
+                    key: `search:products:${query}`,
+                    fetch: () => this.callService('item-service', '/search', 'GET', null, { q })
+                }
+            };
 
             // Adicionar busca de usuários se autenticado
+            let authError = null;
             if (authHeader) {
-                searches.push(
-                    this.callService('user-service', '/search', 'GET', authHeader, { q, limit: 5 })
-                );
+                try {
+                    searches.users = {
+                        key: `user:${await this.userScope(authHeader)}:search:${query}`,
+                        fetch: () => this.callService('user-service', '/search', 'GET', authHeader, { q, limit: 5 })
+                    };
+                } catch (error) {
+                    authError = error;
+                }
             }
 
-            const [productResults, userResults] = await Promise.allSettled(searches);
+            const { parts, partial } = await this.aggregator.run(searches, { budget: this.budgetFor(req) });
 
             const results = {
                 query: q,
-                products: {
-                    available: productResults.status === 'fulfilled',
-                    results: productResults.status === 'fulfilled' ? productResults.value.data.results : [],
-                    error: productResults.status === 'rejected' ? productResults.reason.message : null
-                }
+                partial,
+                products: this.partResponse(parts.products, 'results')
             };
 
             // Adicionar resultados de usuários se a busca foi feita
-            if (userResults) {
-                results.users = {
-                    available: userResults.status === 'fulfilled',
-                    results: userResults.status === 'fulfilled' ? userResults.value.data.results : [],
-                    error: userResults.status === 'rejected' ? userResults.reason.message : null
-                };
+            if (parts.users) {
+                results.users = this.partResponse(parts.users, 'results');
+            } else if (authError) {
+                results.users = { available: false, results: [], error: authError.message, cache: null };
             }
 
+            res.setHeader('X-Aggregate-Partial', String(partial));
             res.json({
                 success: true,
                 data: results
@@ -492,16 +514,69 @@ class APIGateway {
         }
     }
 
-    // Helper para chamar serviços
+    // Orçamento de latência: padrão do gateway ou ?budget=ms (limitado ao timeout dos serviços)
+    budgetFor(req) {
+        const requested = parseInt(req.query.budget);
+        return requested > 0 ? Math.min(requested, this.serviceTimeout) : this.aggregator.budget;
+    }
+
+    // Formato de cada seção: "data" no dashboard, "results" na busca
+    // Escopo de cache do usuário; lança erro com status (401/503) se o token não for válido agora,
+    // para que tokens expirados ou revogados não leiam dados de usuário guardados no cache
+    async userScope(authHeader) {
+        if (!authHeader?.startsWith('Bearer ')) {
+            throw Object.assign(new Error('Token inválido'), { status: 401 });
+        }
+
+        try {
+            await this.tokenVerifier.verify(authHeader.replace('Bearer ', ''));
+        } catch (error) {
+            if (error.status === 503) {
+                throw Object.assign(new Error('Serviço de autenticação indisponível'), { status: 503 });
+            }
+            throw Object.assign(new Error('Token inválido'), { status: 401 });
+        }
+        return Aggregator.scopeFor(authHeader);
+    }
+
+    partResponse(part, field) {
+        const response = { available: part.available };
+        if (field === 'results') {
+            response.results = part.available ? part.data.data.results : [];
+        } else {
+            response.data = part.available ? part.data.data : null;
+        }
+        response.error = part.error;
+        response.cache = part.cache;
+        if (part.timedOut) {
+            response.timedOut = true;
+        }
+        return response;
+    }
+
+    // Helper para chamar serviços (GET com hedging quando há mais de uma réplica)
     async callService(serviceName, path, method = 'GET', authHeader = null, params = {}) {
+        const request = { path, method, authHeader, params };
         const service = serviceRegistry.discover(serviceName);
-        
+
+        if (method !== 'GET' || !this.hedgeDelay) {
+            return this.callInstance(service, request);
+        }
+        return this.hedgedCall(serviceName, service, request);
+    }
+
+    async callInstance(service, { path, method, authHeader, params }, signal = null) {
         const config = {
             method,
             url: `${service.url}${path}`,
-            timeout: 5000
+            timeout: this.serviceTimeout,
+            httpAgent: this.agentFor(service.url)
         };
 
+        if (signal) {
+            config.signal = signal;
+        }
+
         if (authHeader) {
             config.headers = { Authorization: authHeader };
         }
@@ -510,8 +585,64 @@ class APIGateway {
             config.params = params;
         }
 
-        const response = await axios(config);
-        return response.data;
+        const release = serviceRegistry.track(service);
+        try {
+            const response = await axios(config);
+            release();
+            return response.data;
+        } catch (error) {
+            // Cancelada pelo hedging: a réplica não falhou, só perdeu a corrida
+            release(axios.isCancel(error) || Boolean(error.response && error.response.status < 500));
+            throw error;
+        }
+    }
+
+    // Envia a mesma requisição para outra réplica se a primeira demorar mais que
+    // hedgeDelay; a primeira resposta vence e a outra é cancelada
+    hedgedCall(serviceName, primary, request) {
+        return new Promise((resolve, reject) => {
+            const controllers = [];
+            let running = 0;
+            let settled = false;
+            let hedgeTimer;
+
+            const launch = (instance) => {
+                const controller = new AbortController();
+                controllers.push(controller);
+                running++;
+
+                this.callInstance(instance, request, controller.signal).then(data => {
+                    if (settled) return;
+                    settled = true;
+                    clearTimeout(hedgeTimer);
+                    if (instance !== primary) this.hedgeStats.hedgeWins++;
+                    controllers.forEach(other => other !== controller && other.abort());
+                    resolve(data);
+                }, error => {
+                    running--;
+                    // Outra tentativa ainda em andamento: aguardar por ela
+                    if (settled || running > 0) return;
+
+                    // Falha antes do hedge: não repete (hedging não é retry)
+                    clearTimeout(hedgeTimer);
+                    settled = true;
+                    reject(error);
+                });
+            };
+
+            launch(primary);
+
+            hedgeTimer = setTimeout(() => {
+                if (settled) return;
+
+                const replicas = serviceRegistry.getInstances(serviceName).filter(instance => instance.url !== primary.url);
+                if (replicas.length === 0) return;
+
+                const replica = serviceRegistry.pickLowest(replicas, serviceName, stats => stats.outstanding);
+                this.hedgeStats.hedged++;
+                launch(replica);
+            }, this.hedgeDelay);
+        });
     }
 
     // Health checks para serviços registrados
@@ -1,38 +1,50 @@
 const express = require('express');
-const jwt = require('jsonwebtoken');
 const { v4: uuidv4 } = require('uuid');
 const JsonDatabase = require('../../shared/JsonDatabase');
 const serviceRegistry = require('../../shared/serviceRegistry');
+const { TokenVerifier } = require('../../shared/auth');
 const bodyParser = require('body-parser');
 const cors = require('cors');
 
-const PORT = 3002;
+const PORT = process.env.PORT || 3002;
 const SERVICE_NAME = 'list-service';
 const DB_DIR = './database';
 const COLLECTION = 'lists';
+// Operações por requisição em POST /lists/:id/items/batch
+const BATCH_MAX_ITEMS = parseInt(process.env.LIST_BATCH_MAX_ITEMS) || 1000;
 
 const app = express();
 app.use(cors());
-app.use(bodyParser.json());
+app.use(bodyParser.json({ limit: '5mb' })); // lotes de itens
 
 // Banco de dados
-const db = new JsonDatabase(DB_DIR, COLLECTION);
-
-// Middleware de autenticação JWT
-function authenticateJWT(req, res, next) {
-    const authHeader = req.headers.authorization;
-    if (authHeader) {
-        const token = authHeader.split(' ')[1];
-        jwt.verify(token, process.env.JWT_SECRET || 'segredo', (err, user) => {
-            if (err) {
-                return res.sendStatus(403);
-            }
-            req.user = user;
-            next();
-        });
-    } else {
-        res.sendStatus(401);
-    }
+const db = new JsonDatabase(DB_DIR, COLLECTION, { indexes: ['userId'] });
+
+// Autenticação JWT verificada localmente com as chaves do user-service
+const tokenVerifier = new TokenVerifier();
+const authenticateJWT = tokenVerifier.middleware();
+
+// Revogações de tokens enviadas pelo user-service
+app.post('/auth/revocations', tokenVerifier.revocationHandler());
+
+// Totais da lista recalculados a partir dos itens
+function updateSummary(list) {
+    list.summary.totalItems = list.items.length;
+    list.summary.purchasedItems = list.items.filter(i => i.purchased).length;
+    list.summary.estimatedTotal = list.items.reduce((sum, i) => sum + (i.estimatedPrice || 0), 0);
+}
+
+function newItem({ itemId, itemName, quantity, unit, estimatedPrice, notes }) {
+    return {
+        itemId,
+        itemName,
+        quantity,
+        unit,
+        estimatedPrice,
+        purchased: false,
+        notes: notes || '',
+        addedAt: new Date().toISOString()
+    };
 }
 
 // Registro no Service Registry
@@ -131,21 +143,9 @@ app.post('/lists/:id/items', authenticateJWT, async (req, res) => {
             return res.sendStatus(404);
         }
         
-        const { itemId, itemName, quantity, unit, estimatedPrice, notes } = req.body;
-        const item = {
-            itemId,
-            itemName,
-            quantity,
-            unit,
-            estimatedPrice,
-            purchased: false,
-            notes: notes || '',
-            addedAt: new Date().toISOString()
-        };
-        
+        const item = newItem(req.body);
         list.items.push(item);
-        list.summary.totalItems = list.items.length;
-        list.summary.estimatedTotal = list.items.reduce((sum, i) => sum + (i.estimatedPrice || 0), 0);
+        updateSummary(list);
         
         await db.update(list.id, list);
         res.status(201).json(item);
@@ -155,6 +155,85 @@ app.post('/lists/:id/items', authenticateJWT, async (req, res) => {
     }
 });
 
+// Operações em lote nos itens: { operations: [{ op: 'add'|'update'|'remove', itemId, ... }] }
+// ou { items: [...] } para só adicionar. Tudo é aplicado sobre a lista atual e
+// gravado uma única vez; cada operação tem seu próprio resultado (200, 207 ou 400)
+app.post('/lists/:id/items/batch', authenticateJWT, async (req, res) => {
+    try {
+        const operations = Array.isArray(req.body.operations)
+            ? req.body.operations
+            : Array.isArray(req.body.items) ? req.body.items.map(item => ({ ...item, op: 'add' })) : null;
+        
+        if (!operations || operations.length === 0 || operations.length > BATCH_MAX_ITEMS) {
+            return res.status(400).json({ error: `Envie "operations" ou "items" com 1 a ${BATCH_MAX_ITEMS} itens` });
+        }
+        
+        const userId = req.user.id;
+        let results = null;
+        
+        const updated = await db.modify(req.params.id, list => {
+            if (list.userId !== userId) {
+                return null;
+            }
+            
+            const positions = new Map(list.items.map((item, i) => [item.itemId, i]));
+            results = operations.map(({ op, ...data }, index) => {
+                if (!data.itemId) {
+                    return { index, op, success: false, error: 'itemId é obrigatório' };
+                }
+                
+                const position = positions.get(data.itemId);
+                if (op === 'add') {
+                    if (position !== undefined) {
+                        return { index, op, success: false, error: 'Item já está na lista' };
+                    }
+                    const item = newItem(data);
+                    positions.set(item.itemId, list.items.push(item) - 1);
+                    return { index, op, success: true, item: { ...item } };
+                }
+                if (op === 'update' || op === 'remove') {
+                    if (position === undefined || !list.items[position]) {
+                        return { index, op, success: false, error: 'Item não encontrado' };
+                    }
+                    if (op === 'remove') {
+                        // Removidos ficam como lacuna até o fim do lote para manter as posições
+                        list.items[position] = null;
+                        positions.delete(data.itemId);
+                        return { index, op, success: true };
+                    }
+                    // Cópia: operações seguintes do lote não alteram o resultado desta
+                    Object.assign(list.items[position], data);
+                    return { index, op, success: true, item: { ...list.items[position] } };
+                }
+                return { index, op, success: false, error: 'Operação inválida (add, update ou remove)' };
+            });
+            
+            if (!results.some(result => result.success)) {
+                return null;
+            }
+            list.items = list.items.filter(Boolean);
+            updateSummary(list);
+            return list;
+        });
+        
+        if (!results) {
+            return res.sendStatus(404);
+        }
+        
+        const succeeded = results.filter(result => result.success).length;
+        const status = succeeded === results.length ? 200 : (succeeded > 0 ? 207 : 400);
+        res.status(status).json({
+            succeeded,
+            failed: results.length - succeeded,
+            results,
+            summary: updated ? updated.summary : null
+        });
+    } catch (error) {
+        console.error('Erro ao aplicar lote de itens:', error);
+        res.status(500).json({ error: 'Erro interno do servidor' });
+    }
+});
+
 // Atualizar item na lista
 app.put('/lists/:id/items/:itemId', authenticateJWT, async (req, res) => {
     try {
@@ -170,8 +249,7 @@ app.put('/lists/:id/items/:itemId', authenticateJWT, async (req, res) => {
         }
         
         Object.assign(item, req.body);
-        list.summary.purchasedItems = list.items.filter(i => i.purchased).length;
-        list.summary.estimatedTotal = list.items.reduce((sum, i) => sum + (i.estimatedPrice || 0), 0);
+        updateSummary(list);
         
         await db.update(list.id, list);
         res.json(item);
@@ -191,9 +269,7 @@ app.delete('/lists/:id/items/:itemId', authenticateJWT, async (req, res) => {
         }
         
         list.items = list.items.filter(i => i.itemId !== req.params.itemId);
-        list.summary.totalItems = list.items.length;
-        list.summary.purchasedItems = list.items.filter(i => i.purchased).length;
-        list.summary.estimatedTotal = list.items.reduce((sum, i) => sum + (i.estimatedPrice || 0), 0);
+        updateSummary(list);
         
         await db.update(list.id, list);
         res.sendStatus(204);
@@ -225,4 +301,12 @@ app.get('/health', (req, res) => {
 
 app.listen(PORT, () => {
     console.log(`${SERVICE_NAME} running on port ${PORT}`);
+});
+
+// Graceful shutdown
+process.on('SIGTERM', () => {
+    serviceRegistry.unregister(SERVICE_NAME).finally(() => process.exit(0));
+});
+process.on('SIGINT', () => {
+    serviceRegistry.unregister(SERVICE_NAME).finally(() => process.exit(0));
 });
\ No newline at end of file
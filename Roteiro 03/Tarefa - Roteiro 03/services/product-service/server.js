@@ -4,11 +4,11 @@ const helmet = require('helmet');
 const morgan = require('morgan');
 const { v4: uuidv4 } = require('uuid');
 const path = require('path');
-const axios = require('axios');
 
 // Importar banco NoSQL e service registry
 const JsonDatabase = require('../../shared/JsonDatabase');
 const serviceRegistry = require('../../shared/serviceRegistry');
+const { TokenVerifier } = require('../../shared/auth');
 
 class ItemService {
     constructor() {
@@ -18,6 +18,7 @@ class ItemService {
         this.serviceUrl = `http://127.0.0.1:${this.port}`;
         
         this.setupDatabase();
+        this.setupAuth();
         this.setupMiddleware();
         this.setupRoutes();
         this.setupErrorHandling();
@@ -25,10 +26,15 @@ class ItemService {
 
     setupDatabase() {
         const dbPath = path.join(__dirname, 'database');
-        this.itemsDb = new JsonDatabase(dbPath, 'items');
+        this.itemsDb = new JsonDatabase(dbPath, 'items', { indexes: ['category.slug'] });
         console.log('Item Service: Banco NoSQL inicializado');
     }
 
+    setupAuth() {
+        this.tokenVerifier = new TokenVerifier();
+        this.verifyToken = this.tokenVerifier.middleware();
+    }
+
     setupMiddleware() {
         this.app.use(helmet());
         this.app.use(cors());
@@ -93,6 +99,9 @@ class ItemService {
             });
         });
 
+        // Revogações de tokens enviadas pelo User Service
+        this.app.post('/auth/revocations', this.tokenVerifier.revocationHandler());
+
         // Item routes
         this.app.get('/items', this.getItems.bind(this));
         this.app.get('/items/:id', this.getItem.bind(this));
@@ -134,42 +143,9 @@ class ItemService {
         });
     }
 
-    // Auth middleware (valida token com User Service)
-    async authMiddleware(req, res, next) {
-        const authHeader = req.header('Authorization');
-        
-        if (!authHeader?.startsWith('Bearer ')) {
-            return res.status(401).json({
-                success: false,
-                message: 'Token obrigatório'
-            });
-        }
-
-        try {
-            // Descobrir User Service
-            const userService = serviceRegistry.discover('user-service');
-            
-            // Validar token com User Service
-            const response = await axios.post(`${userService.url}/auth/validate`, {
-                token: authHeader.replace('Bearer ', '')
-            }, { timeout: 5000 });
-
-            if (response.data.success) {
-                req.user = response.data.data.user;
-                next();
-            } else {
-                res.status(401).json({
-                    success: false,
-                    message: 'Token inválido'
-                });
-            }
-        } catch (error) {
-            console.error('Erro na validação do token:', error.message);
-            res.status(503).json({
-                success: false,
-                message: 'Serviço de autenticação indisponível'
-            });
-        }
+    // Auth middleware (JWT verificado localmente com as chaves do User Service)
+    authMiddleware(req, res, next) {
+        return this.verifyToken(req, res, next);
     }
 
     // Get products (com filtros e paginação)
@@ -620,12 +596,10 @@ if (require.main === module) {
 
     // Graceful shutdown
     process.on('SIGTERM', () => {
-        serviceRegistry.unregister('item-service');
-        process.exit(0);
+        serviceRegistry.unregister('item-service').finally(() => process.exit(0));
     });
     process.on('SIGINT', () => {
-        serviceRegistry.unregister('item-service');
-        process.exit(0);
+        serviceRegistry.unregister('item-service').finally(() => process.exit(0));
     });
 }
 
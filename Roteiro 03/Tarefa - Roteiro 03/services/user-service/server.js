@@ -3,13 +3,13 @@ const cors = require('cors');
 const helmet = require('helmet');
 const morgan = require('morgan');
 const bcrypt = require('bcryptjs');
-const jwt = require('jsonwebtoken');
 const { v4: uuidv4 } = require('uuid');
 const path = require('path');
 
 // Importar banco NoSQL e service registry
 const JsonDatabase = require('../../shared/JsonDatabase');
 const serviceRegistry = require('../../shared/serviceRegistry');
+const { TokenIssuer } = require('../../shared/auth');
 
 class UserService {
     constructor() {
@@ -19,18 +19,35 @@ class UserService {
         this.serviceUrl = `http://localhost:${this.port}`;
         
         this.setupDatabase();
+        this.setupAuth();
         this.setupMiddleware();
         this.setupRoutes();
         this.setupErrorHandling();
         this.seedInitialData();
+        this.loadRevocations().catch(error => console.error('Erro ao carregar revogações:', error));
     }
 
     setupDatabase() {
         const dbPath = path.join(__dirname, 'database');
-        this.usersDb = new JsonDatabase(dbPath, 'users');
+        this.usersDb = new JsonDatabase(dbPath, 'users', { indexes: ['email', 'username'] });
         console.log('User Service: Banco NoSQL inicializado');
     }
 
+    // Tokens RS256: a chave pública é distribuída em /auth/keys para validação local nos outros serviços
+    setupAuth() {
+        this.tokenIssuer = new TokenIssuer({
+            keyFile: path.join(__dirname, 'database', 'jwt-keys.json'),
+            serviceName: this.serviceName
+        });
+        this.verifyToken = this.tokenIssuer.verifier.middleware();
+    }
+
+    // Restaurar revogações ainda válidas após reinício
+    async loadRevocations() {
+        const users = await this.usersDb.find({ tokensRevokedAt: { $gt: Date.now() - 24 * 60 * 60 * 1000 } });
+        users.forEach(user => this.tokenIssuer.revocations.set(user.id, user.tokensRevokedAt));
+    }
+
     async seedInitialData() {
         // Aguardar inicialização e criar usuário admin se não existir
         setTimeout(async () => {
@@ -111,6 +128,9 @@ class UserService {
                     'POST /auth/register',
                     'POST /auth/login', 
                     'POST /auth/validate',
+                    'POST /auth/revoke',
+                    'GET /auth/keys',
+                    'GET /auth/revocations',
                     'GET /users',
                     'GET /users/:id',
                     'PUT /users/:id',
@@ -123,6 +143,9 @@ class UserService {
         this.app.post('/auth/register', this.register.bind(this));
         this.app.post('/auth/login', this.login.bind(this));
         this.app.post('/auth/validate', this.validateToken.bind(this));
+        this.app.post('/auth/revoke', this.authMiddleware.bind(this), this.revokeTokens.bind(this));
+        this.app.get('/auth/keys', this.tokenIssuer.keysHandler());
+        this.app.get('/auth/revocations', this.tokenIssuer.revocationsHandler());
 
         // User routes (protected)
         this.app.get('/users', this.authMiddleware.bind(this), this.getUsers.bind(this));
@@ -152,29 +175,9 @@ class UserService {
         });
     }
 
-    // Auth middleware
+    // Auth middleware (verificação local do JWT, com cache e revogações)
     authMiddleware(req, res, next) {
-        const authHeader = req.header('Authorization');
-        
-        if (!authHeader?.startsWith('Bearer ')) {
-            return res.status(401).json({
-                success: false,
-                message: 'Token obrigatório'
-            });
-        }
-
-        const token = authHeader.replace('Bearer ', '');
-        
-        try {
-            const decoded = jwt.verify(token, process.env.JWT_SECRET || 'user-secret');
-            req.user = decoded;
-            next();
-        } catch (error) {
-            res.status(401).json({
-                success: false,
-                message: 'Token inválido'
-            });
-        }
+        return this.verifyToken(req, res, next);
     }
 
     // Register user
@@ -238,16 +241,14 @@ class UserService {
 
             const { password: _, ...userWithoutPassword } = newUser;
 
-            const token = jwt.sign(
-                { 
-                    id: newUser.id, 
-                    email: newUser.email, 
-                    username: newUser.username,
-                    role: newUser.role 
-                },
-                process.env.JWT_SECRET || 'user-secret',
-                { expiresIn: '24h' }
-            );
+            const token = this.tokenIssuer.sign({ 
+                id: newUser.id, 
+                email: newUser.email, 
+                username: newUser.username,
+                role: newUser.role,
+                firstName: newUser.firstName,
+                lastName: newUser.lastName
+            });
 
             res.status(201).json({
                 success: true,
@@ -305,16 +306,14 @@ class UserService {
 
             const { password: _, ...userWithoutPassword } = user;
             
-            const token = jwt.sign(
-                { 
-                    id: user.id, 
-                    email: user.email, 
-                    username: user.username,
-                    role: user.role 
-                },
-                process.env.JWT_SECRET || 'user-secret',
-                { expiresIn: '24h' }
-            );
+            const token = this.tokenIssuer.sign({ 
+                id: user.id, 
+                email: user.email, 
+                username: user.username,
+                role: user.role,
+                firstName: user.firstName,
+                lastName: user.lastName
+            });
 
             res.json({
                 success: true,
@@ -342,7 +341,7 @@ class UserService {
                 });
             }
 
-            const decoded = jwt.verify(token, process.env.JWT_SECRET || 'user-secret');
+            const decoded = await this.tokenIssuer.verify(token);
             const user = await this.usersDb.findById(decoded.id);
 
             if (!user || user.status !== 'active') {
@@ -367,6 +366,43 @@ class UserService {
         }
     }
 
+    // Revogar todos os tokens de um usuário (logout de todas as sessões)
+    async revokeTokens(req, res) {
+        try {
+            const userId = req.body.userId || req.user.id;
+
+            if (req.user.id !== userId && req.user.role !== 'admin') {
+                return res.status(403).json({
+                    success: false,
+                    message: 'Acesso negado'
+                });
+            }
+
+            const user = await this.usersDb.findById(userId);
+            if (!user) {
+                return res.status(404).json({
+                    success: false,
+                    message: 'Usuário não encontrado'
+                });
+            }
+
+            const revokedAt = this.tokenIssuer.revokeUser(userId);
+            await this.usersDb.update(userId, { tokensRevokedAt: revokedAt });
+
+            res.json({
+                success: true,
+                message: 'Tokens revogados com sucesso',
+                data: { userId, revokedAt: new Date(revokedAt).toISOString() }
+            });
+        } catch (error) {
+            console.error('Erro ao revogar tokens:', error);
+            res.status(500).json({
+                success: false,
+                message: 'Erro interno do servidor'
+            });
+        }
+    }
+
     // Get users (com paginação)
     async getUsers(req, res) {
         try {
@@ -573,12 +609,10 @@ if (require.main === module) {
 
     // Graceful shutdown
     process.on('SIGTERM', () => {
-        serviceRegistry.unregister('user-service');
-        process.exit(0);
+        serviceRegistry.unregister('user-service').finally(() => process.exit(0));
     });
     process.on('SIGINT', () => {
-        serviceRegistry.unregister('user-service');
-        process.exit(0);
+        serviceRegistry.unregister('user-service').finally(() => process.exit(0));
     });
 }
 
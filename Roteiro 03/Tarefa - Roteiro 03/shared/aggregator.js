@@ -0,0 +1,201 @@
+// shared/aggregator.js - Agregação de chamadas a vários serviços no gateway
+//
+// Cada parte de uma resposta agregada (ex: produtos e categorias do dashboard)
+// é buscada e guardada separadamente, com chave por consulta e, quando depende
+// do usuário, por token. Assim partes públicas são compartilhadas entre todos
+// os usuários e só as partes ausentes do cache vão aos serviços.
+//
+// - stale-while-revalidate: entre o ttl e o staleTtl a parte é devolvida na
+//   hora e atualizada em segundo plano; também é usada se a atualização falhar
+// - orçamento de latência: a resposta sai no prazo com as partes que ficaram
+//   prontas; as buscas atrasadas continuam e aquecem o cache para a próxima
+// - buscas simultâneas da mesma chave são compartilhadas (single-flight)
+const crypto = require('crypto');
+
+const DEFAULT_TTL = parseInt(process.env.GATEWAY_AGGREGATE_TTL) || 5000;
+const DEFAULT_STALE_TTL = parseInt(process.env.GATEWAY_AGGREGATE_STALE_TTL) || 60000;
+const DEFAULT_BUDGET = parseInt(process.env.GATEWAY_AGGREGATE_BUDGET) || 800;
+const DEFAULT_MAX_ENTRIES = parseInt(process.env.GATEWAY_AGGREGATE_CACHE_SIZE) || 1000;
+
+// Cache LRU com dois prazos por entrada: fresco até freshUntil, utilizável até staleUntil
+class AggregateCache {
+    constructor(maxEntries = DEFAULT_MAX_ENTRIES) {
+        this.maxEntries = maxEntries;
+        this.entries = new Map(); // chave -> { value, freshUntil, staleUntil }
+        this.hits = 0;
+        this.stale = 0;
+        this.misses = 0;
+    }
+
+    // Entrada ainda utilizável (fresca ou velha), sem contar estatísticas
+    peek(key, now = Date.now()) {
+        const entry = this.entries.get(key);
+        if (!entry) return null;
+
+        if (entry.staleUntil <= now) {
+            this.entries.delete(key);
+            return null;
+        }
+
+        // Renovar a posição no LRU
+        this.entries.delete(key);
+        this.entries.set(key, entry);
+        return entry;
+    }
+
+    set(key, value, ttl = DEFAULT_TTL, staleTtl = DEFAULT_STALE_TTL) {
+        this.entries.delete(key);
+        if (this.entries.size >= this.maxEntries) {
+            this.entries.delete(this.entries.keys().next().value);
+        }
+
+        const now = Date.now();
+        this.entries.set(key, { value, freshUntil: now + ttl, staleUntil: now + ttl + staleTtl });
+    }
+
+    delete(key) {
+        this.entries.delete(key);
+    }
+
+    clear() {
+        this.entries.clear();
+    }
+
+    getStats() {
+        const total = this.hits + this.stale + this.misses;
+        return {
+            size: this.entries.size,
+            maxEntries: this.maxEntries,
+            hits: this.hits,
+            stale: this.stale,
+            misses: this.misses,
+            hitRate: total > 0 ? (((this.hits + this.stale) / total) * 100).toFixed(2) + '%' : '0%'
+        };
+    }
+}
+
+class Aggregator {
+    constructor(options = {}) {
+        this.cache = options.cache || new AggregateCache(options.maxEntries);
+        this.budget = options.budget || DEFAULT_BUDGET;
+        this.ttl = options.ttl || DEFAULT_TTL;
+        this.staleTtl = options.staleTtl || DEFAULT_STALE_TTL;
+        this.inflight = new Map(); // chave -> Promise da busca em andamento
+
+        this.stats = { requests: 0, partial: 0, timedOutParts: 0, refreshes: 0, refreshErrors: 0 };
+    }
+
+    // Escopo de cache por usuário sem guardar o token em claro
+    static scopeFor(authHeader) {
+        if (!authHeader) return 'anon';
+        return crypto.createHash('sha256').update(authHeader).digest('base64url').slice(0, 22);
+    }
+
+    /**
+     * Buscar as partes de uma resposta agregada dentro do orçamento de latência
+     *
+     * @param {Object} parts - nome -> { key, fetch: () => Promise, ttl?, staleTtl? }
+     * @param {Object} options - { budget } em ms
+     * @returns {Promise<{ parts, partial, elapsed }>} parts: nome -> { available, data, error, cache, timedOut }
+     */
+    async run(parts, options = {}) {
+        const budget = options.budget || this.budget;
+        const start = Date.now();
+        this.stats.requests++;
+
+        const names = Object.keys(parts);
+        const results = {};
+        const pending = [];
+
+        for (const name of names) {
+            const part = parts[name];
+            const entry = this.cache.peek(part.key);
+
+            if (entry && entry.freshUntil > start) {
+                this.cache.hits++;
+                results[name] = { available: true, data: entry.value, error: null, cache: 'HIT' };
+            } else if (entry) {
+                this.cache.stale++;
+                results[name] = { available: true, data: entry.value, error: null, cache: 'STALE' };
+                this.refresh(part).catch(() => {});
+            } else {
+                this.cache.misses++;
+                pending.push(this.load(part).then(
+                    data => { results[name] = { available: true, data, error: null, cache: 'MISS' }; },
+                    error => { results[name] = { available: false, data: null, error: error.message, cache: 'MISS' }; }
+                ));
+            }
+        }
+
+        if (pending.length > 0) {
+            let timer;
+            const deadline = new Promise(resolve => { timer = setTimeout(resolve, Math.max(budget - (Date.now() - start), 0)); });
+            await Promise.race([Promise.all(pending), deadline]);
+            clearTimeout(timer);
+        }
+
+        let partial = false;
+        for (const name of names) {
+            if (!results[name]) {
+                // Prazo esgotado: a busca continua e o resultado fica no cache
+                this.stats.timedOutParts++;
+                results[name] = { available: false, data: null, error: `Prazo de ${budget}ms esgotado`, cache: 'MISS', timedOut: true };
+            }
+            if (!results[name].available) {
+                partial = true;
+            }
+        }
+        if (partial) {
+            this.stats.partial++;
+        }
+
+        return { parts: results, partial, elapsed: Date.now() - start };
+    }
+
+    // Buscar e guardar; chamadas simultâneas da mesma chave aguardam a mesma busca
+    load(part) {
+        let promise = this.inflight.get(part.key);
+        if (promise) return promise;
+
+        promise = Promise.resolve()
+            .then(() => part.fetch())
+            .then(data => {
+                this.cache.set(part.key, data, part.ttl || this.ttl, part.staleTtl || this.staleTtl);
+                return data;
+            })
+            .finally(() => this.inflight.delete(part.key));
+
+        this.inflight.set(part.key, promise);
+        return promise;
+    }
+
+    refresh(part) {
+        if (this.inflight.has(part.key)) {
+            return this.inflight.get(part.key);
+        }
+
+        this.stats.refreshes++;
+        return this.load(part).catch(error => {
+            this.stats.refreshErrors++;
+            // Erro do cliente (ex: 401 de token revogado): a versão antiga não deve mais ser servida
+            const status = error.response && error.response.status;
+            if (status >= 400 && status < 500) {
+                this.cache.delete(part.key);
+            }
+            throw error;
+        });
+    }
+
+    getStats() {
+        return {
+            budget: this.budget,
+            ttl: this.ttl,
+            staleTtl: this.staleTtl,
+            inflight: this.inflight.size,
+            ...this.stats,
+            cache: this.cache.getStats()
+        };
+    }
+}
+
+module.exports = { Aggregator, AggregateCache };
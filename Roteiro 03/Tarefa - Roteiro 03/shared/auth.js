@@ -0,0 +1,397 @@
+// shared/auth.js - Autenticação JWT verificada localmente em cada serviço
+//
+// O user-service assina os tokens com RS256 (TokenIssuer) e publica as chaves
+// públicas em GET /auth/keys. Os demais serviços (TokenVerifier) buscam as
+// chaves uma vez e validam os tokens sem chamar o user-service a cada
+// requisição. Revogações (logout de todas as sessões) são enviadas pelo
+// user-service para os serviços registrados em POST /auth/revocations, como
+// um JWT assinado pela mesma chave, e também consultadas periodicamente.
+const crypto = require('crypto');
+const fs = require('fs');
+const path = require('path');
+const axios = require('axios');
+const jwt = require('jsonwebtoken');
+const serviceRegistry = require('./serviceRegistry');
+
+const ALGORITHM = 'RS256';
+const REVOCATION_TTL = 24 * 60 * 60 * 1000; // igual à validade máxima dos tokens
+
+// Audiências separadas: uma notificação de revogação (mesma chave) não vale como token de acesso
+const ACCESS_AUDIENCE = 'access';
+const NOTICE_AUDIENCE = 'revocation-notice';
+
+// Emissão em ms: o iat do JWT é em segundos e não distingue um token emitido
+// logo depois de uma revogação (novo login) de um emitido no mesmo segundo antes dela
+function issuedAtMs(claims) {
+    return claims.iatMs !== undefined ? claims.iatMs : claims.iat * 1000;
+}
+
+// Cache LRU das validações recentes, com expiração no exp do token
+class ValidationCache {
+    constructor(maxSize = 10000) {
+        this.maxSize = maxSize;
+        this.entries = new Map(); // token -> { claims, expiresAt }
+        this.byUser = new Map(); // userId -> Set(token)
+        this.hits = 0;
+        this.misses = 0;
+    }
+
+    get(token) {
+        const entry = this.entries.get(token);
+        if (!entry) {
+            this.misses++;
+            return null;
+        }
+
+        if (entry.expiresAt <= Date.now()) {
+            this.delete(token);
+            this.misses++;
+            return null;
+        }
+
+        // Renovar a posição no LRU
+        this.entries.delete(token);
+        this.entries.set(token, entry);
+        this.hits++;
+        return entry.claims;
+    }
+
+    set(token, claims) {
+        if (this.entries.has(token)) {
+            this.delete(token);
+        }
+        if (this.entries.size >= this.maxSize) {
+            this.delete(this.entries.keys().next().value);
+        }
+
+        const expiresAt = claims.exp ? claims.exp * 1000 : Date.now() + REVOCATION_TTL;
+        this.entries.set(token, { claims, expiresAt });
+
+        if (!this.byUser.has(claims.id)) {
+            this.byUser.set(claims.id, new Set());
+        }
+        this.byUser.get(claims.id).add(token);
+    }
+
+    delete(token) {
+        const entry = this.entries.get(token);
+        if (!entry) return;
+
+        this.entries.delete(token);
+        const tokens = this.byUser.get(entry.claims.id);
+        if (tokens) {
+            tokens.delete(token);
+            if (tokens.size === 0) {
+                this.byUser.delete(entry.claims.id);
+            }
+        }
+    }
+
+    deleteUser(userId) {
+        const tokens = this.byUser.get(userId);
+        if (tokens) {
+            tokens.forEach(token => this.entries.delete(token));
+            this.byUser.delete(userId);
+        }
+    }
+
+    getStats() {
+        const total = this.hits + this.misses;
+        return {
+            size: this.entries.size,
+            maxSize: this.maxSize,
+            hits: this.hits,
+            misses: this.misses,
+            hitRate: total > 0 ? ((this.hits / total) * 100).toFixed(2) + '%' : '0%'
+        };
+    }
+}
+
+class TokenVerifier {
+    constructor(options = {}) {
+        this.issuer = options.issuer || null; // TokenIssuer local (no próprio user-service)
+        this.issuerService = options.issuerService || 'user-service';
+        this.cache = new ValidationCache(options.cacheSize);
+        this.keys = new Map(); // kid -> chave pública PEM
+        this.revocations = new Map(); // userId -> revogadoEm (ms)
+        this.lastRevocationSync = 0;
+        this.keysRequest = null;
+
+        if (!this.issuer) {
+            const timer = setInterval(
+                () => this.syncRevocations().catch(() => {}),
+                options.revocationPollInterval || 30000
+            );
+            timer.unref();
+        }
+    }
+
+    issuerUrl() {
+        return serviceRegistry.discover(this.issuerService).url;
+    }
+
+    // Busca as chaves públicas no user-service (uma requisição por vez)
+    refreshKeys() {
+        if (this.issuer) {
+            this.issuer.publicKeys().forEach(({ kid, publicKey }) => this.keys.set(kid, publicKey));
+            return Promise.resolve();
+        }
+
+        if (!this.keysRequest) {
+            this.keysRequest = axios.get(`${this.issuerUrl()}/auth/keys`, { timeout: 5000 })
+                .then(response => {
+                    response.data.keys.forEach(({ kid, publicKey }) => this.keys.set(kid, publicKey));
+                })
+                .finally(() => {
+                    this.keysRequest = null;
+                });
+        }
+        return this.keysRequest;
+    }
+
+    // Complemento do push: recupera revogações perdidas enquanto o serviço estava fora
+    async syncRevocations() {
+        const since = this.lastRevocationSync;
+        const response = await axios.get(`${this.issuerUrl()}/auth/revocations`, {
+            params: { since },
+            timeout: 5000
+        });
+        response.data.revocations.forEach(({ userId, revokedAt }) => this.revoke(userId, revokedAt));
+        this.lastRevocationSync = response.data.now;
+    }
+
+    revoke(userId, revokedAt) {
+        if ((this.revocations.get(userId) || 0) < revokedAt) {
+            this.revocations.set(userId, revokedAt);
+        }
+        this.cache.deleteUser(userId);
+    }
+
+    isRevoked(claims) {
+        const revokedAt = this.issuer ? this.issuer.revokedAt(claims.id) : this.revocations.get(claims.id);
+        return revokedAt !== undefined && issuedAtMs(claims) <= revokedAt;
+    }
+
+    // Retorna as claims do token ou lança erro. { status: 503 } quando as chaves não estão disponíveis.
+    async verify(token) {
+        const cached = this.cache.get(token);
+        if (cached) {
+            return cached;
+        }
+
+        const decoded = jwt.decode(token, { complete: true });
+        if (!decoded || !decoded.header.kid) {
+            throw new Error('Token inválido');
+        }
+
+        if (!this.keys.has(decoded.header.kid)) {
+            try {
+                await this.refreshKeys();
+            } catch (error) {
+                error.status = 503;
+                throw error;
+            }
+        }
+
+        const publicKey = this.keys.get(decoded.header.kid);
+        if (!publicKey) {
+            throw new Error('Chave de assinatura desconhecida');
+        }
+
+        const claims = jwt.verify(token, publicKey, { algorithms: [ALGORITHM], audience: ACCESS_AUDIENCE });
+        if (!claims.id) {
+            throw new Error('Token sem usuário');
+        }
+        if (this.isRevoked(claims)) {
+            throw new Error('Token revogado');
+        }
+
+        this.cache.set(token, claims);
+        return claims;
+    }
+
+    // Middleware Express: req.user recebe as claims do token
+    middleware() {
+        return async (req, res, next) => {
+            const authHeader = req.header('Authorization');
+
+            if (!authHeader?.startsWith('Bearer ')) {
+                return res.status(401).json({
+                    success: false,
+                    message: 'Token obrigatório'
+                });
+            }
+
+            try {
+                req.user = await this.verify(authHeader.replace('Bearer ', ''));
+                next();
+            } catch (error) {
+                if (error.status === 503) {
+                    console.error('Erro ao obter chaves de autenticação:', error.message);
+                    return res.status(503).json({
+                        success: false,
+                        message: 'Serviço de autenticação indisponível'
+                    });
+                }
+                res.status(401).json({
+                    success: false,
+                    message: 'Token inválido'
+                });
+            }
+        };
+    }
+
+    // Handler de POST /auth/revocations (push do user-service)
+    revocationHandler() {
+        return async (req, res) => {
+            try {
+                const payload = await this.verifyRevocationNotice(req.body.notice);
+                payload.revocations.forEach(({ userId, revokedAt }) => this.revoke(userId, revokedAt));
+                res.json({ success: true, received: payload.revocations.length });
+            } catch (error) {
+                res.status(400).json({
+                    success: false,
+                    message: 'Notificação de revogação inválida'
+                });
+            }
+        };
+    }
+
+    async verifyRevocationNotice(notice) {
+        const decoded = jwt.decode(notice, { complete: true });
+        if (!decoded || !decoded.header.kid) {
+            throw new Error('Notificação inválida');
+        }
+        if (!this.keys.has(decoded.header.kid)) {
+            await this.refreshKeys();
+        }
+        const payload = jwt.verify(notice, this.keys.get(decoded.header.kid), {
+            algorithms: [ALGORITHM],
+            audience: NOTICE_AUDIENCE
+        });
+        if (payload.type !== 'revocation') {
+            throw new Error('Notificação inválida');
+        }
+        return payload;
+    }
+
+    getStats() {
+        return {
+            ...this.cache.getStats(),
+            keys: this.keys.size,
+            revocations: this.issuer ? this.issuer.revocations.size : this.revocations.size
+        };
+    }
+}
+
+class TokenIssuer {
+    constructor(options = {}) {
+        this.keyFile = options.keyFile;
+        this.serviceName = options.serviceName || 'user-service';
+        this.expiresIn = options.expiresIn || '24h';
+        this.revocations = new Map(); // userId -> revogadoEm (ms)
+        this.loadKeys();
+        this.verifier = new TokenVerifier({ issuer: this, cacheSize: options.cacheSize });
+    }
+
+    // Par de chaves RSA persistido no diretório do serviço (gerado na primeira execução)
+    loadKeys() {
+        let keys = null;
+        if (this.keyFile && fs.existsSync(this.keyFile)) {
+            keys = JSON.parse(fs.readFileSync(this.keyFile, 'utf8'));
+        } else {
+            const { publicKey, privateKey } = crypto.generateKeyPairSync('rsa', {
+                modulusLength: 2048,
+                publicKeyEncoding: { type: 'spki', format: 'pem' },
+                privateKeyEncoding: { type: 'pkcs8', format: 'pem' }
+            });
+            keys = { publicKey, privateKey };
+            if (this.keyFile) {
+                fs.mkdirSync(path.dirname(this.keyFile), { recursive: true });
+                fs.writeFileSync(this.keyFile, JSON.stringify(keys), { mode: 0o600 });
+            }
+        }
+
+        this.publicKey = keys.publicKey;
+        this.privateKey = keys.privateKey;
+        this.kid = crypto.createHash('sha256').update(this.publicKey).digest('hex').slice(0, 16);
+    }
+
+    publicKeys() {
+        return [{ kid: this.kid, alg: ALGORITHM, publicKey: this.publicKey }];
+    }
+
+    // Tokens de acesso por padrão; outros usos assinam com a própria audiência
+    sign(payload, options = {}) {
+        return jwt.sign({ ...payload, iatMs: Date.now() }, this.privateKey, {
+            algorithm: ALGORITHM,
+            keyid: this.kid,
+            expiresIn: this.expiresIn,
+            audience: ACCESS_AUDIENCE,
+            ...options
+        });
+    }
+
+    verify(token) {
+        return this.verifier.verify(token);
+    }
+
+    revokedAt(userId) {
+        return this.revocations.get(userId);
+    }
+
+    // Revoga todos os tokens emitidos até agora para o usuário
+    revokeUser(userId, revokedAt = Date.now()) {
+        this.revocations.set(userId, revokedAt);
+        this.verifier.cache.deleteUser(userId);
+        this.pushRevocations([{ userId, revokedAt }]);
+        return revokedAt;
+    }
+
+    revocationsSince(since = 0) {
+        const cutoff = Date.now() - REVOCATION_TTL;
+        const revocations = [];
+        for (const [userId, revokedAt] of this.revocations) {
+            if (revokedAt < cutoff) {
+                this.revocations.delete(userId);
+            } else if (revokedAt > since) {
+                revocations.push({ userId, revokedAt });
+            }
+        }
+        return revocations;
+    }
+
+    // Envia a revogação para os serviços registrados (best effort; o polling cobre falhas)
+    pushRevocations(revocations) {
+        const notice = this.sign({ type: 'revocation', revocations }, { expiresIn: '5m', audience: NOTICE_AUDIENCE });
+        const notified = new Set();
+
+        // Todas as instâncias de cada serviço (uma vez por url)
+        Object.keys(serviceRegistry.listServices()).forEach(name => {
+            if (name === this.serviceName) return;
+            serviceRegistry.getInstances(name).forEach(instance => {
+                if (notified.has(instance.url)) return;
+                notified.add(instance.url);
+                axios.post(`${instance.url}/auth/revocations`, { notice }, { timeout: 2000 })
+                    .catch(error => console.error(`Falha ao notificar revogação para ${name} (${instance.url}):`, error.message));
+            });
+        });
+    }
+
+    // Rotas públicas usadas pelos verificadores
+    keysHandler() {
+        return (req, res) => res.json({ keys: this.publicKeys() });
+    }
+
+    revocationsHandler() {
+        return (req, res) => {
+            const now = Date.now();
+            res.json({
+                revocations: this.revocationsSince(parseInt(req.query.since) || 0),
+                now
+            });
+        };
+    }
+}
+
+module.exports = { TokenIssuer, TokenVerifier, ValidationCache };
@@ -1,11 +1,84 @@
 // shared/serviceRegistry.js - VERSÃO COM ARQUIVO COMPARTILHADO
+//
+// O arquivo services-registry.json guarda várias instâncias por serviço:
+//   { "<serviço>": { "instances": { "<host:port>": { url, host, port, pid, healthy, lastHeartbeat, ... } } } }
+// Cada processo mantém um snapshot em memória, recarregado quando o arquivo muda
+// (fs.watch) ou quando o snapshot passa do TTL (única forma de atualização se o
+// watch não estiver disponível). Assim discover() não lê o disco a cada
+// requisição. As instâncias registradas enviam heartbeats periódicos e deixam de
+// ser descobertas quando expiram. As escritas (registro, heartbeat, health check)
+// são assíncronas e não bloqueiam o event loop enquanto aguardam o lock.
 const fs = require('fs');
+const fsp = fs.promises;
 const path = require('path');
+const { performance } = require('perf_hooks');
+
+const SNAPSHOT_TTL = parseInt(process.env.REGISTRY_CACHE_TTL) || 5000;
+const HEARTBEAT_INTERVAL = parseInt(process.env.REGISTRY_HEARTBEAT_INTERVAL) || 10000;
+const INSTANCE_TTL = parseInt(process.env.REGISTRY_INSTANCE_TTL) || 45000;
+const LOCK_TIMEOUT = 1000;
+const LOCK_STALE = 5000;
+// Sem o lock a escrita é adiada (nunca feita sem lock): nova tentativa após um intervalo aleatório
+const LOCK_ATTEMPTS = 3;
+const LOCK_RETRY_DELAY = 250;
+
+// Média móvel exponencial da latência por instância
+const EWMA_ALPHA = 0.3;
+// Latência contabilizada para requisições que falharam (evita que uma instância
+// que recusa conexões rapidamente pareça a mais rápida)
+const FAILURE_PENALTY = 1000;
+
+// Estratégias de seleção: recebem as instâncias disponíveis e devolvem uma delas
+const strategies = {
+    'round-robin': (instances, registry, serviceName) => {
+        return instances[registry.nextCounter(serviceName) % instances.length];
+    },
+
+    // Menos requisições em andamento neste processo
+    'least-outstanding': (instances, registry, serviceName) => {
+        return registry.pickLowest(instances, serviceName, stats => stats.outstanding);
+    },
+
+    // Latência (EWMA) ponderada pelas requisições em andamento; instâncias ainda
+    // sem medida recebem tráfego primeiro
+    'latency': (instances, registry, serviceName) => {
+        return registry.pickLowest(instances, serviceName, stats => (stats.latency || 0) * (stats.outstanding + 1));
+    }
+};
+
+function sleep(ms) {
+    return new Promise(resolve => setTimeout(resolve, ms));
+}
+
+function sleepSync(ms) {
+    Atomics.wait(new Int32Array(new SharedArrayBuffer(4)), 0, 0, ms);
+}
 
 class FileBasedServiceRegistry {
     constructor() {
         this.registryFile = path.join(__dirname, 'services-registry.json');
+        this.lockFile = `${this.registryFile}.lock`;
+        this.strategy = process.env.REGISTRY_STRATEGY || 'round-robin';
+
+        this.snapshot = null;
+        this.loadedAt = 0;
+        this.stale = true;
+        this.reloads = 0;
+        this.watching = false;
+        this.lockFailures = 0;
+
+        this.ownInstances = new Map(); // instanceId -> { serviceName, info }
+        this.heartbeatTimer = null;
+        this.counters = new Map(); // serviceName -> contador do round-robin
+        this.instanceStats = new Map(); // url -> { outstanding, latency, requests, failures }
+
+        if (!strategies[this.strategy]) {
+            console.error(`Estratégia de balanceamento desconhecida: ${this.strategy}, usando round-robin`);
+            this.strategy = 'round-robin';
+        }
+
         this.ensureRegistryFile();
+        this.watchRegistry();
         console.log('File-based Service Registry inicializado:', this.registryFile);
     }
 
@@ -15,10 +88,51 @@ class FileBasedServiceRegistry {
         }
     }
 
+    // Observa o diretório (e não o arquivo), pois a escrita substitui o arquivo via rename
+    watchRegistry() {
+        try {
+            const watcher = fs.watch(path.dirname(this.registryFile), (eventType, filename) => {
+                if (!filename || filename === path.basename(this.registryFile)) {
+                    this.stale = true;
+                }
+            });
+            watcher.on('error', () => {
+                this.watching = false;
+            });
+            watcher.unref();
+            this.watching = true;
+        } catch (error) {
+            console.error('fs.watch indisponível para o registry, usando apenas TTL:', error.message);
+        }
+    }
+
     readRegistry() {
         try {
             const data = fs.readFileSync(this.registryFile, 'utf8');
-            return JSON.parse(data);
+            return this.normalize(JSON.parse(data));
+        } catch (error) {
+            console.error('Erro ao ler registry file:', error.message);
+            return {};
+        }
+    }
+
+    // Entradas no formato antigo (uma instância por serviço) viram uma instância sem heartbeat
+    normalize(services) {
+        const normalized = {};
+        Object.entries(services).forEach(([name, entry]) => {
+            if (entry && entry.instances) {
+                normalized[name] = entry;
+            } else if (entry && entry.url) {
+                normalized[name] = { instances: { [`${entry.host}:${entry.port}`]: entry } };
+            }
+        });
+        return normalized;
+    }
+
+    async readRegistryAsync() {
+        try {
+            const data = await fsp.readFile(this.registryFile, 'utf8');
+            return this.normalize(JSON.parse(data));
         } catch (error) {
             console.error('Erro ao ler registry file:', error.message);
             return {};
@@ -26,191 +140,546 @@ class FileBasedServiceRegistry {
     }
 
     writeRegistry(services) {
+        const tmpFile = `${this.registryFile}.${process.pid}.tmp`;
         try {
-            fs.writeFileSync(this.registryFile, JSON.stringify(services, null, 2));
+            fs.writeFileSync(tmpFile, JSON.stringify(services, null, 2));
+            fs.renameSync(tmpFile, this.registryFile);
         } catch (error) {
             console.error('Erro ao escrever registry file:', error.message);
         }
     }
 
-    // Registrar um serviço
-    register(serviceName, host, port) {
-        const services = this.readRegistry();
-        
+    async writeRegistryAsync(services) {
+        const tmpFile = `${this.registryFile}.${process.pid}.tmp`;
+        try {
+            await fsp.writeFile(tmpFile, JSON.stringify(services, null, 2));
+            await fsp.rename(tmpFile, this.registryFile);
+        } catch (error) {
+            console.error('Erro ao escrever registry file:', error.message);
+        }
+    }
+
+    // Snapshot em memória usado nas leituras: recarregado quando o watch avisa
+    // de mudança e, de qualquer forma, depois do TTL
+    getSnapshot() {
+        const expired = Date.now() - this.loadedAt > SNAPSHOT_TTL;
+        if (!this.snapshot || this.stale || expired) {
+            this.stale = false;
+            this.snapshot = this.readRegistry();
+            this.loadedAt = Date.now();
+            this.reloads++;
+        }
+        return this.snapshot;
+    }
+
+    // Leitura-modificação-escrita protegida por um arquivo de lock entre processos.
+    // Sem o lock depois de LOCK_ATTEMPTS tentativas, rejeita sem escrever.
+    async update(mutate) {
+        for (let attempt = 1; !(await this.acquireLock()); attempt++) {
+            if (attempt >= LOCK_ATTEMPTS) {
+                this.lockFailures++;
+                throw new Error('Timeout ao obter lock do registry, escrita adiada');
+            }
+            await sleep(LOCK_RETRY_DELAY * (1 + Math.random()));
+        }
+
+        try {
+            const services = await this.readRegistryAsync();
+            const result = mutate(services);
+            this.pruneExpired(services);
+            await this.writeRegistryAsync(services);
+
+            this.snapshot = services;
+            this.loadedAt = Date.now();
+            this.stale = false;
+            return result;
+        } finally {
+            await fsp.rm(this.lockFile, { force: true });
+        }
+    }
+
+    // Versão síncrona, usada apenas na saída do processo (quando não há mais event loop a proteger)
+    updateSync(mutate) {
+        if (!this.acquireLockSync()) {
+            console.error('Timeout ao obter lock do registry, alteração descartada');
+            return undefined;
+        }
+
+        try {
+            const services = this.readRegistry();
+            const result = mutate(services);
+            this.pruneExpired(services);
+            this.writeRegistry(services);
+            return result;
+        } finally {
+            fs.rmSync(this.lockFile, { force: true });
+        }
+    }
+
+    // true se o lock foi obtido; false após LOCK_TIMEOUT (espera com recuo exponencial)
+    async acquireLock() {
+        const deadline = Date.now() + LOCK_TIMEOUT;
+        let delay = 5;
+
+        while (true) {
+            try {
+                await (await fsp.open(this.lockFile, 'wx')).close();
+                return true;
+            } catch (error) {
+                if (error.code !== 'EEXIST') {
+                    throw error;
+                }
+            }
+
+            // Lock abandonado por um processo que morreu durante a escrita
+            try {
+                if (Date.now() - (await fsp.stat(this.lockFile)).mtimeMs > LOCK_STALE) {
+                    await fsp.rm(this.lockFile, { force: true });
+                    continue;
+                }
+            } catch (error) {
+                continue;
+            }
+
+            if (Date.now() + delay > deadline) {
+                return false;
+            }
+            await sleep(delay);
+            delay = Math.min(delay * 2, 100);
+        }
+    }
+
+    acquireLockSync() {
+        const deadline = Date.now() + LOCK_TIMEOUT;
+        while (true) {
+            try {
+                fs.closeSync(fs.openSync(this.lockFile, 'wx'));
+                return true;
+            } catch (error) {
+                if (error.code !== 'EEXIST') {
+                    return false;
+                }
+            }
+
+            try {
+                if (Date.now() - fs.statSync(this.lockFile).mtimeMs > LOCK_STALE) {
+                    fs.rmSync(this.lockFile, { force: true });
+                    continue;
+                }
+            } catch (error) {
+                continue;
+            }
+
+            if (Date.now() > deadline) {
+                return false;
+            }
+            sleepSync(5);
+        }
+    }
+
+    // Instâncias com heartbeat expirado são removidas do arquivo
+    pruneExpired(services) {
+        const now = Date.now();
+        Object.entries(services).forEach(([name, service]) => {
+            Object.entries(service.instances).forEach(([id, instance]) => {
+                if (this.isExpired(instance, now)) {
+                    delete service.instances[id];
+                    console.log(`Instância expirada removida: ${name} - ${instance.url}`);
+                }
+            });
+            if (Object.keys(service.instances).length === 0) {
+                delete services[name];
+            }
+        });
+    }
+
+    // Só instâncias que enviam heartbeat expiram; entradas antigas dependem do health check
+    isExpired(instance, now = Date.now()) {
+        return instance.lastHeartbeat !== undefined && now - instance.lastHeartbeat > INSTANCE_TTL;
+    }
+
+    isAvailable(instance, now = Date.now()) {
+        return instance.healthy && !this.isExpired(instance, now);
+    }
+
+    // Registrar uma instância do serviço (se a escrita falhar, o heartbeat recria a entrada)
+    async register(serviceName, host, port) {
+        const id = `${host}:${port}`;
+        const now = Date.now();
         const serviceInfo = {
             url: `http://${host}:${port}`,
             host,
             port,
-            registeredAt: Date.now(),
-            lastHealthCheck: Date.now(),
+            registeredAt: now,
+            lastHeartbeat: now,
+            lastHealthCheck: now,
             healthy: true,
             pid: process.pid
         };
-        
-        services[serviceName] = serviceInfo;
-        
-        this.writeRegistry(services);
-        console.log(`Serviço registrado: ${serviceName} - ${serviceInfo.url} (PID: ${process.pid})`);
-        console.log(`Total de serviços: ${Object.keys(services).length}`);
+
+        this.ownInstances.set(id, { serviceName, info: serviceInfo });
+        this.startHeartbeat();
+
+        try {
+            const total = await this.update(services => {
+                services[serviceName] = services[serviceName] || { instances: {} };
+                services[serviceName].instances[id] = serviceInfo;
+                return Object.keys(services[serviceName].instances).length;
+            });
+
+            console.log(`Serviço registrado: ${serviceName} - ${serviceInfo.url} (PID: ${process.pid})`);
+            console.log(`Instâncias de ${serviceName}: ${total}`);
+        } catch (error) {
+            console.error(`Falha ao registrar ${serviceName}, nova tentativa no próximo heartbeat:`, error.message);
+        }
     }
 
-    // Descobrir um serviço
-    discover(serviceName) {
-        const services = this.readRegistry();
-        console.log(`Procurando serviço: ${serviceName}`);
-        console.log(`Serviços disponíveis: ${Object.keys(services).join(', ')}`);
-        
-        const service = services[serviceName];
+    // Heartbeat das instâncias deste processo (recria a entrada se tiver sido removida)
+    startHeartbeat() {
+        if (this.heartbeatTimer) return;
+
+        this.heartbeatTimer = setInterval(() => {
+            this.heartbeat().catch(error => console.error('Heartbeat do registry não enviado:', error.message));
+        }, HEARTBEAT_INTERVAL);
+        this.heartbeatTimer.unref();
+    }
+
+    async heartbeat() {
+        if (this.ownInstances.size === 0) return;
+
+        const now = Date.now();
+        await this.update(services => {
+            for (const [id, { serviceName, info }] of this.ownInstances) {
+                services[serviceName] = services[serviceName] || { instances: {} };
+                const instance = services[serviceName].instances[id] || { ...info, healthy: true };
+                instance.lastHeartbeat = now;
+                services[serviceName].instances[id] = instance;
+            }
+        });
+    }
+
+    // Instâncias disponíveis (saudáveis e com heartbeat em dia) de um serviço
+    getInstances(serviceName) {
+        const service = this.getSnapshot()[serviceName];
+        if (!service) return [];
+
+        const now = Date.now();
+        return Object.values(service.instances).filter(instance => this.isAvailable(instance, now));
+    }
+
+    // Descobrir um serviço: escolhe uma instância com a estratégia configurada
+    discover(serviceName, strategy = this.strategy) {
+        const service = this.getSnapshot()[serviceName];
         if (!service) {
-            console.error(`Serviço não encontrado: ${serviceName}`);
-            console.error(`Serviços registrados:`, Object.keys(services));
             throw new Error(`Serviço não encontrado: ${serviceName}`);
         }
-        
-        if (!service.healthy) {
-            console.error(`Serviço indisponível: ${serviceName}`);
+
+        const instances = this.getInstances(serviceName);
+        if (instances.length === 0) {
             throw new Error(`Serviço indisponível: ${serviceName}`);
         }
-        
-        console.log(`Serviço encontrado: ${serviceName} - ${service.url}`);
-        return service;
+        if (instances.length === 1) {
+            return instances[0];
+        }
+
+        const select = strategies[strategy] || strategies['round-robin'];
+        return select(instances, this, serviceName);
+    }
+
+    // Permite adicionar estratégias de seleção: fn(instances, registry, serviceName) -> instância
+    registerStrategy(name, select) {
+        strategies[name] = select;
+    }
+
+    setStrategy(name) {
+        if (!strategies[name]) {
+            throw new Error(`Estratégia de balanceamento desconhecida: ${name}`);
+        }
+        this.strategy = name;
+    }
+
+    nextCounter(serviceName) {
+        const counter = this.counters.get(serviceName) || 0;
+        this.counters.set(serviceName, counter + 1);
+        return counter;
+    }
+
+    // Menor custo; empates resolvidos em round-robin para não concentrar na primeira instância
+    pickLowest(instances, serviceName, cost) {
+        const offset = this.nextCounter(serviceName);
+        let best = null;
+        let bestCost = Infinity;
+
+        for (let i = 0; i < instances.length; i++) {
+            const instance = instances[(offset + i) % instances.length];
+            const value = cost(this.statsFor(instance));
+            if (value < bestCost) {
+                best = instance;
+                bestCost = value;
+            }
+        }
+        return best;
+    }
+
+    statsFor(instance) {
+        let stats = this.instanceStats.get(instance.url);
+        if (!stats) {
+            stats = { outstanding: 0, latency: null, requests: 0, failures: 0 };
+            this.instanceStats.set(instance.url, stats);
+        }
+        return stats;
+    }
+
+    // Marca o início de uma requisição para a instância; a função devolvida
+    // registra o fim (ok = false para falhas, null para cancelada pelo cliente,
+    // que não conta latência nem falha) e alimenta as estratégias
+    track(instance) {
+        const stats = this.statsFor(instance);
+        const start = performance.now();
+        let finished = false;
+        stats.outstanding++;
+
+        return (ok = true) => {
+            if (finished) return;
+            finished = true;
+
+            stats.outstanding--;
+            if (ok === null) {
+                stats.cancelled = (stats.cancelled || 0) + 1;
+                return;
+            }
+
+            const elapsed = ok ? performance.now() - start : Math.max(performance.now() - start, FAILURE_PENALTY);
+            stats.requests++;
+            if (!ok) stats.failures++;
+            stats.latency = stats.latency === null ? elapsed : stats.latency + EWMA_ALPHA * (elapsed - stats.latency);
+        };
     }
 
     // Listar todos os serviços
     listServices() {
-        const services = this.readRegistry();
+        const services = this.getSnapshot();
+        const now = Date.now();
         const serviceList = {};
-        
+
         Object.entries(services).forEach(([name, service]) => {
+            const instances = Object.entries(service.instances);
+            if (instances.length === 0) return;
+
+            const available = instances.filter(([, instance]) => this.isAvailable(instance, now));
+            const [, primary] = available[0] || instances[0];
+            const registeredAt = Math.min(...instances.map(([, instance]) => instance.registeredAt));
+
             serviceList[name] = {
-                url: service.url,
-                healthy: service.healthy,
-                registeredAt: new Date(service.registeredAt).toISOString(),
-                uptime: Date.now() - service.registeredAt,
-                pid: service.pid
+                url: primary.url,
+                healthy: available.length > 0,
+                registeredAt: new Date(registeredAt).toISOString(),
+                uptime: now - registeredAt,
+                pid: primary.pid,
+                instances: instances.map(([id, instance]) => {
+                    const stats = this.instanceStats.get(instance.url);
+                    return {
+                        id,
+                        url: instance.url,
+                        healthy: instance.healthy,
+                        expired: this.isExpired(instance, now),
+                        pid: instance.pid,
+                        lastHeartbeat: instance.lastHeartbeat ? new Date(instance.lastHeartbeat).toISOString() : null,
+                        outstanding: stats ? stats.outstanding : 0,
+                        latency: stats && stats.latency !== null ? Math.round(stats.latency * 100) / 100 : null
+                    };
+                })
             };
         });
-        
+
         return serviceList;
     }
 
-    // Remover serviço
-    unregister(serviceName) {
-        const services = this.readRegistry();
-        if (services[serviceName]) {
-            delete services[serviceName];
-            this.writeRegistry(services);
+    // Remover as instâncias do serviço (por padrão, as deste processo)
+    async unregister(serviceName, instanceId = null) {
+        const ids = instanceId
+            ? [instanceId]
+            : Array.from(this.ownInstances).filter(([, own]) => own.serviceName === serviceName).map(([id]) => id);
+
+        // Antes da escrita, para o heartbeat não recriar a entrada
+        ids.forEach(id => this.ownInstances.delete(id));
+
+        const removed = await this.update(services => {
+            const service = services[serviceName];
+            if (!service) return false;
+
+            let changed = false;
+            ids.forEach(id => {
+                if (service.instances[id]) {
+                    delete service.instances[id];
+                    changed = true;
+                }
+            });
+            if (Object.keys(service.instances).length === 0) {
+                delete services[serviceName];
+            }
+            return changed;
+        });
+
+        if (removed) {
             console.log(`Serviço removido: ${serviceName}`);
-            return true;
         }
-        return false;
+        return removed;
     }
 
-    // Health check de um serviço
-    updateHealth(serviceName, healthy) {
-        const services = this.readRegistry();
-        if (services[serviceName]) {
-            services[serviceName].healthy = healthy;
-            services[serviceName].lastHealthCheck = Date.now();
-            this.writeRegistry(services);
-            const status = healthy ? 'OK' : 'FAIL';
-            console.log(`Health check: ${serviceName} - ${status}`);
-        }
+    // Health check: uma instância específica, as instâncias deste processo
+    // (funciona como heartbeat) ou, sem nenhuma das duas, todas as do serviço
+    updateHealth(serviceName, healthy, instanceId = null) {
+        return this.setHealth([{ serviceName, instanceId, healthy }])
+            .catch(error => console.error(`Health de ${serviceName} não registrado:`, error.message));
     }
 
-    // Health check de todos os serviços
+    setHealth(results) {
+        const now = Date.now();
+        return this.update(services => {
+            results.forEach(({ serviceName, instanceId, healthy }) => {
+                const service = services[serviceName];
+                if (!service) return;
+
+                let ids = instanceId ? [instanceId] : Object.keys(service.instances).filter(id => this.ownInstances.has(id));
+                if (ids.length === 0) {
+                    ids = Object.keys(service.instances);
+                }
+
+                ids.forEach(id => {
+                    const instance = service.instances[id];
+                    if (!instance) return;
+                    instance.healthy = healthy;
+                    instance.lastHealthCheck = now;
+                    if (healthy && this.ownInstances.has(id)) {
+                        instance.lastHeartbeat = now;
+                    }
+                });
+
+                const status = healthy ? 'OK' : 'FAIL';
+                console.log(`Health check: ${serviceName}${instanceId ? ` (${instanceId})` : ''} - ${status}`);
+            });
+        });
+    }
+
+    // Health check de todas as instâncias (em paralelo, uma única escrita no final)
     async performHealthChecks() {
         const axios = require('axios');
-        const services = this.readRegistry();
-        
-        console.log(`Executando health checks de ${Object.keys(services).length} serviços...`);
-        
-        for (const [serviceName, service] of Object.entries(services)) {
-            try {
-                await axios.get(`${service.url}/health`, { 
-                    timeout: 5000,
-                    family: 4
-                });
-                this.updateHealth(serviceName, true);
-            } catch (error) {
-                console.error(`Health check falhou para ${serviceName}:`, error.message);
-                this.updateHealth(serviceName, false);
-            }
-        }
+        const services = await this.readRegistryAsync();
+        const checks = [];
+
+        Object.entries(services).forEach(([serviceName, service]) => {
+            Object.entries(service.instances).forEach(([instanceId, instance]) => {
+                checks.push(
+                    axios.get(`${instance.url}/health`, { timeout: 5000, family: 4 })
+                        .then(() => ({ serviceName, instanceId, healthy: true }))
+                        .catch(error => {
+                            console.error(`Health check falhou para ${serviceName} (${instanceId}):`, error.message);
+                            return { serviceName, instanceId, healthy: false };
+                        })
+                );
+            });
+        });
+
+        console.log(`Executando health checks de ${checks.length} instâncias em ${Object.keys(services).length} serviços...`);
+        await this.setHealth(await Promise.all(checks));
     }
 
     // Debug: listar serviços registrados
     debugListServices() {
-        const services = this.readRegistry();
+        const services = this.getSnapshot();
         console.log('DEBUG - Serviços registrados:');
         Object.entries(services).forEach(([name, service]) => {
-            console.log(`   ${name}: ${service.url} (${service.healthy ? 'healthy' : 'unhealthy'}) PID:${service.pid}`);
+            Object.values(service.instances).forEach(instance => {
+                const status = this.isAvailable(instance) ? 'healthy' : (instance.healthy ? 'expired' : 'unhealthy');
+                console.log(`   ${name}: ${instance.url} (${status}) PID:${instance.pid}`);
+            });
         });
     }
 
     // Verificar se um serviço existe
     hasService(serviceName) {
-        const services = this.readRegistry();
-        return services.hasOwnProperty(serviceName);
+        return this.getSnapshot().hasOwnProperty(serviceName);
     }
 
     // Obter estatísticas
     getStats() {
-        const services = this.readRegistry();
+        const services = this.getSnapshot();
+        const now = Date.now();
         const total = Object.keys(services).length;
         let healthy = 0;
         let unhealthy = 0;
+        let instances = 0;
+        let availableInstances = 0;
 
         Object.values(services).forEach(service => {
-            if (service.healthy) {
+            const list = Object.values(service.instances);
+            const available = list.filter(instance => this.isAvailable(instance, now)).length;
+            instances += list.length;
+            availableInstances += available;
+            if (available > 0) {
                 healthy++;
             } else {
                 unhealthy++;
             }
         });
 
-        return { total, healthy, unhealthy };
+        return {
+            total,
+            healthy,
+            unhealthy,
+            instances,
+            availableInstances,
+            strategy: this.strategy,
+            snapshot: {
+                reloads: this.reloads,
+                age: now - this.loadedAt,
+                watching: this.watching
+            },
+            lockFailures: this.lockFailures
+        };
     }
 
     // Limpar registry (útil para desenvolvimento)
-    clear() {
-        this.writeRegistry({});
+    async clear() {
+        await this.update(services => {
+            Object.keys(services).forEach(name => delete services[name]);
+        });
         console.log('Registry limpo');
     }
 
-    // Cleanup na saída do processo
+    // Cleanup na saída do processo (síncrono: roda no evento 'exit')
     cleanup() {
-        // Remove serviços deste PID ao sair
+        // Remove instâncias deste PID ao sair
         const services = this.readRegistry();
         const currentPid = process.pid;
-        let changed = false;
+        const owned = Object.values(services)
+            .some(service => Object.values(service.instances).some(instance => instance.pid === currentPid));
 
-        Object.entries(services).forEach(([name, service]) => {
-            if (service.pid === currentPid) {
-                delete services[name];
-                changed = true;
-                console.log(`Removendo serviço ${name} do PID ${currentPid}`);
-            }
-        });
+        if (!owned) return;
 
-        if (changed) {
-            this.writeRegistry(services);
-        }
+        this.updateSync(services => {
+            Object.entries(services).forEach(([name, service]) => {
+                Object.entries(service.instances).forEach(([id, instance]) => {
+                    if (instance.pid === currentPid) {
+                        delete service.instances[id];
+                        console.log(`Removendo instância ${name} (${id}) do PID ${currentPid}`);
+                    }
+                });
+                if (Object.keys(service.instances).length === 0) {
+                    delete services[name];
+                }
+            });
+        });
+        this.ownInstances.clear();
     }
 }
 
 // Criar instância singleton
 const registry = new FileBasedServiceRegistry();
 
-// Cleanup ao sair do processo
+// Cleanup ao sair do processo. Os sinais ficam com cada serviço (unregister e
+// process.exit); sem handler próprio aqui, o deles não é atropelado
 process.on('exit', () => registry.cleanup());
-process.on('SIGINT', () => {
-    registry.cleanup();
-    process.exit(0);
-});
-process.on('SIGTERM', () => {
-    registry.cleanup();
-    process.exit(0);
-});
-
-module.exports = registry;
\ No newline at end of file
+
+module.exports = registry;